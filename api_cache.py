@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, jsonify, request
+
+
+class ResponseCache:
+    """Caches JSON responses keyed by URL and the data versions they were built from"""
+
+    def __init__(self, db, max_entries=128):
+        self.db = db
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # full path -> (etag, last_modified, response body, checked at)
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def respond(self, sources, build, max_age=0, epoch=None):
+        """Serve build() for the current request, or a 304 / cached copy if sources are unchanged
+
+        Within max_age seconds of the last version check a cached body is
+        served without asking the database anything. Bodies that also depend
+        on the clock pass an epoch (e.g. the current minute); it becomes part
+        of the ETag and disables Last-Modified revalidation.
+        """
+        key = request.full_path
+        now = time.monotonic()
+        with self.lock:
+            cached = self.entries.get(key)
+
+        if max_age and cached and now - cached[3] < max_age:
+            etag, last_modified, checked_at = cached[0], cached[1], cached[3]
+        else:
+            versions = self.db.get_data_versions(*sources)
+            if versions is None:
+                return jsonify(build())
+
+            etag = '-'.join(str(version) for version, _ in versions)
+            changed = [updated_at for _, updated_at in versions if updated_at is not None]
+            last_modified = max(changed) if changed else None
+            checked_at = now
+            if epoch is not None:
+                etag, last_modified = f"{etag}-{epoch}", None
+
+        # Compressed representations carry the encoding as an ETag suffix
+        for tag in (etag, f"{etag}-gzip", f"{etag}-br"):
+            if request.if_none_match.contains(tag):
+                return self._with_validators(Response(status=304), tag, last_modified)
+        if (not request.if_none_match and last_modified and request.if_modified_since
+                and last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)):
+            return self._with_validators(Response(status=304), etag, last_modified)
+
+        if cached and cached[0] == etag:
+            body = cached[2]
+        else:
+            payload = build()
+            response = jsonify(payload)
+            if not payload.get('success'):
+                return response
+            body = response.get_data()
+
+        with self.lock:
+            self.entries[key] = (etag, last_modified, body, checked_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        response = Response(body, mimetype='application/json')
+        return self._with_validators(response, etag, last_modified)
+
+    @staticmethod
+    def _with_validators(response, etag, last_modified):
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.cache_control.no_cache = True  # always revalidate
+        return response
@@ -0,0 +1,122 @@
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from flask import request
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_SIZE = 1024  # bytes; smaller bodies are not worth the CPU
+
+
+def encode_default(value):
+    """Encode values the JSON libraries don't handle themselves"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(JSONProvider):
+    """Uses orjson when installed, otherwise compact stdlib json"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None:
+            return orjson.dumps(obj, default=encode_default,
+                                option=orjson.OPT_NON_STR_KEYS).decode()
+        return json.dumps(obj, default=encode_default, separators=(',', ':'), ensure_ascii=False)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None:
+            return orjson.loads(s)
+        return json.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps(obj), mimetype='application/json')
+
+
+def to_columns(rows):
+    """[{field: value}, ...] -> {field: [values...]} for ?format=columns"""
+    if not rows:
+        return {}
+    return {field: [row[field] for row in rows] for field in rows[0]}
+
+
+def wants_columns():
+    return request.args.get('format') == 'columns'
+
+
+class ResponseCompressor:
+    """Negotiates brotli/gzip for JSON responses and memoizes bodies that carry an ETag"""
+
+    def __init__(self, app=None, max_entries=128):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (path, etag, encoding) -> compressed body
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self.compress)
+
+    @staticmethod
+    def choose_encoding():
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def compress(self, response):
+        if (response.status_code != 200 or response.direct_passthrough
+                or response.mimetype != 'application/json'
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding()
+        if encoding is None:
+            return response
+
+        body = response.get_data()
+        if len(body) < MIN_COMPRESS_SIZE:
+            return response
+
+        etag = response.get_etag()[0]
+        key = (request.full_path, etag, encoding) if etag else None
+        compressed = None
+        if key:
+            with self.lock:
+                compressed = self.entries.get(key)
+
+        if compressed is None:
+            if encoding == 'br':
+                compressed = brotli.compress(body, quality=4)
+            else:
+                compressed = gzip.compress(body, compresslevel=5)
+            if key:
+                with self.lock:
+                    self.entries[key] = compressed
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            # A compressed representation needs its own validator
+            response.set_etag(f"{etag}-{encoding}")
+        return response
@@ -1,49 +1,173 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Blueprint, render_template, jsonify, request, current_app
 from database import ParkingDatabase
-from datetime import datetime
-import logging
+from api_cache import ResponseCache
+from api_json import FastJSONProvider, ResponseCompressor, to_columns, wants_columns
+from tariff import get_tariff
+from log_config import configure
+from datetime import datetime, timedelta
+import os
+import time
 
-logging.basicConfig(level=logging.DEBUG)  
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+DASHBOARD_MAX_ROWS = 200
+DASHBOARD_CACHE_SECONDS = float(os.getenv('DASHBOARD_CACHE_SECONDS', '2'))
+QUOTE_REFRESH_SECONDS = 60  # outstanding fares are re-priced at most this often
 
-app = Flask(__name__)
-db = ParkingDatabase()
+def quote_epoch():
+    return int(time.time() // QUOTE_REFRESH_SECONDS)
 
-@app.route('/')
+api = Blueprint('api', __name__)
+
+def get_db():
+    return current_app.extensions['parking_db']
+
+def get_cache():
+    return current_app.extensions['response_cache']
+
+def create_app(db=None):
+    """Build the Flask app; call once per worker process so each gets its own DB pool"""
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    ResponseCompressor(app)
+
+    db = db or ParkingDatabase(pool_size=DB_POOL_SIZE)
+    app.extensions['parking_db'] = db
+    app.extensions['response_cache'] = ResponseCache(db)
+    app.extensions['shutting_down'] = False
+
+    @app.teardown_appcontext
+    def release_connection(exc):
+        db.release()
+
+    app.register_blueprint(api)
+    return app
+
+@api.route('/healthz')
+def liveness():
+    return jsonify({'success': True, 'status': 'alive'})
+
+@api.route('/readyz')
+def readiness():
+    if current_app.extensions['shutting_down']:
+        return jsonify({'success': False, 'status': 'shutting down'}), 503
+    if not get_db().ping():
+        return jsonify({'success': False, 'status': 'database unavailable'}), 503
+    return jsonify({'success': True, 'status': 'ready'})
+
+@api.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/dashboard')
+@api.route('/dashboard')
 def dashboard():
     return render_template('dashboard.html')
 
-@app.route('/api/vehicles')
+@api.route('/api/vehicles')
 def get_vehicles():
-    try:
-        vehicles = db.get_all_vehicles()
-        return jsonify({'success': True, 'vehicles': vehicles})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+    def build():
+        try:
+            vehicles = get_db().get_all_vehicles()
+            if wants_columns():
+                vehicles = to_columns(vehicles)
+            return {'success': True, 'vehicles': vehicles}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    return get_cache().respond(('vehicles',), build)
 
-@app.route('/api/unauthorized_exits')
+@api.route('/api/unauthorized_exits')
 def get_unauthorized_exits():
+    def build():
+        try:
+            exits = get_db().get_unauthorized_exits()
+            if wants_columns():
+                exits = to_columns(exits)
+            return {'success': True, 'exits': exits}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    return get_cache().respond(('unauthorized_exits',), build)
+
+@api.route('/api/statistics')
+def get_statistics():
+    def build():
+        try:
+            stats = {
+                'total_vehicles': get_db().get_total_vehicles(),
+                'current_vehicles': get_db().get_current_vehicles(),
+                'total_revenue': get_db().get_total_revenue(),
+                'unauthorized_exits': get_db().get_unauthorized_exits_count()
+            }
+            return {'success': True, 'statistics': stats}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    return get_cache().respond(('vehicles', 'unauthorized_exits'), build)
+
+@api.route('/api/dashboard')
+def get_dashboard():
+    vehicle_limit = min(max(request.args.get('vehicles', 50, type=int), 0), DASHBOARD_MAX_ROWS)
+    exit_limit = min(max(request.args.get('exits', 20, type=int), 0), DASHBOARD_MAX_ROWS)
+
+    def build():
+        snapshot = get_db().get_dashboard_snapshot(vehicle_limit, exit_limit)
+        if snapshot is None:
+            return {'success': False, 'error': 'Could not read dashboard snapshot'}
+        plates, entry_times = snapshot.pop('parked')
+        _, amounts = get_tariff().quote_many(plates, entry_times)
+        snapshot['statistics']['outstanding_vehicles'] = len(plates)
+        snapshot['statistics']['outstanding_revenue'] = int(amounts.sum())
+        return {'success': True, **snapshot}
+    return get_cache().respond(('vehicles', 'unauthorized_exits'), build, max_age=DASHBOARD_CACHE_SECONDS,
+                               epoch=quote_epoch())
+
+@api.route('/api/outstanding')
+def get_outstanding():
+    def build():
+        try:
+            plates, entry_times = get_db().get_parked_vehicles()
+            hours, amounts = get_tariff().quote_many(plates, entry_times)
+            quotes = [
+                {'plate_number': plate, 'entry_time': entry_time, 'billed_hours': float(h), 'amount_due': int(a)}
+                for plate, entry_time, h, a in zip(plates, entry_times, hours, amounts)
+            ]
+            if wants_columns():
+                quotes = to_columns(quotes)
+            return {'success': True, 'total': int(amounts.sum()), 'quotes': quotes}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    return get_cache().respond(('vehicles',), build, epoch=quote_epoch())
+
+@api.route('/api/search')
+def search_plates():
     try:
-        exits = db.get_unauthorized_exits()
-        return jsonify({'success': True, 'exits': exits})
+        query = request.args.get('q', '')
+        mode = request.args.get('mode', 'similar')
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        if mode not in ('prefix', 'substring', 'similar'):
+            return jsonify({'success': False, 'error': f'Unknown search mode: {mode}'}), 400
+
+        results = get_db().search_plates(query, mode=mode, limit=limit)
+        return jsonify({'success': True, 'results': results})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/api/statistics')
-def get_statistics():
+@api.route('/api/analytics')
+def get_analytics():
     try:
-        stats = {
-            'total_vehicles': db.get_total_vehicles(),
-            'current_vehicles': db.get_current_vehicles(),
-            'total_revenue': db.get_total_revenue(),
-            'unauthorized_exits': db.get_unauthorized_exits_count()
-        }
-        return jsonify({'success': True, 'statistics': stats})
+        bucket = request.args.get('bucket', 'hour')
+        if bucket not in ('hour', 'day', 'week', 'month'):
+            return jsonify({'success': False, 'error': f'Unknown bucket: {bucket}'}), 400
+
+        end = request.args.get('end')
+        end = datetime.fromisoformat(end) if end else datetime.now()
+        start = request.args.get('start')
+        start = datetime.fromisoformat(start) if start else end - timedelta(days=7)
+
+        series = get_db().get_analytics(start, end, bucket=bucket)
+        return jsonify({'success': True, 'bucket': bucket, 'series': series})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 if __name__ == '__main__':
-    app.run(debug=True) 
\ No newline at end of file
+    configure('api')
+    create_app().run(debug=True)
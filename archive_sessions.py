@@ -0,0 +1,17 @@
+import argparse
+from database import ParkingDatabase, ARCHIVE_AFTER_DAYS
+from log_config import configure
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive closed parking sessions (run daily, e.g. from cron)")
+    parser.add_argument('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS,
+                        help=f"archive sessions that exited more than this many days ago (default {ARCHIVE_AFTER_DAYS})")
+    args = parser.parse_args()
+    configure()
+
+    db = ParkingDatabase()
+    db.ensure_partitions()
+    db.archive_closed_sessions(args.older_than_days)
+
+if __name__ == "__main__":
+    main()
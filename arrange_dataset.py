@@ -1,51 +1,244 @@
+import argparse
+import errno
+import hashlib
+import json
 import os
 import shutil
-import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows: hardlink or copy only
+    fcntl = None
 
 # Path to mixed files (images + labels)
-mixed_dir = 'images/cars'
+MIXED_DIR = 'images/cars'
+DATASET_DIR = 'dataset'
+MANIFEST_NAME = 'manifest.json'
+QUARANTINE_DIR = 'quarantine'  # under the dataset directory; --prune moves strays here
+VAL_FRACTION = 0.2
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+SPLITS = ('train', 'val')
+
+FICLONE = 0x40049409  # Linux ioctl: share extents copy-on-write (btrfs, xfs)
+
+
+def content_hash(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def split_for(digest, val_fraction):
+    """Same content always lands in the same split, however many files are added"""
+    return 'val' if int(digest[:16], 16) / 2 ** 64 < val_fraction else 'train'
 
-# Output directories
-train_img_dir = 'dataset/train/images'
-train_lbl_dir = 'dataset/train/labels'
-val_img_dir = 'dataset/val/images'
-val_lbl_dir = 'dataset/val/labels'
 
-# Create output directories if they don't exist
-for d in [train_img_dir, train_lbl_dir, val_img_dir, val_lbl_dir]:
-    os.makedirs(d, exist_ok=True)
+def link_or_copy(src, dst):
+    """Hardlink, else reflink, else copy; returns the method used"""
+    try:
+        os.unlink(dst)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, dst)
+        return 'link'
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+    if fcntl:
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst)
+            return 'reflink'
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+    return 'copy'
 
-# Get all image files (.jpg) in the mixed directory
-image_files = [f for f in os.listdir(mixed_dir) if f.lower().endswith('.jpg')]
-image_files.sort()
 
-# Shuffle and split 80% train, 20% val
-random.seed(42)
-random.shuffle(image_files)
+def stat_key(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
 
-total = len(image_files)
-split_idx = int(0.8 * total)
-train_images = image_files[:split_idx]
-val_images = image_files[split_idx:]
 
-print(f"📊 Total: {total} | Train: {len(train_images)} | Val: {len(val_images)}")
+class DatasetSplitter:
+    """Incremental train/val split driven by a manifest of what was already placed"""
 
-# Helper to move image and matching label
-def move_files(image_list, img_dst, lbl_dst):
-    for img_file in image_list:
-        img_src = os.path.join(mixed_dir, img_file)
-        lbl_file = os.path.splitext(img_file)[0] + '.txt'
-        lbl_src = os.path.join(mixed_dir, lbl_file)
+    def __init__(self, mixed_dir, dataset_dir, val_fraction, workers):
+        self.mixed_dir = mixed_dir
+        self.dataset_dir = dataset_dir
+        self.val_fraction = val_fraction
+        self.workers = workers
+        self.manifest_path = os.path.join(dataset_dir, MANIFEST_NAME)
+        self.files = {}  # image name -> {hash, split, image, label}
+        self.methods = {}
 
-        shutil.copy2(img_src, os.path.join(img_dst, img_file))
+    def target(self, split, kind, name):
+        return os.path.join(self.dataset_dir, split, kind, name)
 
-        if os.path.exists(lbl_src):
-            shutil.copy2(lbl_src, os.path.join(lbl_dst, lbl_file))
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('val_fraction') == self.val_fraction:
+            self.files = manifest['files']
         else:
-            print(f"⚠️  Missing label for {img_file}, skipping label copy.")
+            # Keep the hashes, re-derive every split
+            self.files = {name: dict(entry, split=None) for name, entry in manifest['files'].items()}
+
+    def save_manifest(self):
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'version': 1, 'val_fraction': self.val_fraction, 'files': self.files}, f,
+                      indent=1, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def scan(self):
+        """Image names mapped to (image stat, label stat)"""
+        found = {}
+        with os.scandir(self.mixed_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    label = os.path.join(self.mixed_dir, os.path.splitext(entry.name)[0] + '.txt')
+                    st = entry.stat()
+                    found[entry.name] = ([st.st_size, st.st_mtime_ns], stat_key(label))
+        return found
+
+    def place(self, name, image_key, label_key):
+        """Hash (only if the image changed) and link one image and its label into its split"""
+        entry = self.files.get(name)
+        src = os.path.join(self.mixed_dir, name)
+        label_name = os.path.splitext(name)[0] + '.txt'
+        image_changed = not entry or entry.get('image') != image_key
+        digest = content_hash(src) if image_changed else entry['hash']
+        split = split_for(digest, self.val_fraction)
+        old_split = entry.get('split') if entry else None
+
+        if old_split and old_split != split:
+            self.remove_links(name, old_split)
+        methods = []
+        if image_changed or old_split != split or not os.path.exists(self.target(split, 'images', name)):
+            methods.append(link_or_copy(src, self.target(split, 'images', name)))
+        label_target = self.target(split, 'labels', label_name)
+        if label_key:
+            if (image_changed or old_split != split or entry.get('label') != label_key
+                    or not os.path.exists(label_target)):
+                methods.append(link_or_copy(os.path.join(self.mixed_dir, label_name), label_target))
+        elif os.path.exists(label_target):
+            os.unlink(label_target)
+
+        self.files[name] = {'hash': digest, 'split': split, 'image': image_key, 'label': label_key}
+        return methods
+
+    def remove_links(self, name, split):
+        for path in (self.target(split, 'images', name),
+                     self.target(split, 'labels', os.path.splitext(name)[0] + '.txt')):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def run(self):
+        for split in SPLITS:
+            for kind in ('images', 'labels'):
+                os.makedirs(os.path.join(self.dataset_dir, split, kind), exist_ok=True)
+        self.load_manifest()
+        found = self.scan()
+
+        removed = [name for name in self.files if name not in found]
+        for name in removed:
+            if self.files[name].get('split'):
+                self.remove_links(name, self.files[name]['split'])
+            del self.files[name]
+
+        pending = [(name, keys) for name, keys in found.items()
+                   if name not in self.files or self.files[name].get('split') is None
+                   or self.files[name].get('image') != keys[0] or self.files[name].get('label') != keys[1]]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for methods in pool.map(lambda item: self.place(item[0], *item[1]), pending):
+                for method in methods:
+                    self.methods[method] = self.methods.get(method, 0) + 1
+
+        self.save_manifest()
+        return len(found), len(pending), len(removed)
+
+    def strays(self):
+        """Paths in the split directories the manifest does not place there
+
+        Leftovers from the old random split, or files added to the dataset
+        by hand, which could leak images between train and val.
+        """
+        expected = set()
+        for name, entry in self.files.items():
+            expected.add((entry['split'], 'images', name))
+            if entry['label']:
+                expected.add((entry['split'], 'labels', os.path.splitext(name)[0] + '.txt'))
+        found = []
+        for split in SPLITS:
+            for kind in ('images', 'labels'):
+                directory = os.path.join(self.dataset_dir, split, kind)
+                for name in sorted(os.listdir(directory)):
+                    if (split, kind, name) not in expected:
+                        found.append(os.path.join(split, kind, name))
+        return found
+
+    def quarantine(self, strays):
+        """Move stray files (paths relative to the dataset) aside rather than deleting them"""
+        root = os.path.join(self.dataset_dir, QUARANTINE_DIR, time.strftime('%Y%m%d-%H%M%S'))
+        for path in strays:
+            target = os.path.join(root, path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(os.path.join(self.dataset_dir, path), target)
+        return root
+
+    def counts(self):
+        totals = {split: 0 for split in SPLITS}
+        unlabeled = 0
+        for entry in self.files.values():
+            totals[entry['split']] += 1
+            unlabeled += entry['label'] is None
+        return totals, unlabeled
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split images/cars into dataset/train and dataset/val")
+    parser.add_argument('--source', default=MIXED_DIR, help="directory of images and YOLO .txt labels")
+    parser.add_argument('--dataset', default=DATASET_DIR)
+    parser.add_argument('--val-fraction', type=float, default=VAL_FRACTION)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--prune', action='store_true',
+                        help=f"move files the manifest does not list into {DATASET_DIR}/{QUARANTINE_DIR}/ "
+                             "(default: only list them)")
+    args = parser.parse_args()
+
+    started = time.time()
+    splitter = DatasetSplitter(args.source, args.dataset, args.val_fraction, args.workers)
+    total, processed, removed = splitter.run()
+    totals, unlabeled = splitter.counts()
+    strays = splitter.strays()
+
+    print(f"📊 Total: {total} | Train: {totals['train']} | Val: {totals['val']}")
+    print(f"🔄 {processed} new or changed, {removed} removed, {total - processed} unchanged "
+          f"({', '.join(f'{n} {m}' for m, n in sorted(splitter.methods.items())) or 'nothing placed'})")
+    if unlabeled:
+        print(f"⚠️  {unlabeled} images have no label file")
+    if strays and args.prune:
+        print(f"🧹 Moved {len(strays)} files not in the manifest to {splitter.quarantine(strays)}")
+    elif strays:
+        print(f"⚠️  {len(strays)} files in the split directories are not in the manifest (--prune moves them aside):")
+        for path in strays:
+            print(f"   {path}")
+    print(f"✅ Dataset split complete in {time.time() - started:.1f}s: see {splitter.manifest_path}")
 
-# Move files
-move_files(train_images, train_img_dir, train_lbl_dir)
-move_files(val_images, val_img_dir, val_lbl_dir)
 
-print("✅ Dataset split complete: Check 'dataset/train' and 'dataset/val'.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,58 @@
 import cv2
-from ultralytics import YOLO
+import logging
 import pytesseract
 import os
 import time
-import serial
-import serial.tools.list_ports
 from collections import Counter
 from database import ParkingDatabase
+from hard_examples import HardExampleMiner, ambiguous_vote
+from passage_trace import TraceExporter
+from lane_startup import OCR_CONFIG, LaneStartup, connect_gate, load_model, open_camera, warm_ocr
+from log_config import configure
+
+log = logging.getLogger('car_entry')
+configure(os.getenv('GATE_NAME', 'entry'))
 
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 #pytesseract.pytesseract.tesseract_cmd = r'C:/Program Files/Tesseract-OCR/tesseract.exe'
 
-# Load YOLOv8 model
-model = YOLO('best.pt')
-
 # Plate save directory
 save_dir = 'plates'
 os.makedirs(save_dir, exist_ok=True)
 
-# Initialize database
-db = ParkingDatabase()
-
-# ===== Auto-detect Arduino Serial Port =====
-def detect_arduino_port():
-    ports = list(serial.tools.list_ports.comports())
-    for port in ports:
-        if "COM" in port.device or "COM" in port.device:
-            return port.device
-    return None
-
-# Initialize Arduino connection
-arduino_port = detect_arduino_port()
-arduino = None
-if arduino_port:
-    try:
-        arduino = serial.Serial(arduino_port, 9600, timeout=1)
-        print(f"[ARDUINO] Connected to {arduino_port}")
-    except:
-        print("[ARDUINO] Failed to connect")
-        arduino = None
+def is_gate_status(line):
+    return line in ('GATE_OPENED', 'GATE_CLOSED', 'ALARM_TRIGGERED')
+
+# Model (with a warm-up inference), OCR, database, gate board and camera come up together
+startup = LaneStartup(os.getenv('GATE_NAME', 'entry'))
+startup.add('model', load_model)
+startup.add('ocr', warm_ocr)
+startup.add('database', ParkingDatabase)
+startup.add('arduino', lambda: connect_gate('entry_gate'), required=False)
+startup.add('camera', lambda: open_camera(int(os.getenv('CAMERA_INDEX', '0'))))
+components = startup.run()
+model, db, arduino, cap = (components[name] for name in ('model', 'database', 'arduino', 'camera'))
+if startup.state == 'failed':
+    startup.abort(components)
+if arduino:
+    arduino.subscribe(is_gate_status, lambda line: log.info("[ARDUINO] %s", line))
 
 # Mock ultrasonic sensor for testing
 def mock_ultrasonic_distance():
     return 30  # Simulate vehicle at 30cm
 
-# Initialize webcam
-cap = cv2.VideoCapture(0)
+# Frames the detector or OCR struggled with feed the next training round
+miner = HardExampleMiner(os.getenv('GATE_NAME', 'entry')).start()
+
+# Span timings per vehicle, from first detection to the gate closing
+tracer = TraceExporter(os.getenv('GATE_NAME', 'entry')).start()
+
 plate_buffer = []
 entry_cooldown = 300  # 5 minutes
 last_saved_plate = None
 last_entry_time = 0
 
-print("[SYSTEM] Ready. Press 'q' to exit.")
+log.info("[SYSTEM] Ready. Press 'q' to exit.")
 
 while True:
     ret, frame = cap.read()
@@ -59,27 +60,39 @@ while True:
         break
 
     distance = mock_ultrasonic_distance()
-    print(f"[SENSOR] Distance: {distance} cm")
+    log.debug("[SENSOR] Distance: %s cm", distance)
 
     if distance <= 50:
+        detect_started = time.perf_counter()
         results = model(frame)
+        boxes = sum(len(result.boxes) for result in results)
+        if boxes:
+            tracer.begin(detect_started).record('detect', detect_started, boxes=boxes)
+        else:
+            tracer.active()  # ends a passage that has gone quiet
 
         for result in results:
+            if miner.low_confidence(result):
+                miner.consider(frame, result, 'low_confidence')
             for box in result.boxes:
                 x1, y1, x2, y2 = map(int, box.xyxy[0])
                 plate_img = frame[y1:y2, x1:x2]
+                trace = tracer.begin(detect_started)  # a new one if this frame's vote already finished it
 
-                # Plate Image Processing
-                gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
-                blur = cv2.GaussianBlur(gray, (5, 5), 0)
-                thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+                with trace.span('ocr') as ocr_span:
+                    # Plate Image Processing
+                    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
+                    blur = cv2.GaussianBlur(gray, (5, 5), 0)
+                    thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
 
-                # OCR Extraction
-                plate_text = pytesseract.image_to_string(
-                    thresh, config='--psm 8 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-                ).strip().replace(" ", "")
+                    # OCR Extraction
+                    plate_text = pytesseract.image_to_string(
+                        thresh, config=OCR_CONFIG
+                    ).strip().replace(" ", "")
+                    ocr_span['text'] = plate_text
 
                 # Plate Validation
+                plate_valid = False
                 if "RA" in plate_text:
                     start_idx = plate_text.find("RA")
                     plate_candidate = plate_text[start_idx:]
@@ -88,12 +101,17 @@ while True:
                         prefix, digits, suffix = plate_candidate[:3], plate_candidate[3:6], plate_candidate[6]
                         if (prefix.isalpha() and prefix.isupper() and
                             digits.isdigit() and suffix.isalpha() and suffix.isupper()):
-                            print(f"[VALID] Plate Detected: {plate_candidate}")
+                            log.info("[VALID] Plate Detected: %s", plate_candidate)
+                            plate_valid = True
                             plate_buffer.append(plate_candidate)
 
                             # Decision after 3 captures
                             if len(plate_buffer) >= 3:
                                 most_common = Counter(plate_buffer).most_common(1)[0][0]
+                                trace.plate = most_common
+                                trace.mark('vote', plate=most_common, reads=len(plate_buffer))
+                                if ambiguous_vote(plate_buffer):
+                                    miner.consider(frame, result, 'ambiguous_vote', reads=list(plate_buffer))
                                 current_time = time.time()
 
                                 if (most_common != last_saved_plate or
@@ -101,26 +119,36 @@ while True:
 
                                     # Add to database instead of CSV
                                     # db.add_vehicle_entry(most_common)
-                                    db.add_vehicle(most_common)
-                                    print(f"[SAVED] {most_common} logged to database.")
+                                    with trace.span('db'):
+                                        db.add_vehicle(most_common, trace.trace_id)
+                                    log.info("[SAVED] %s logged to database.", most_common)
 
                                     if arduino:
-                                        arduino.write(b'1')
-                                        print("[GATE] Opening gate (sent '1')")
-                                        time.sleep(15)  # Gate open duration
-                                        arduino.write(b'0')
-                                        print("[GATE] Closing gate (sent '0')")
+                                        with trace.span('gate_open'):
+                                            arduino.send(b'1')
+                                        log.info("[GATE] Opening gate (sent '1')")
+                                        with trace.span('gate_hold'):
+                                            time.sleep(15)  # Gate open duration
+                                        with trace.span('gate_close'):
+                                            arduino.send(b'0')
+                                        log.info("[GATE] Closing gate (sent '0')")
 
                                     last_saved_plate = most_common
                                     last_entry_time = current_time
+                                    tracer.finish('entered')
                                 else:
-                                    print("[SKIPPED] Duplicate within 5 min window.")
+                                    log.info("[SKIPPED] Duplicate within 5 min window.")
+                                    tracer.finish('duplicate')
 
                                 plate_buffer.clear()
 
-                cv2.imshow("Plate", plate_img)
-                cv2.imshow("Processed", thresh)
-                time.sleep(0.5)
+                if not plate_valid:
+                    miner.consider(frame, result, 'ocr_invalid', text=plate_text)
+
+                with trace.span('preview'):
+                    cv2.imshow("Plate", plate_img)
+                    cv2.imshow("Processed", thresh)
+                    time.sleep(0.5)
 
     annotated_frame = results[0].plot() if distance <= 50 else frame
     cv2.imshow('Webcam Feed', annotated_frame)
@@ -129,6 +157,8 @@ while True:
         break
 
 cap.release()
+miner.stop()
+tracer.stop()
 if arduino:
     arduino.close()
 cv2.destroyAllWindows()
\ No newline at end of file
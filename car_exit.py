@@ -1,46 +1,52 @@
 import cv2
-from ultralytics import YOLO
+import logging
 import pytesseract
 import os
 import time
-import serial
-import serial.tools.list_ports
 from collections import Counter
 from database import ParkingDatabase
+from hard_examples import HardExampleMiner, ambiguous_vote
+from session_index import OpenSessionIndex
+from plate_matcher import PlateResolver
+from passage_trace import TraceExporter
+from lane_startup import OCR_CONFIG, LaneStartup, connect_gate, load_model, open_camera, warm_ocr
+from log_config import configure
 from datetime import datetime
 import signal
 import sys
 
+log = logging.getLogger('car_exit')
+configure(os.getenv('GATE_NAME', 'exit'))
+
 # Set tesseract path for Windows
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
-# Load YOLOv8 model
-model = YOLO('best.pt')
-
 # Plate save directory
 save_dir = 'plates'
 os.makedirs(save_dir, exist_ok=True)
 
-# Initialize database
-db = ParkingDatabase()
+# Reported with unauthorized exits; gate_supervisor.py names each lane's gate
+gate_location = os.getenv('GATE_NAME', 'Unknown')
 
 # Global variables for cleanup
 arduino = None
 cap = None
+session_index = None
+miner = None
+tracer = None
 gate_open = False
 
 def cleanup():
     """Cleanup function to ensure gate is closed and resources are released"""
     global arduino, cap, gate_open
     
-    print("\n[SYSTEM] Cleaning up...")
+    log.info("[SYSTEM] Cleaning up...")
     
     # Close gate if it's open
     if gate_open and arduino:
         try:
-            print("[GATE] Ensuring gate is closed...")
-            arduino.write(b'0')
-            time.sleep(1)  # Give Arduino time to process
+            log.info("[GATE] Ensuring gate is closed...")
+            arduino.request(b'0', expect=lambda line: line == 'GATE_CLOSED', timeout=2)
         except:
             pass
     
@@ -48,23 +54,29 @@ def cleanup():
     if arduino:
         try:
             arduino.close()
-            print("[ARDUINO] Connection closed")
+            log.info("[ARDUINO] Connection closed")
         except:
             pass
     
     if cap:
         try:
             cap.release()
-            print("[CAMERA] Released")
+            log.info("[CAMERA] Released")
         except:
             pass
     
+    if session_index:
+        session_index.stop()
+    if miner:
+        miner.stop()
+    if tracer:
+        tracer.stop()
     cv2.destroyAllWindows()
-    print("[SYSTEM] Cleanup complete")
+    log.info("[SYSTEM] Cleanup complete")
 
 def signal_handler(signum, frame):
     """Handle system signals for graceful shutdown"""
-    print("\n[SYSTEM] Received shutdown signal")
+    log.info("[SYSTEM] Received shutdown signal")
     cleanup()
     sys.exit(0)
 
@@ -72,89 +84,94 @@ def signal_handler(signum, frame):
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
-# ===== Auto-detect Arduino Serial Port =====
-def detect_arduino_port():
-    ports = list(serial.tools.list_ports.comports())
-    for port in ports:
-        if "COM" in port.device or "COM" in port.device:
-            return port.device
-    return None
-
-# Initialize Arduino connection
-arduino_port = detect_arduino_port()
-if arduino_port:
-    try:
-        arduino = serial.Serial(arduino_port, 9600, timeout=1)
-        print(f"[ARDUINO] Connected to {arduino_port}")
-    except:
-        print("[ARDUINO] Failed to connect")
-        arduino = None
+def is_gate_status(line):
+    return line in ('GATE_OPENED', 'GATE_CLOSED', 'ALARM_TRIGGERED')
+
+def load_sessions():
+    """Database plus the warm-loaded open sessions, so exit decisions are local lookups"""
+    db = ParkingDatabase()
+    index = OpenSessionIndex(db)
+    index.start()
+    return db, index
+
+# Model (with a warm-up inference), OCR, sessions, gate board and camera come up together
+startup = LaneStartup(os.getenv('GATE_NAME', 'exit'))
+startup.add('model', load_model)
+startup.add('ocr', warm_ocr)
+startup.add('database', load_sessions)
+startup.add('arduino', lambda: connect_gate('exit_gate'), required=False)
+startup.add('camera', lambda: open_camera(int(os.getenv('CAMERA_INDEX', '0'))))
+components = startup.run()
+model, arduino, cap = components['model'], components['arduino'], components['camera']
+db, session_index = components['database'] or (None, None)
+if startup.state == 'failed':
+    cleanup()
+    startup.abort()
+if arduino:
+    arduino.subscribe(is_gate_status, lambda line: log.info("[ARDUINO] %s", line))
+plate_resolver = PlateResolver(session_index)
 
-def check_payment_status(plate_number):
+def check_payment_status(plate_number, trace_id=None):
     """Check if vehicle has paid and update exit time"""
-    try:
-        with db.conn.cursor() as cur:
-            # Get the most recent paid entry
-            cur.execute("""
-                SELECT id, entry_time 
-                FROM vehicles 
-                WHERE plate_number = %s 
-                AND payment_status = 1 
-                AND exit_time IS NULL
-                ORDER BY entry_time DESC 
-                LIMIT 1
-            """, (plate_number,))
-            result = cur.fetchone()
-            
-            if result:
-                vehicle_id, entry_time = result
-                # Update exit time
-                cur.execute("""
-                    UPDATE vehicles 
-                    SET exit_time = %s
-                    WHERE id = %s
-                """, (datetime.now(), vehicle_id))
-                db.conn.commit()
-                return True
+    session = session_index.get_paid(plate_number)
+    if not session:
+        # Before denying, ask the database: a payment whose NOTIFY is still in
+        # flight, or was lost while the listener reconnected, is not indexed yet
+        session = db.get_paid_session(plate_number)
+        if not session:
             return False
-    except Exception as e:
-        print(f"[ERROR] Database error: {str(e)}")
-        return False
+        log.warning("[INDEX] Paid session for %s missing from the index, reconciling", plate_number)
+        session_index.invalidate()
+
+    vehicle_id, entry_time, payment_status = session
+    if db.close_session(vehicle_id, trace_id=trace_id):
+        session_index.remove(plate_number, vehicle_id)
+        return True
+
+    # Index was stale; resync before the next decision
+    log.warning("[INDEX] Session %s for %s no longer open, reconciling", vehicle_id, plate_number)
+    session_index.invalidate()
+    return False
 
 def control_gate(action):
     """Control the gate with proper error handling"""
     global arduino, gate_open
     
     if not arduino:
-        print("[ERROR] Arduino not connected")
+        log.error("[ERROR] Arduino not connected")
         return False
         
     try:
         if action == 'open':
-            arduino.write(b'1')
-            print("[GATE] Opening gate")
+            arduino.send(b'1')
+            log.info("[GATE] Opening gate")
             gate_open = True
         elif action == 'close':
-            arduino.write(b'0')
-            print("[GATE] Closing gate")
+            arduino.send(b'0')
+            log.info("[GATE] Closing gate")
             gate_open = False
         return True
     except Exception as e:
-        print(f"[ERROR] Gate control error: {str(e)}")
+        log.error("[ERROR] Gate control error: %s", e)
         return False
 
 # Mock ultrasonic sensor for testing
 def mock_ultrasonic_distance():
     return 30  # Simulate vehicle at 30cm
 
-# Initialize webcam
-cap = cv2.VideoCapture(0)
+# Frames the detector or OCR struggled with feed the next training round
+miner = HardExampleMiner(os.getenv('GATE_NAME', 'exit')).start()
+
+# Span timings per vehicle, from first detection to the gate closing
+tracer = TraceExporter(os.getenv('GATE_NAME', 'exit')).start()
+
 plate_buffer = []
+fast_decision_reads = 2  # matching reads of a parked plate needed to decide early
 exit_cooldown = 300  # 5 minutes
 last_saved_plate = None
 last_exit_time = 0
 
-print("[SYSTEM] Ready. Press 'q' to exit.")
+log.info("[SYSTEM] Ready. Press 'q' to exit.")
 
 try:
     while True:
@@ -163,27 +180,39 @@ try:
             break
 
         distance = mock_ultrasonic_distance()
-        print(f"[SENSOR] Distance: {distance} cm")
+        log.debug("[SENSOR] Distance: %s cm", distance)
 
         if distance <= 50:
+            detect_started = time.perf_counter()
             results = model(frame)
+            boxes = sum(len(result.boxes) for result in results)
+            if boxes:
+                tracer.begin(detect_started).record('detect', detect_started, boxes=boxes)
+            else:
+                tracer.active()  # ends a passage that has gone quiet
 
             for result in results:
+                if miner.low_confidence(result):
+                    miner.consider(frame, result, 'low_confidence')
                 for box in result.boxes:
                     x1, y1, x2, y2 = map(int, box.xyxy[0])
                     plate_img = frame[y1:y2, x1:x2]
+                    trace = tracer.begin(detect_started)  # a new one if this frame's vote already finished it
 
-                    # Plate Image Processing
-                    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
-                    blur = cv2.GaussianBlur(gray, (5, 5), 0)
-                    thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+                    with trace.span('ocr') as ocr_span:
+                        # Plate Image Processing
+                        gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
+                        blur = cv2.GaussianBlur(gray, (5, 5), 0)
+                        thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
 
-                    # OCR Extraction
-                    plate_text = pytesseract.image_to_string(
-                        thresh, config='--psm 8 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-                    ).strip().replace(" ", "")
+                        # OCR Extraction
+                        plate_text = pytesseract.image_to_string(
+                            thresh, config=OCR_CONFIG
+                        ).strip().replace(" ", "")
+                        ocr_span['text'] = plate_text
 
                     # Plate Validation
+                    plate_valid = False
                     if "RA" in plate_text:
                         start_idx = plate_text.find("RA")
                         plate_candidate = plate_text[start_idx:]
@@ -192,43 +221,72 @@ try:
                             prefix, digits, suffix = plate_candidate[:3], plate_candidate[3:6], plate_candidate[6]
                             if (prefix.isalpha() and prefix.isupper() and
                                 digits.isdigit() and suffix.isalpha() and suffix.isupper()):
-                                print(f"[VALID] Plate Detected: {plate_candidate}")
-                                plate_buffer.append(plate_candidate)
-
-                                # Decision after 3 captures
-                                if len(plate_buffer) >= 3:
+                                log.info("[VALID] Plate Detected: %s", plate_candidate)
+                                plate_valid = True
+
+                                # Snap OCR misreads onto a parked plate
+                                resolved = plate_resolver.best_match(plate_candidate)
+                                if resolved and resolved != plate_candidate:
+                                    log.info("[FUZZY] %s resolved to %s", plate_candidate, resolved)
+                                plate_buffer.append(resolved or plate_candidate)
+
+                                # Decision after 3 captures, or sooner once reads agree on a parked plate
+                                agreed = (resolved and
+                                          plate_buffer[-fast_decision_reads:].count(resolved) == fast_decision_reads)
+                                if len(plate_buffer) >= 3 or agreed:
                                     most_common = Counter(plate_buffer).most_common(1)[0][0]
+                                    trace.plate = most_common
+                                    trace.mark('vote', plate=most_common, reads=len(plate_buffer))
+                                    if ambiguous_vote(plate_buffer):
+                                        miner.consider(frame, result, 'ambiguous_vote', reads=list(plate_buffer))
                                     current_time = time.time()
 
                                     if (most_common != last_saved_plate or
                                         (current_time - last_exit_time) > exit_cooldown):
 
                                         # Check payment status
-                                        if check_payment_status(most_common):
-                                            print(f"[AUTHORIZED] Exit granted for {most_common}")
-                                            if control_gate('open'):
+                                        with trace.span('db'):
+                                            paid = check_payment_status(most_common, trace.trace_id)
+                                        if paid:
+                                            log.info("[AUTHORIZED] Exit granted for %s", most_common)
+                                            with trace.span('gate_open'):
+                                                opened = control_gate('open')
+                                            if opened:
                                                 try:
-                                                    time.sleep(15)  # Gate open duration
+                                                    with trace.span('gate_hold'):
+                                                        time.sleep(15)  # Gate open duration
                                                 finally:
-                                                    control_gate('close')
+                                                    with trace.span('gate_close'):
+                                                        control_gate('close')
+                                            tracer.finish('exited')
                                         else:
-                                            print(f"[ALERT] Unauthorized exit attempt for {most_common}")
-                                            db.record_unauthorized_exit(most_common)
+                                            log.warning("[ALERT] Unauthorized exit attempt for %s", most_common)
+                                            with trace.span('db_unauthorized'):
+                                                db.record_unauthorized_exit(most_common, gate_location, trace.trace_id)
                                             if arduino:
-                                                arduino.write(b'2')  # Signal for alarm
-                                                time.sleep(5)
-                                                arduino.write(b'0')
+                                                # The sketch reports back once the 5 s alarm has finished
+                                                with trace.span('alarm'):
+                                                    arduino.request(b'2', expect=lambda line: line == 'ALARM_TRIGGERED',
+                                                                    timeout=7)
+                                                with trace.span('gate_close'):
+                                                    arduino.send(b'0')
+                                            tracer.finish('unauthorized')
 
                                         last_saved_plate = most_common
                                         last_exit_time = current_time
                                     else:
-                                        print("[SKIPPED] Duplicate within 5 min window.")
+                                        log.info("[SKIPPED] Duplicate within 5 min window.")
+                                        tracer.finish('duplicate')
 
                                     plate_buffer.clear()
 
-                    cv2.imshow("Plate", plate_img)
-                    cv2.imshow("Processed", thresh)
-                    time.sleep(0.5)
+                    if not plate_valid:
+                        miner.consider(frame, result, 'ocr_invalid', text=plate_text)
+
+                    with trace.span('preview'):
+                        cv2.imshow("Plate", plate_img)
+                        cv2.imshow("Processed", thresh)
+                        time.sleep(0.5)
 
         annotated_frame = results[0].plot() if distance <= 50 else frame
         cv2.imshow('Webcam Feed', annotated_frame)
@@ -237,9 +295,9 @@ try:
             break
 
 except KeyboardInterrupt:
-    print("\n[SYSTEM] Interrupted by user")
+    log.info("[SYSTEM] Interrupted by user")
 except Exception as e:
-    print(f"\n[ERROR] An error occurred: {str(e)}")
+    log.exception("[ERROR] An error occurred: %s", e)
 finally:
     cleanup()
 
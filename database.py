@@ -1,13 +1,31 @@
+import logging
 import psycopg2
-from datetime import datetime
+from psycopg2.pool import ThreadedConnectionPool
+import threading
+from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
 
+log = logging.getLogger('database')
+
 # Load environment variables from .env
 load_dotenv()
 
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '90'))
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', '2'))
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+def date_trunc_hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def add_months(moment, months):
+    month = moment.month - 1 + months
+    return datetime(moment.year + month // 12, month % 12 + 1, 1)
+
 class ParkingDatabase:
-    def __init__(self):
+    def __init__(self, pool_size=None):
         self.conn_params = {
             'host': os.getenv('DB_HOST', 'localhost'),
             'port': os.getenv('DB_PORT', '5432'),
@@ -15,17 +33,81 @@ class ParkingDatabase:
             'user': os.getenv('DB_USER', 'postgres'),
             'password': os.getenv('DB_PASSWORD', '')
         }
-        self.conn = None
-        self.connect()
+        self.pool = None
+        self.local = threading.local()
+        self._conn = None
+        if pool_size:
+            self.connect_pool(pool_size)
+        else:
+            self.connect()
 
     def connect(self):
         try:
             self.conn = psycopg2.connect(**self.conn_params)
-            print("✅ Database connection established")
+            log.info("✅ Database connection established")
+        except Exception as e:
+            log.error("❌ Database connection error: %s", e)
+            raise
+
+    def connect_pool(self, pool_size):
+        """Give each thread its own pooled connection (used by the API server)"""
+        try:
+            self.pool = ThreadedConnectionPool(1, pool_size, **self.conn_params)
+            log.info("✅ Database pool established (%s connections)", pool_size)
         except Exception as e:
-            print(f"❌ Database connection error: {str(e)}")
+            log.error("❌ Database connection error: %s", e)
             raise
 
+    @property
+    def conn(self):
+        if self.pool is None:
+            return self._conn
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or conn.closed:
+            conn = self.pool.getconn()
+            self.local.conn = conn
+        return conn
+
+    @conn.setter
+    def conn(self, value):
+        self._conn = value
+
+    def release(self):
+        """Return this thread's pooled connection"""
+        conn = getattr(self.local, 'conn', None)
+        if self.pool is None or conn is None:
+            return
+        self.local.conn = None
+        if not conn.closed:
+            conn.rollback()
+        self.pool.putconn(conn, close=bool(conn.closed))
+
+    def ping(self):
+        """True if the database answers"""
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+            self.conn.rollback()
+            return True
+        except Exception as e:
+            log.warning("Database ping failed: %s", e)
+            try:
+                self.conn.rollback()
+            except Exception:
+                pass
+            return False
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.closeall()
+            self.pool = None
+            log.info("🛑 Database pool closed")
+        elif self._conn:
+            self._conn.close()
+            self._conn = None
+            log.info("🛑 Database connection closed")
+
     def get_connection(self):
         return self.conn
 
@@ -34,19 +116,97 @@ class ParkingDatabase:
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        # vehicles table
+        # A vehicles table from before partitioning is moved aside and copied over
+        cursor.execute("""
+            SELECT relkind FROM pg_class
+            WHERE relname = 'vehicles' AND relnamespace = 'public'::regnamespace
+        """)
+        row = cursor.fetchone()
+        legacy = row is not None and row[0] == 'r'
+        if legacy:
+            cursor.execute("ALTER TABLE vehicles RENAME TO vehicles_unpartitioned")
+
+        # vehicles table, partitioned by month of entry
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS vehicles (
-                id SERIAL PRIMARY KEY,
+                id SERIAL,
+                plate_number VARCHAR(10) NOT NULL,
+                entry_time TIMESTAMP NOT NULL,
+                exit_time TIMESTAMP,
+                payment_status INTEGER DEFAULT 0,
+                payment_amount DECIMAL(10, 2),
+                payment_time TIMESTAMP,
+                entry_trace_id VARCHAR(32),
+                exit_trace_id VARCHAR(32),
+                PRIMARY KEY (id, entry_time)
+            ) PARTITION BY RANGE (entry_time)
+        ''')
+        cursor.execute("CREATE TABLE IF NOT EXISTS vehicles_default PARTITION OF vehicles DEFAULT")
+
+        # Closed sessions past ARCHIVE_AFTER_DAYS end up here
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS vehicles_archive (
+                id INTEGER NOT NULL,
                 plate_number VARCHAR(10) NOT NULL,
                 entry_time TIMESTAMP NOT NULL,
                 exit_time TIMESTAMP,
                 payment_status INTEGER DEFAULT 0,
                 payment_amount DECIMAL(10, 2),
-                payment_time TIMESTAMP
+                payment_time TIMESTAMP,
+                entry_trace_id VARCHAR(32),
+                exit_trace_id VARCHAR(32),
+                PRIMARY KEY (id, entry_time)
             )
         ''')
 
+        # Passage trace IDs (see passage_trace.py), added to tables from before tracing
+        for table in ('vehicles', 'vehicles_archive'):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS entry_trace_id VARCHAR(32)")
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS exit_trace_id VARCHAR(32)")
+        conn.commit()
+
+        start = None
+        if legacy:
+            cursor.execute("SELECT MIN(entry_time) FROM vehicles_unpartitioned")
+            start = cursor.fetchone()[0]
+        self.ensure_partitions(start=start)
+
+        if legacy:
+            cursor.execute("""
+                INSERT INTO vehicles (id, plate_number, entry_time, exit_time, payment_status,
+                                      payment_amount, payment_time)
+                SELECT id, plate_number, entry_time, exit_time, payment_status,
+                       payment_amount, payment_time
+                FROM vehicles_unpartitioned
+            """)
+            cursor.execute("""
+                SELECT setval(pg_get_serial_sequence('vehicles', 'id'),
+                              COALESCE((SELECT MAX(id) FROM vehicles), 1))
+            """)
+            cursor.execute("DROP TABLE vehicles_unpartitioned")
+            log.info("✅ Migrated vehicles to a partitioned table")
+
+        # Live and archived sessions together, for history and lifetime totals
+        cursor.execute('''
+            CREATE OR REPLACE VIEW vehicle_history AS
+            SELECT id, plate_number, entry_time, exit_time, payment_status,
+                   payment_amount, payment_time, entry_trace_id, exit_trace_id
+            FROM vehicles
+            UNION ALL
+            SELECT id, plate_number, entry_time, exit_time, payment_status,
+                   payment_amount, payment_time, entry_trace_id, exit_trace_id
+            FROM vehicles_archive
+        ''')
+
+        cursor.execute("CREATE INDEX IF NOT EXISTS vehicles_entry_time_idx ON vehicles (entry_time)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS vehicles_archive_entry_time_idx ON vehicles_archive (entry_time)")
+
+        # Open sessions stay in a tiny partial index on every partition
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS vehicles_open_idx
+            ON vehicles (plate_number, entry_time) WHERE exit_time IS NULL
+        ''')
+
         # unauthorized_exits table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS unauthorized_exits (
@@ -55,26 +215,312 @@ class ParkingDatabase:
                 reason TEXT,
                 plate_number VARCHAR(10) NOT NULL,
                 exit_time TIMESTAMP NOT NULL,
-                gate_location VARCHAR(10) NOT NULL
+                gate_location VARCHAR(10) NOT NULL,
+                trace_id VARCHAR(32)
             )
         ''')
+        cursor.execute("ALTER TABLE unauthorized_exits ADD COLUMN IF NOT EXISTS trace_id VARCHAR(32)")
+
+        # Trigram index for partial / misread plate searches
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS vehicles_plate_trgm_idx
+            ON vehicles USING GIN (plate_number gin_trgm_ops)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS vehicles_archive_plate_trgm_idx
+            ON vehicles_archive USING GIN (plate_number gin_trgm_ops)
+        ''')
+
+        # Notify gate processes when a session is opened, paid or closed
+        cursor.execute('''
+            CREATE OR REPLACE FUNCTION notify_vehicle_session() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('vehicle_sessions', json_build_object(
+                    'id', NEW.id,
+                    'plate_number', NEW.plate_number,
+                    'entry_time', NEW.entry_time,
+                    'exit_time', NEW.exit_time,
+                    'payment_status', NEW.payment_status
+                )::text);
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        ''')
+        cursor.execute("DROP TRIGGER IF EXISTS vehicles_session_notify ON vehicles")
+        cursor.execute('''
+            CREATE TRIGGER vehicles_session_notify
+            AFTER INSERT OR UPDATE ON vehicles
+            FOR EACH ROW EXECUTE FUNCTION notify_vehicle_session()
+        ''')
+
+        # Hourly rollups of entries, exits, payments and unauthorized exits
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS hourly_stats (
+                hour TIMESTAMP PRIMARY KEY,
+                entries INTEGER NOT NULL DEFAULT 0,
+                exits INTEGER NOT NULL DEFAULT 0,
+                stay_seconds BIGINT NOT NULL DEFAULT 0,
+                payments INTEGER NOT NULL DEFAULT 0,
+                revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+                unauthorized_exits INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            CREATE OR REPLACE FUNCTION rollup_vehicle_event() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    INSERT INTO hourly_stats (hour, entries)
+                    VALUES (date_trunc('hour', NEW.entry_time), 1)
+                    ON CONFLICT (hour) DO UPDATE SET entries = hourly_stats.entries + 1;
+                END IF;
+                IF NEW.exit_time IS NOT NULL AND (TG_OP = 'INSERT' OR OLD.exit_time IS NULL) THEN
+                    INSERT INTO hourly_stats (hour, exits, stay_seconds)
+                    VALUES (date_trunc('hour', NEW.exit_time), 1,
+                            EXTRACT(EPOCH FROM NEW.exit_time - NEW.entry_time)::BIGINT)
+                    ON CONFLICT (hour) DO UPDATE SET
+                        exits = hourly_stats.exits + 1,
+                        stay_seconds = hourly_stats.stay_seconds + EXCLUDED.stay_seconds;
+                END IF;
+                IF NEW.payment_status = 1 AND NEW.payment_time IS NOT NULL
+                   AND (TG_OP = 'INSERT' OR OLD.payment_status IS DISTINCT FROM 1) THEN
+                    INSERT INTO hourly_stats (hour, payments, revenue)
+                    VALUES (date_trunc('hour', NEW.payment_time), 1, COALESCE(NEW.payment_amount, 0))
+                    ON CONFLICT (hour) DO UPDATE SET
+                        payments = hourly_stats.payments + 1,
+                        revenue = hourly_stats.revenue + EXCLUDED.revenue;
+                END IF;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        ''')
+        cursor.execute("DROP TRIGGER IF EXISTS vehicles_rollup ON vehicles")
+        cursor.execute('''
+            CREATE TRIGGER vehicles_rollup
+            AFTER INSERT OR UPDATE ON vehicles
+            FOR EACH ROW EXECUTE FUNCTION rollup_vehicle_event()
+        ''')
+        cursor.execute('''
+            CREATE OR REPLACE FUNCTION rollup_unauthorized_exit() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO hourly_stats (hour, unauthorized_exits)
+                VALUES (date_trunc('hour', NEW.exit_time), 1)
+                ON CONFLICT (hour) DO UPDATE SET
+                    unauthorized_exits = hourly_stats.unauthorized_exits + 1;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        ''')
+        cursor.execute("DROP TRIGGER IF EXISTS unauthorized_exits_rollup ON unauthorized_exits")
+        cursor.execute('''
+            CREATE TRIGGER unauthorized_exits_rollup
+            AFTER INSERT ON unauthorized_exits
+            FOR EACH ROW EXECUTE FUNCTION rollup_unauthorized_exit()
+        ''')
+
+        # Cheap change counters so API readers can tell whether anything moved
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS data_versions (
+                name VARCHAR(50) PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP NOT NULL DEFAULT (clock_timestamp() AT TIME ZONE 'utc')
+            )
+        ''')
+        cursor.execute('''
+            INSERT INTO data_versions (name) VALUES ('vehicles'), ('unauthorized_exits')
+            ON CONFLICT (name) DO NOTHING
+        ''')
+        cursor.execute('''
+            CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+            BEGIN
+                -- clock_timestamp(), not now(): now() is when the transaction began, so a
+                -- long transaction committing late would move Last-Modified backwards and
+                -- If-Modified-Since clients would get a stale 304
+                UPDATE data_versions SET version = version + 1,
+                    updated_at = GREATEST(updated_at, clock_timestamp() AT TIME ZONE 'utc')
+                WHERE name = TG_TABLE_NAME;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        ''')
+        for table in ('vehicles', 'unauthorized_exits'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {table}_data_version ON {table}")
+            cursor.execute(f'''
+                CREATE TRIGGER {table}_data_version
+                AFTER INSERT OR UPDATE OR DELETE ON {table}
+                FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()
+            ''')
 
         conn.commit()
+
+        # Backfill rollups the first time they are created on an existing database
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM hourly_stats)")
+        if not cursor.fetchone()[0]:
+            self.rebuild_hourly_stats()
         cursor.close()
 
-    def add_vehicle(self, plate_number):
+    def rebuild_hourly_stats(self, since=None):
+        """Recompute hourly_stats from the raw tables for every hour from since onwards"""
+        since = date_trunc_hour(since) if since else datetime.min
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("DELETE FROM hourly_stats WHERE hour >= %s", (since,))
+                cur.execute("""
+                    INSERT INTO hourly_stats (hour, entries, exits, stay_seconds, payments, revenue,
+                                              unauthorized_exits)
+                    SELECT hour, SUM(entries), SUM(exits), SUM(stay_seconds), SUM(payments),
+                           SUM(revenue), SUM(unauthorized_exits)
+                    FROM (
+                        SELECT date_trunc('hour', entry_time) AS hour, 1 AS entries, 0 AS exits,
+                               0::BIGINT AS stay_seconds, 0 AS payments, 0::DECIMAL AS revenue,
+                               0 AS unauthorized_exits
+                        FROM vehicle_history WHERE entry_time >= %(since)s
+                        UNION ALL
+                        SELECT date_trunc('hour', exit_time), 0, 1,
+                               EXTRACT(EPOCH FROM exit_time - entry_time)::BIGINT, 0, 0, 0
+                        FROM vehicle_history WHERE exit_time >= %(since)s
+                        UNION ALL
+                        SELECT date_trunc('hour', payment_time), 0, 0, 0, 1, COALESCE(payment_amount, 0), 0
+                        FROM vehicle_history WHERE payment_status = 1 AND payment_time >= %(since)s
+                        UNION ALL
+                        SELECT date_trunc('hour', exit_time), 0, 0, 0, 0, 0, 1
+                        FROM unauthorized_exits WHERE exit_time >= %(since)s
+                    ) events
+                    GROUP BY hour
+                """, {'since': since})
+                self.conn.commit()
+                return True
+        except Exception as e:
+            log.error("❌ Error rebuilding hourly stats: %s", e)
+            self.conn.rollback()
+            return False
+
+    def get_analytics(self, start, end, bucket='hour'):
+        """Occupancy and revenue time series from hourly_stats"""
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("""
+                    WITH before AS (
+                        SELECT COALESCE(SUM(entries - exits), 0) AS occupancy
+                        FROM hourly_stats WHERE hour < %(start)s
+                    ), buckets AS (
+                        SELECT date_trunc(%(bucket)s, hour) AS bucket,
+                               SUM(entries) AS entries, SUM(exits) AS exits,
+                               SUM(stay_seconds) AS stay_seconds, SUM(payments) AS payments,
+                               SUM(revenue) AS revenue, SUM(unauthorized_exits) AS unauthorized_exits
+                        FROM hourly_stats
+                        WHERE hour >= %(start)s AND hour < %(end)s
+                        GROUP BY 1
+                    )
+                    SELECT bucket, entries, exits, payments, revenue, unauthorized_exits,
+                           (SELECT occupancy FROM before)
+                               + SUM(entries - exits) OVER (ORDER BY bucket) AS occupancy,
+                           CASE WHEN exits > 0 THEN stay_seconds / exits / 60.0 END AS avg_stay_minutes
+                    FROM buckets ORDER BY bucket
+                """, {'start': start, 'end': end, 'bucket': bucket})
+                return [
+                    {'time': r[0], 'entries': r[1], 'exits': r[2], 'payments': r[3],
+                     'revenue': r[4], 'unauthorized_exits': r[5], 'occupancy': r[6],
+                     'avg_stay_minutes': round(float(r[7]), 1) if r[7] is not None else None}
+                    for r in cur.fetchall()
+                ]
+        except Exception as e:
+            log.error("Error getting analytics: %s", e)
+            self.conn.rollback()
+            return []
+
+    def ensure_partitions(self, months_ahead=PARTITION_MONTHS_AHEAD, start=None):
+        """Create monthly vehicles partitions from start (default: now) to months_ahead"""
+        first = month_start(start or datetime.now())
+        last = add_months(month_start(datetime.now()), months_ahead)
+
+        with self.conn.cursor() as cur:
+            month = first
+            while month <= last:
+                name = f"vehicles_{month:%Y_%m}"
+                upper = add_months(month, 1)
+                cur.execute("""
+                    SELECT 1 FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = 'vehicles'::regclass AND c.relname = %s
+                """, (name,))
+                if not cur.fetchone():
+                    # Rows that fell into the default partition move into their month
+                    cur.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {name}
+                        (LIKE vehicles INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+                    """)
+                    cur.execute(f"""
+                        WITH moved AS (
+                            DELETE FROM vehicles_default
+                            WHERE entry_time >= %s AND entry_time < %s
+                            RETURNING *
+                        )
+                        INSERT INTO {name} SELECT * FROM moved
+                    """, (month, upper))
+                    cur.execute(f"""
+                        ALTER TABLE vehicles ATTACH PARTITION {name}
+                        FOR VALUES FROM (%s) TO (%s)
+                    """, (month, upper))
+                month = upper
+        self.conn.commit()
+
+    def archive_closed_sessions(self, older_than_days=ARCHIVE_AFTER_DAYS):
+        """Move closed sessions into vehicles_archive and drop emptied partitions"""
+        cutoff = datetime.now() - timedelta(days=older_than_days)
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("""
+                    WITH moved AS (
+                        DELETE FROM vehicles
+                        WHERE exit_time IS NOT NULL AND exit_time < %s
+                        RETURNING id, plate_number, entry_time, exit_time, payment_status,
+                                  payment_amount, payment_time, entry_trace_id, exit_trace_id
+                    )
+                    INSERT INTO vehicles_archive (id, plate_number, entry_time, exit_time, payment_status,
+                                                  payment_amount, payment_time, entry_trace_id, exit_trace_id)
+                    SELECT * FROM moved
+                """, (cutoff,))
+                archived = cur.rowcount
+
+                # Months entirely before the cutoff with nothing left open are dropped
+                cur.execute("""
+                    SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = 'vehicles'::regclass AND c.relname ~ '^vehicles_[0-9]{4}_[0-9]{2}$'
+                """)
+                dropped = 0
+                for (name,) in cur.fetchall():
+                    upper = add_months(datetime.strptime(name, "vehicles_%Y_%m"), 1)
+                    if upper > cutoff:
+                        continue
+                    cur.execute(f"SELECT 1 FROM {name} LIMIT 1")
+                    if cur.fetchone():
+                        continue
+                    cur.execute(f"ALTER TABLE vehicles DETACH PARTITION {name}")
+                    cur.execute(f"DROP TABLE {name}")
+                    dropped += 1
+
+                self.conn.commit()
+            self.ensure_partitions()
+            log.info("✅ Archived %s closed sessions, dropped %s empty partitions", archived, dropped)
+            return archived
+        except Exception as e:
+            log.error("❌ Error archiving sessions: %s", e)
+            self.conn.rollback()
+            return 0
+
+    def add_vehicle(self, plate_number, trace_id=None):
         """Add a new vehicle entry"""
         try:
             with self.conn.cursor() as cur:
                 cur.execute("""
-                    INSERT INTO vehicles (plate_number, entry_time, payment_status)
-                    VALUES (%s, %s, 0)
-                """, (plate_number, datetime.now()))
+                    INSERT INTO vehicles (plate_number, entry_time, payment_status, entry_trace_id)
+                    VALUES (%s, %s, 0, %s)
+                """, (plate_number, datetime.now(), trace_id))
                 self.conn.commit()
-                print(f"✅ Vehicle {plate_number} added to database")
+                log.info("✅ Vehicle %s added to database", plate_number)
                 return True
         except Exception as e:
-            print(f"❌ Error adding vehicle: {str(e)}")
+            log.error("❌ Error adding vehicle: %s", e)
             self.conn.rollback()
             return False
 
@@ -90,7 +536,22 @@ class ParkingDatabase:
                 result = cur.fetchone()
                 return result[0] if result else None
         except Exception as e:
-            print(f"Error getting unpaid entry: {str(e)}")
+            log.error("Error getting unpaid entry: %s", e)
+            return None
+
+    def get_paid_session(self, plate_number):
+        """Most recent paid, open session as (id, entry_time, payment_status), or None"""
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("""
+                    SELECT id, entry_time, payment_status FROM vehicles
+                    WHERE plate_number = %s AND exit_time IS NULL AND payment_status = 1
+                    ORDER BY entry_time DESC LIMIT 1
+                """, (plate_number,))
+                return cur.fetchone()
+        except Exception as e:
+            log.error("Error getting paid session: %s", e)
+            self.conn.rollback()
             return None
 
     def update_payment(self, plate_number, amount, payment_time=None):
@@ -102,13 +563,13 @@ class ParkingDatabase:
             with self.conn.cursor() as cur:
                 cur.execute("""
                     SELECT id FROM vehicles 
-                    WHERE plate_number = %s AND payment_status = 0
+                    WHERE plate_number = %s AND exit_time IS NULL AND payment_status = 0
                     ORDER BY entry_time DESC LIMIT 1
                 """, (plate_number,))
                 result = cur.fetchone()
 
                 if not result:
-                    print(f"❌ No unpaid entry found for plate {plate_number}")
+                    log.warning("❌ No unpaid entry found for plate %s", plate_number)
                     return False
 
                 vehicle_id = result[0]
@@ -119,10 +580,29 @@ class ParkingDatabase:
                 """, (amount, payment_time, vehicle_id))
 
                 self.conn.commit()
-                print(f"✅ Payment updated for plate {plate_number}")
+                log.info("✅ Payment updated for plate %s", plate_number)
                 return True
         except Exception as e:
-            print(f"❌ Error updating payment: {str(e)}")
+            log.error("❌ Error updating payment: %s", e)
+            self.conn.rollback()
+            return False
+
+    def close_session(self, vehicle_id, exit_time=None, trace_id=None):
+        """Set exit time on a paid, open session"""
+        try:
+            if not exit_time:
+                exit_time = datetime.now()
+
+            with self.conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE vehicles SET exit_time = %s, exit_trace_id = %s
+                    WHERE id = %s AND payment_status = 1 AND exit_time IS NULL
+                """, (exit_time, trace_id, vehicle_id))
+                closed = cur.rowcount == 1
+                self.conn.commit()
+                return closed
+        except Exception as e:
+            log.error("❌ Error closing session: %s", e)
             self.conn.rollback()
             return False
 
@@ -150,52 +630,114 @@ class ParkingDatabase:
                     """, (vehicle_id, plate_number, datetime.now(), gate_location))
 
                     self.conn.commit()
-                    print(f"🚨 Unauthorized exit logged for {plate_number}")
+                    log.warning("🚨 Unauthorized exit logged for %s", plate_number)
                     return True
                 else:
-                    print(f"✅ Authorized or already exited: {plate_number}")
+                    log.info("✅ Authorized or already exited: %s", plate_number)
                     return False
         except Exception as e:
-            print(f"❌ Error detecting unauthorized exit: {str(e)}")
+            log.error("❌ Error detecting unauthorized exit: %s", e)
             self.conn.rollback()
             return False
 
     def trigger_alarm(self):
         """Placeholder for alarm system integration"""
-        print("🔔 Alarm triggered!")
+        log.info("🔔 Alarm triggered!")
 
-    def record_unauthorized_exit(self, plate_number, gate_location="Unknown"):
+    def record_unauthorized_exit(self, plate_number, gate_location="Unknown", trace_id=None):
         """Manual unauthorized exit record"""
         try:
             with self.conn.cursor() as cur:
                 cur.execute("""
-                    INSERT INTO unauthorized_exits (plate_number, exit_time, gate_location)
-                    VALUES (%s, %s, %s)
-                """, (plate_number, datetime.now(), gate_location))
+                    INSERT INTO unauthorized_exits (plate_number, exit_time, gate_location, trace_id)
+                    VALUES (%s, %s, %s, %s)
+                """, (plate_number, datetime.now(), gate_location, trace_id))
                 self.conn.commit()
-                print(f"✅ Unauthorized exit recorded for {plate_number}")
+                log.info("✅ Unauthorized exit recorded for %s", plate_number)
                 return True
         except Exception as e:
-            print(f"❌ Error recording unauthorized exit: {str(e)}")
+            log.error("❌ Error recording unauthorized exit: %s", e)
             self.conn.rollback()
             return False
 
+    def get_data_versions(self, *names):
+        """Change counter and last change time for each named table"""
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("""
+                    SELECT name, version, updated_at FROM data_versions WHERE name = ANY(%s)
+                """, (list(names),))
+                rows = {r[0]: (r[1], r[2]) for r in cur.fetchall()}
+                self.conn.commit()
+                return [rows.get(name, (0, None)) for name in names]
+        except Exception as e:
+            log.error("Error getting data versions: %s", e)
+            self.conn.rollback()
+            return None
+
     def get_vehicle_history(self, plate_number=None, limit=100):
         """Retrieve vehicle history"""
         try:
             with self.conn.cursor() as cur:
                 if plate_number:
                     cur.execute("""
-                        SELECT * FROM vehicles WHERE plate_number = %s
+                        SELECT * FROM vehicle_history WHERE plate_number = %s
                         ORDER BY entry_time DESC LIMIT %s
                     """, (plate_number, limit))
                 else:
                     cur.execute("""
-                        SELECT * FROM vehicles ORDER BY entry_time DESC LIMIT %s
+                        SELECT * FROM vehicle_history ORDER BY entry_time DESC LIMIT %s
                     """, (limit,))
                 return cur.fetchall()
         except Exception as e:
-            print(f"Error fetching vehicle history: {str(e)}")
+            log.error("Error fetching vehicle history: %s", e)
+            return []
+
+    def search_plates(self, query, mode='similar', limit=50):
+        """Search vehicles by partial or misread plate (prefix, substring or similar)"""
+        query = query.strip().upper()
+        if not query:
+            return []
+
+        # Treat LIKE wildcards in the query literally
+        pattern = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        try:
+            with self.conn.cursor() as cur:
+                if mode == 'prefix':
+                    cur.execute("""
+                        SELECT plate_number, entry_time, exit_time, payment_status, payment_amount,
+                               payment_time, 1.0
+                        FROM vehicle_history WHERE plate_number LIKE %s
+                        ORDER BY entry_time DESC LIMIT %s
+                    """, (pattern + '%', limit))
+                elif mode == 'substring':
+                    cur.execute("""
+                        SELECT plate_number, entry_time, exit_time, payment_status, payment_amount,
+                               payment_time, 1.0
+                        FROM vehicle_history WHERE plate_number LIKE %s
+                        ORDER BY entry_time DESC LIMIT %s
+                    """, ('%' + pattern + '%', limit))
+                elif mode == 'similar':
+                    cur.execute("""
+                        SELECT plate_number, entry_time, exit_time, payment_status, payment_amount,
+                               payment_time, similarity(plate_number, %s) AS score
+                        FROM vehicle_history WHERE plate_number %% %s
+                        ORDER BY score DESC, entry_time DESC LIMIT %s
+                    """, (query, query, limit))
+                else:
+                    raise ValueError(f"Unknown search mode: {mode}")
+
+                return [
+                    {'plate_number': r[0], 'entry_time': r[1], 'exit_time': r[2],
+                     'payment_status': r[3], 'payment_amount': r[4], 'payment_time': r[5],
+                     'score': float(r[6])}
+                    for r in cur.fetchall()
+                ]
+        except ValueError:
+            raise
+        except Exception as e:
+            log.error("Error searching plates: %s", e)
+            self.conn.rollback()
             return []
 
     def get_unauthorized_exits(self, limit=100):
@@ -212,7 +754,7 @@ class ParkingDatabase:
                     for r in cur.fetchall()
                 ]
         except Exception as e:
-            print(f"Error getting unauthorized exits: {str(e)}")
+            log.error("Error getting unauthorized exits: %s", e)
             return []
 
     def get_all_vehicles(self):
@@ -221,7 +763,7 @@ class ParkingDatabase:
             with self.conn.cursor() as cur:
                 cur.execute("""
                     SELECT plate_number, entry_time, payment_status, payment_amount, payment_time
-                    FROM vehicles ORDER BY entry_time DESC
+                    FROM vehicle_history ORDER BY entry_time DESC
                 """)
                 return [
                     {'plate_number': r[0], 'entry_time': r[1], 'payment_status': r[2],
@@ -229,17 +771,79 @@ class ParkingDatabase:
                     for r in cur.fetchall()
                 ]
         except Exception as e:
-            print(f"Error fetching all vehicles: {str(e)}")
+            log.error("Error fetching all vehicles: %s", e)
             return []
 
+    def get_dashboard_snapshot(self, vehicle_limit=50, exit_limit=20):
+        """Statistics plus recent vehicles and exits, all read from one snapshot"""
+        try:
+            self.conn.rollback()
+            with self.conn.cursor() as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                cur.execute("""
+                    SELECT (SELECT COUNT(*) FROM vehicle_history),
+                           (SELECT COUNT(*) FROM vehicles WHERE exit_time IS NULL),
+                           (SELECT COALESCE(SUM(payment_amount), 0)
+                            FROM vehicle_history WHERE payment_status = 1),
+                           (SELECT COUNT(*) FROM unauthorized_exits)
+                """)
+                r = cur.fetchone()
+                statistics = {'total_vehicles': r[0], 'current_vehicles': r[1],
+                              'total_revenue': r[2], 'unauthorized_exits': r[3]}
+
+                cur.execute("""
+                    SELECT plate_number, entry_time, payment_status, payment_amount, payment_time
+                    FROM vehicle_history ORDER BY entry_time DESC LIMIT %s
+                """, (vehicle_limit,))
+                vehicles = [
+                    {'plate_number': r[0], 'entry_time': r[1], 'payment_status': r[2],
+                     'payment_amount': r[3], 'payment_time': r[4]}
+                    for r in cur.fetchall()
+                ]
+
+                cur.execute("""
+                    SELECT plate_number, exit_time, gate_location
+                    FROM unauthorized_exits
+                    ORDER BY exit_time DESC LIMIT %s
+                """, (exit_limit,))
+                exits = [
+                    {'plate_number': r[0], 'exit_time': r[1], 'gate_location': r[2]}
+                    for r in cur.fetchall()
+                ]
+
+                parked = self._fetch_parked(cur)
+            self.conn.commit()
+            return {'statistics': statistics, 'vehicles': vehicles, 'exits': exits, 'parked': parked}
+        except Exception as e:
+            log.error("Error getting dashboard snapshot: %s", e)
+            self.conn.rollback()
+            return None
+
+    def _fetch_parked(self, cur):
+        cur.execute("""
+            SELECT plate_number, entry_time FROM vehicles
+            WHERE exit_time IS NULL AND payment_status = 0
+        """)
+        rows = cur.fetchall()
+        return [r[0] for r in rows], [r[1] for r in rows]
+
+    def get_parked_vehicles(self):
+        """Unpaid vehicles still inside, as (plates, entry_times) lists for bulk quoting"""
+        try:
+            with self.conn.cursor() as cur:
+                return self._fetch_parked(cur)
+        except Exception as e:
+            log.error("Error getting parked vehicles: %s", e)
+            return [], []
+
     def get_total_vehicles(self):
         """Total vehicle count"""
         try:
             with self.conn.cursor() as cur:
-                cur.execute("SELECT COUNT(*) FROM vehicles")
+                cur.execute("SELECT COUNT(*) FROM vehicle_history")
                 return cur.fetchone()[0]
         except Exception as e:
-            print(f"Error getting total vehicles: {str(e)}")
+            log.error("Error getting total vehicles: %s", e)
             return 0
 
     def get_current_vehicles(self):
@@ -249,7 +853,7 @@ class ParkingDatabase:
                 cur.execute("SELECT COUNT(*) FROM vehicles WHERE exit_time IS NULL")
                 return cur.fetchone()[0]
         except Exception as e:
-            print(f"Error getting current vehicles: {str(e)}")
+            log.error("Error getting current vehicles: %s", e)
             return 0
 
     def get_total_revenue(self):
@@ -258,11 +862,11 @@ class ParkingDatabase:
             with self.conn.cursor() as cur:
                 cur.execute("""
                     SELECT COALESCE(SUM(payment_amount), 0) 
-                    FROM vehicles WHERE payment_status = 1
+                    FROM vehicle_history WHERE payment_status = 1
                 """)
                 return cur.fetchone()[0]
         except Exception as e:
-            print(f"Error getting total revenue: {str(e)}")
+            log.error("Error getting total revenue: %s", e)
             return 0
 
     def get_unauthorized_exits_count(self):
@@ -272,10 +876,8 @@ class ParkingDatabase:
                 cur.execute("SELECT COUNT(*) FROM unauthorized_exits")
                 return cur.fetchone()[0]
         except Exception as e:
-            print(f"Error getting unauthorized exits count: {str(e)}")
+            log.error("Error getting unauthorized exits count: %s", e)
             return 0
 
     def __del__(self):
-        if self.conn:
-            self.conn.close()
-            print("🛑 Database connection closed")
+        self.close()
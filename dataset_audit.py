@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import yaml
+
+DATASET_DIR = 'dataset'
+DATA_YAML = 'license_plate.yaml'
+CACHE_NAME = 'audit_cache.json'
+REPORT_NAME = 'audit_report.json'
+SPLITS = ('train', 'val')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+DUPLICATE_DISTANCE = 4  # max differing pHash bits for two frames to count as the same shot
+BANDS = 8  # 64-bit hash split into 8-bit bands; two hashes within 7 bits share a band
+
+
+def load_class_names(path=DATA_YAML):
+    with open(path) as f:
+        names = yaml.safe_load(f)['names']
+    if isinstance(names, list):
+        names = dict(enumerate(names))
+    return {int(k): v for k, v in names.items()}
+
+
+def perceptual_hash(gray):
+    """64-bit DCT hash of a grayscale image"""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()[1:]  # drop the DC term
+    bits = low > np.median(low)
+    return int(''.join('1' if b else '0' for b in bits), 2)
+
+
+def check_label(path, class_ids):
+    """Problems with a YOLO label file, and its box count"""
+    if not os.path.exists(path):
+        return ['missing label'], 0
+    problems, boxes = [], 0
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields:
+                continue
+            if len(fields) != 5:
+                problems.append(f"line {number}: expected 5 fields, got {len(fields)}")
+                continue
+            try:
+                cls = int(fields[0])
+                x, y, w, h = (float(v) for v in fields[1:])
+            except ValueError:
+                problems.append(f"line {number}: not numeric")
+                continue
+            if cls not in class_ids:
+                problems.append(f"line {number}: unknown class {cls}")
+            if not (0 <= x <= 1 and 0 <= y <= 1 and 0 < w <= 1 and 0 < h <= 1):
+                problems.append(f"line {number}: box outside normalised range")
+            elif x - w / 2 < -0.01 or x + w / 2 > 1.01 or y - h / 2 < -0.01 or y + h / 2 > 1.01:
+                problems.append(f"line {number}: box extends past the image")
+            boxes += 1
+    return problems, boxes
+
+
+class DatasetAuditor:
+    """Validates labels and drops near-duplicate frames; writes train/val image lists"""
+
+    def __init__(self, dataset_dir, class_names, distance, workers, allow_unlabeled=False):
+        self.dataset_dir = dataset_dir
+        self.class_names = class_names
+        self.distance = distance
+        self.workers = workers
+        self.allow_unlabeled = allow_unlabeled
+        self.cache_path = os.path.join(dataset_dir, CACHE_NAME)
+        self.cache = {}  # image path -> [size, mtime_ns, phash or None]
+        self.images = []  # dicts: path, split, label, problems, boxes, phash, bytes
+
+    def load_cache(self):
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path) as f:
+                self.cache = json.load(f)
+
+    def save_cache(self):
+        tmp = self.cache_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.cache, f)
+        os.replace(tmp, self.cache_path)
+
+    def collect(self):
+        for split in SPLITS:
+            image_dir = os.path.join(self.dataset_dir, split, 'images')
+            if not os.path.isdir(image_dir):
+                continue
+            for name in sorted(os.listdir(image_dir)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    self.images.append({
+                        'path': os.path.join(image_dir, name),
+                        'split': split,
+                        'label': os.path.join(self.dataset_dir, split, 'labels', os.path.splitext(name)[0] + '.txt'),
+                    })
+
+    def inspect(self, image):
+        st = os.stat(image['path'])
+        cached = self.cache.get(image['path'])
+        if cached and cached[:2] == [st.st_size, st.st_mtime_ns]:
+            phash = cached[2]
+        else:
+            # A 1/4-scale decode is plenty for a 32x32 hash and several times faster
+            gray = cv2.imread(image['path'], cv2.IMREAD_REDUCED_GRAYSCALE_4)
+            phash = perceptual_hash(gray) if gray is not None else None
+            self.cache[image['path']] = [st.st_size, st.st_mtime_ns, phash]
+
+        problems, boxes = check_label(image['label'], self.class_names)
+        if phash is None:
+            problems.insert(0, 'unreadable image')
+        if problems == ['missing label'] and self.allow_unlabeled:
+            problems = []
+        image.update(phash=phash, problems=problems, boxes=boxes, bytes=st.st_size)
+        return image
+
+    def duplicate_groups(self, images):
+        """Union-find over pHash neighbours, found through exact band matches"""
+        parent = list(range(len(images)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        buckets = {}
+        for i, image in enumerate(images):
+            for band in range(BANDS):
+                key = (band, (image['phash'] >> (band * 8)) & 0xFF)
+                buckets.setdefault(key, []).append(i)
+
+        for members in buckets.values():
+            for a_pos, a in enumerate(members):
+                for b in members[a_pos + 1:]:
+                    if find(a) != find(b) and bin(images[a]['phash'] ^ images[b]['phash']).count('1') <= self.distance:
+                        parent[find(a)] = find(b)
+
+        groups = {}
+        for i in range(len(images)):
+            groups.setdefault(find(i), []).append(images[i])
+        return [g for g in groups.values() if len(g) > 1]
+
+    def run(self):
+        self.load_cache()
+        self.collect()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(self.inspect, self.images))
+        self.save_cache()
+
+        valid = [image for image in self.images if not image['problems']]
+        dropped = {}  # path -> reason
+        leaks = 0
+        for group in self.duplicate_groups(valid):
+            splits = {image['split'] for image in group}
+            if len(splits) > 1:
+                leaks += 1
+            # Keep one frame per group; a group touching val keeps its val frame so val stays unseen
+            keep = max(group, key=lambda image: (image['split'] == 'val', image['boxes'], image['bytes']))
+            for image in group:
+                if image is not keep:
+                    dropped[image['path']] = f"near-duplicate of {os.path.basename(keep['path'])}"
+
+        lists = {split: [] for split in SPLITS}
+        for image in valid:
+            if image['path'] not in dropped:
+                lists[image['split']].append(os.path.abspath(image['path']))
+        return lists, dropped, leaks
+
+    def write(self, lists, dropped, leaks, data_yaml):
+        for split, paths in lists.items():
+            with open(os.path.join(self.dataset_dir, f"{split}.txt"), 'w') as f:
+                f.write(''.join(f"{p}\n" for p in paths))
+
+        clean_yaml = os.path.join(self.dataset_dir, 'license_plate_clean.yaml')
+        with open(clean_yaml, 'w') as f:
+            yaml.safe_dump({
+                'path': os.path.abspath(self.dataset_dir),
+                'train': 'train.txt',
+                'val': 'val.txt',
+                'names': self.class_names,
+            }, f, sort_keys=False)
+
+        report = {
+            'source': data_yaml,
+            'images': len(self.images),
+            'kept': {split: len(paths) for split, paths in lists.items()},
+            'invalid': {image['path']: image['problems'] for image in self.images if image['problems']},
+            'near_duplicates': dropped,
+            'cross_split_groups': leaks,
+        }
+        with open(os.path.join(self.dataset_dir, REPORT_NAME), 'w') as f:
+            json.dump(report, f, indent=1)
+        return clean_yaml, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate YOLO labels and drop near-duplicate frames")
+    parser.add_argument('--dataset', default=DATASET_DIR)
+    parser.add_argument('--data', default=DATA_YAML, help="dataset yaml with the class names")
+    parser.add_argument('--distance', type=int, default=DUPLICATE_DISTANCE,
+                        help="max pHash bit difference for near-duplicates (0-7)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--allow-unlabeled', action='store_true',
+                        help="keep images without a label file as background images")
+    args = parser.parse_args()
+    if not 0 <= args.distance < BANDS:
+        parser.error(f"--distance must be between 0 and {BANDS - 1}")
+
+    started = time.time()
+    auditor = DatasetAuditor(args.dataset, load_class_names(args.data), args.distance, args.workers,
+                             args.allow_unlabeled)
+    lists, dropped, leaks = auditor.run()
+    clean_yaml, report = auditor.write(lists, dropped, leaks, args.data)
+
+    print(f"📊 Audited {report['images']} images in {time.time() - started:.1f}s")
+    print(f"✅ Kept: train {report['kept']['train']} | val {report['kept']['val']}")
+    if report['invalid']:
+        print(f"⚠️  {len(report['invalid'])} invalid (labels or unreadable images)")
+    if dropped:
+        print(f"🔁 {len(dropped)} near-duplicates dropped")
+    if leaks:
+        print(f"⚠️  {leaks} duplicate groups span train and val; their train frames were dropped")
+    print(f"Train with: yolo detect train data={clean_yaml}")
+
+
+if __name__ == "__main__":
+    main()
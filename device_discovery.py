@@ -0,0 +1,196 @@
+import argparse
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import serial.tools.list_ports
+
+from serial_transport import SerialTransport
+
+log = logging.getLogger('device_discovery')
+
+# USB bridges used by the boards on site: (vid, pid) -> description
+KNOWN_USB_IDS = {
+    (0x2341, 0x0043): 'Arduino Uno',
+    (0x2341, 0x0001): 'Arduino Uno',
+    (0x2341, 0x0010): 'Arduino Mega 2560',
+    (0x2341, 0x0042): 'Arduino Mega 2560',
+    (0x2341, 0x8036): 'Arduino Leonardo',
+    (0x2A03, 0x0043): 'Arduino Uno (arduino.org)',
+    (0x1A86, 0x7523): 'CH340 (Uno clone / Wemos D1 Mini)',
+    (0x1A86, 0x55D4): 'CH9102',
+    (0x0403, 0x6001): 'FTDI FT232',
+    (0x10C4, 0xEA60): 'CP210x',
+}
+SERIAL_DEVICE_PATTERN = re.compile(r'(ttyACM|ttyUSB|cu\.usb|COM)\d*', re.IGNORECASE)
+
+# Baud rates the sketches use; gate/gate.ino runs at 115200, the rest at 9600
+PROBE_BAUDRATES = (9600, 115200)
+PROBE_SECONDS = 4.0  # opening the port resets the board; setup() prints within this
+
+ROLE_BAUDRATES = {'entry_gate': 115200, 'exit_gate': 9600, 'payment': 9600}
+DISTANCE_LINE = re.compile(r'^-?\d+(\.\d+)?$')
+
+
+def classify_line(line):
+    """Role implied by a line a sketch prints, or None"""
+    if 'Place your RFID card' in line or line.startswith('PLATE:'):
+        return 'payment'
+    if line in ('Exit Detection Ready', 'EXIT_VEHICLE_DETECTED', 'GATE_OPENED', 'GATE_CLOSED',
+                'ALARM_TRIGGERED'):
+        return 'exit_gate'
+    if DISTANCE_LINE.match(line):
+        return 'entry_gate'  # gate/gate.ino streams ultrasonic distances
+    return None
+
+
+class DiscoveredDevice:
+    def __init__(self, port, role, baudrate, vid=None, pid=None, serial_number=None, location=None,
+                 description=None):
+        self.port = port
+        self.role = role
+        self.baudrate = baudrate
+        self.vid = vid
+        self.pid = pid
+        self.serial_number = serial_number
+        self.location = location  # USB path, stable across replugs into the same socket
+        self.description = description
+
+    def matches(self, spec):
+        """True if every key in a lanes.json device spec matches this device"""
+        for key, value in spec.items():
+            if key in ('vid', 'pid'):
+                value = int(value, 16) if isinstance(value, str) else value
+            if getattr(self, key, None) != value:
+                return False
+        return True
+
+    def __repr__(self):
+        usb = f"{self.vid:04X}:{self.pid:04X}" if self.vid is not None else "?"
+        return (f"<{self.role or 'unknown'} {self.port} @{self.baudrate} usb={usb} "
+                f"serial={self.serial_number}>")
+
+
+def candidate_ports(known_only=False):
+    """Serial ports that look like our boards: known USB ids first, then by device name"""
+    ports = []
+    for info in serial.tools.list_ports.comports():
+        known = (info.vid, info.pid) in KNOWN_USB_IDS
+        if known or (not known_only and SERIAL_DEVICE_PATTERN.search(info.device)):
+            ports.append((not known, info))
+    return [info for _, info in sorted(ports, key=lambda p: (p[0], p[1].device))]
+
+
+def ports_in_use():
+    """Serial devices some process has open, from /proc; None where that cannot be told (not Linux)"""
+    if not os.path.isdir('/proc/self/fd'):
+        return None
+    held = set()
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            for fd in os.listdir(f'/proc/{pid}/fd'):
+                target = os.readlink(f'/proc/{pid}/fd/{fd}')
+                if target.startswith('/dev/'):
+                    held.add(target)
+        except OSError:
+            continue  # exited, or another user's process
+    return held
+
+
+def identify(info, timeout=PROBE_SECONDS):
+    """Open the port at each sketch baud rate and classify the first recognisable line"""
+    for baudrate in PROBE_BAUDRATES:
+        transport = SerialTransport(info.device, baudrate, reset_delay=0, name=f"probe-{info.device}")
+        try:
+            transport.open()
+        except Exception as e:
+            log.warning("[DISCOVERY] %s: %s", info.device, e)
+            return None
+        try:
+            deadline = time.monotonic() + timeout / len(PROBE_BAUDRATES)
+            while True:
+                remaining = deadline - time.monotonic()
+                line = transport.next_line(timeout=remaining) if remaining > 0 else None
+                if line is None:
+                    break
+                role = classify_line(line)
+                if role:
+                    return DiscoveredDevice(info.device, role, baudrate, info.vid, info.pid,
+                                            info.serial_number, info.location,
+                                            KNOWN_USB_IDS.get((info.vid, info.pid), info.description))
+        finally:
+            transport.close()
+    return DiscoveredDevice(info.device, None, None, info.vid, info.pid, info.serial_number, info.location,
+                            info.description)
+
+
+def discover(timeout=PROBE_SECONDS, known_only=False, exclude=()):
+    """Probe every free candidate port in parallel; returns devices, identified or not
+
+    Ports another process has open (a running lane) are skipped: probing
+    would reset its board and steal its lines.
+    """
+    busy = ports_in_use() or set()
+    ports = []
+    for info in candidate_ports(known_only):
+        if info.device in exclude:
+            continue
+        if os.path.realpath(info.device) in busy:
+            log.info("[DISCOVERY] %s is in use, not probing it", info.device)
+            continue
+        ports.append(info)
+    if not ports:
+        return []
+    with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+        return [d for d in pool.map(lambda info: identify(info, timeout), ports) if d]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def find_port(role, env=None):
+    """Port for a role: the env override if set, else the first discovered board of that role
+
+    Returns (port, baudrate) or (None, None). Where ports held by other
+    processes cannot be detected, probing is only done with a single
+    board attached; with more, the env override is required.
+    """
+    global _cache
+    override = os.getenv(env) if env else None
+    if override:
+        return override, int(os.getenv(f"{env}_BAUDRATE", str(ROLE_BAUDRATES[role])))
+    with _cache_lock:
+        if _cache is None:
+            if ports_in_use() is None and len(candidate_ports()) > 1:
+                log.error("[DISCOVERY] Several serial ports attached; set %s to pick the %s board",
+                          env or 'the port', role)
+                return None, None
+            _cache = discover()
+    for device in _cache:
+        if device.role == role:
+            return device.port, device.baudrate
+    return None, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List attached parking boards and their roles")
+    parser.add_argument('--timeout', type=float, default=PROBE_SECONDS, help="seconds to wait for each board")
+    parser.add_argument('--known-only', action='store_true', help="only probe known USB VID/PIDs")
+    args = parser.parse_args()
+
+    started = time.time()
+    devices = discover(args.timeout, args.known_only)
+    for device in devices:
+        print(f"{device.port:<16}{device.role or 'unknown':<12}{device.baudrate or '-':<8}"
+              f"{device.description or '':<36}serial={device.serial_number} location={device.location}")
+    print(f"[DISCOVERY] {len(devices)} ports probed in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
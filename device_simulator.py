@@ -0,0 +1,309 @@
+import argparse
+import os
+import pty
+import queue
+import random
+import select
+import threading
+import time
+import tty
+
+
+class Faults:
+    """Misbehaviour injected into a simulated device's replies"""
+
+    def __init__(self, drop=0.0, garble=0.0, stall=0.0, stall_seconds=2.0):
+        self.drop = drop  # probability a reply is never sent
+        self.garble = garble  # probability a reply is corrupted on the wire
+        self.stall = stall  # probability a reply is held back by stall_seconds
+        self.stall_seconds = stall_seconds
+
+    @classmethod
+    def parse(cls, spec):
+        """Build from 'drop=0.05,garble=0.01,stall=0.1,stall_seconds=3'"""
+        values = {}
+        for item in filter(None, (spec or '').split(',')):
+            key, _, value = item.partition('=')
+            values[key.strip()] = float(value)
+        return cls(**values)
+
+
+def arduino_to_float(text):
+    """String.toFloat(): leading number or 0"""
+    digits = ''
+    for ch in text.strip():
+        if ch.isdigit() or (ch in '+-' and not digits) or (ch == '.' and '.' not in digits):
+            digits += ch
+        else:
+            break
+    try:
+        return float(digits)
+    except ValueError:
+        return 0.0
+
+
+class SimulatedDevice:
+    """One Arduino sketch emulated on a pty pair
+
+    The host side opens self.port like a real serial port. Bytes written by
+    the host are handed to on_byte() on a device thread, so a sketch that
+    blocks in delay() is emulated by simply sleeping there.
+    """
+
+    def __init__(self, name, delay=0.0, jitter=0.0, faults=None, seed=None):
+        self.name = name
+        self.delay = delay  # seconds before each reply
+        self.jitter = jitter
+        self.faults = faults or Faults()
+        self.rng = random.Random(seed)
+        self.master = None
+        self.slave = None
+        self.port = None
+        self.incoming = queue.Queue()
+        self.write_lock = threading.Lock()
+        self.running = False
+        self.threads = []
+
+    def open(self):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)  # No echo or newline translation, like a USB CDC port
+        self.port = os.ttyname(self.slave)
+        self.running = True
+        for target in (self._read_loop, self._run):
+            thread = threading.Thread(target=target, name=f"sim-{self.name}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        self.setup()
+        return self
+
+    def close(self):
+        self.running = False
+        self.incoming.put(None)
+        for thread in self.threads:
+            thread.join(timeout=1)
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+    def setup(self):
+        """Lines printed from the sketch's setup()"""
+
+    def on_byte(self, byte):
+        raise NotImplementedError
+
+    def println(self, line, reply=True):
+        """Serial.println; replies are subject to delay and faults"""
+        if reply:
+            wait = self.delay + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+            if self.rng.random() < self.faults.stall:
+                wait += self.faults.stall_seconds
+            if wait:
+                time.sleep(wait)
+            if self.rng.random() < self.faults.drop:
+                return
+            if self.rng.random() < self.faults.garble:
+                line = ''.join(chr(self.rng.randrange(33, 127)) if self.rng.random() < 0.3 else ch
+                               for ch in line)
+        self.write(f"{line}\r\n".encode())
+
+    def write(self, data):
+        with self.write_lock:
+            try:
+                os.write(self.master, data)
+            except OSError:
+                pass  # Host side closed
+
+    def read_line(self, timeout=None):
+        """Serial.readStringUntil('\\n') from the host's bytes"""
+        chars = bytearray()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.running:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                byte = self.incoming.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if byte is None:
+                break
+            if byte == b'\n':
+                return chars.decode(errors='replace')
+            chars.extend(byte)
+        return chars.decode(errors='replace') if chars else None
+
+    def _read_loop(self):
+        while self.running:
+            try:
+                ready, _, _ = select.select([self.master], [], [], 0.1)
+                if not ready:
+                    continue
+                data = os.read(self.master, 1024)
+            except OSError:
+                break
+            for value in data:
+                self.incoming.put(bytes([value]))
+
+    def _run(self):
+        while self.running:
+            byte = self.incoming.get()
+            if byte is None:
+                break
+            try:
+                self.on_byte(byte)
+            except Exception as e:
+                print(f"[SIM] {self.name} error: {str(e)}")
+
+
+class PaymentTerminalSim(SimulatedDevice):
+    """process_payment/process_payment.ino"""
+
+    def __init__(self, name='payment', write_seconds=0.05, **kwargs):
+        super().__init__(name, **kwargs)
+        self.write_seconds = write_seconds  # MIFARE authenticate + write
+        self.cards = {}  # plate -> balance
+        self.taps = queue.Queue()
+
+    def setup(self):
+        self.println("Place your RFID card...", reply=False)
+
+    def tap(self, plate, balance=None):
+        """Present a card; balance defaults to what is left from earlier taps"""
+        if balance is not None:
+            self.cards[plate] = float(balance)
+        self.cards.setdefault(plate, 0.0)
+        self.taps.put(plate)
+        self.incoming.put(b'')  # Wake the sketch loop
+
+    def on_byte(self, byte):
+        if byte:
+            return  # Stray bytes outside a transaction are left unread by the sketch
+        while not self.taps.empty():
+            self.transaction(self.taps.get())
+
+    def transaction(self, plate):
+        balance = self.cards[plate]
+        self.println(f"PLATE:{plate};BALANCE:{balance:.2f}")
+
+        # while (!Serial.available()); then readStringUntil('\n')
+        line = self.read_line()
+        if line is None:
+            return
+        if line.strip() == 'CANCEL':
+            self.println("CANCELLED")
+            return
+        amount_due = arduino_to_float(line)
+        if amount_due > balance:
+            self.println("INSUFFICIENT")
+            return
+
+        time.sleep(self.write_seconds)
+        self.cards[plate] = balance - amount_due
+        self.println("DONE")
+
+
+class ExitGateSim(SimulatedDevice):
+    """gate_control/Unauthorized_Exit_Arduino.ino"""
+
+    def __init__(self, name='exit-gate', open_seconds=15.0, alarm_seconds=5.0, step_seconds=0.5, **kwargs):
+        super().__init__(name, **kwargs)
+        self.open_seconds = open_seconds
+        self.alarm_seconds = alarm_seconds
+        self.step_seconds = step_seconds  # stepper.step(512)
+        self.gate_open = False
+        self.alarms = 0
+
+    def setup(self):
+        self.println("Exit Detection Ready", reply=False)
+
+    def detect_vehicle(self):
+        self.println("EXIT_VEHICLE_DETECTED", reply=False)
+
+    def on_byte(self, byte):
+        if byte == b'1':
+            time.sleep(self.step_seconds)
+            self.gate_open = True
+            self.println("GATE_OPENED")
+            time.sleep(self.open_seconds)
+            time.sleep(self.step_seconds)
+            self.gate_open = False
+            self.println("GATE_CLOSED")
+        elif byte == b'2':
+            time.sleep(self.alarm_seconds)
+            self.alarms += 1
+            self.println("ALARM_TRIGGERED")
+        elif byte == b'0':
+            time.sleep(self.step_seconds)
+            self.gate_open = False
+            self.println("GATE_CLOSED")
+
+
+class EntryGateSim(SimulatedDevice):
+    """gate/gate.ino: streams distance readings, servo follows '1'/'0'"""
+
+    def __init__(self, name='entry-gate', distance=120.0, period=0.05, **kwargs):
+        super().__init__(name, **kwargs)
+        self.distance = distance  # cm, set by the test to place a vehicle
+        self.period = period
+        self.barrier_open = False
+
+    def setup(self):
+        thread = threading.Thread(target=self._sensor_loop, name=f"sim-{self.name}-sensor", daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _sensor_loop(self):
+        while self.running:
+            self.println(f"{self.distance:.2f}", reply=False)
+            time.sleep(self.period)
+
+    def on_byte(self, byte):
+        if byte == b'1':
+            self.barrier_open = True
+        elif byte == b'0':
+            self.barrier_open = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate the parking Arduinos on pseudo-terminals")
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds before each reply")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random delay, seconds")
+    parser.add_argument('--faults', default='', help="e.g. drop=0.05,garble=0.01,stall=0.1")
+    parser.add_argument('--open-seconds', type=float, default=15.0, help="exit gate hold time")
+    args = parser.parse_args()
+
+    options = dict(delay=args.delay, jitter=args.jitter, faults=Faults.parse(args.faults))
+    payment = PaymentTerminalSim(**options).open()
+    exit_gate = ExitGateSim(open_seconds=args.open_seconds, **options).open()
+    entry_gate = EntryGateSim(**options).open()
+
+    print(f"[SIM] Payment terminal: {payment.port}")
+    print(f"[SIM] Exit gate:        {exit_gate.port}")
+    print(f"[SIM] Entry gate:       {entry_gate.port}")
+    print("Commands: tap PLATE [BALANCE] | detect | distance CM | quit")
+
+    try:
+        while True:
+            words = input("> ").split()
+            if not words:
+                continue
+            if words[0] == 'tap' and len(words) >= 2:
+                payment.tap(words[1], float(words[2]) if len(words) > 2 else None)
+            elif words[0] == 'detect':
+                exit_gate.detect_vehicle()
+            elif words[0] == 'distance' and len(words) == 2:
+                entry_gate.distance = float(words[1])
+            elif words[0] == 'quit':
+                break
+            else:
+                print("Unknown command")
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        for device in (payment, exit_gate, entry_gate):
+            device.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import argparse
+import time
+from datetime import datetime
+
+from database import ParkingDatabase, date_trunc_hour
+from log_config import configure
+from device_simulator import ExitGateSim, Faults, PaymentTerminalSim
+from load_test import percentile
+from process_payment import is_card_data, process_card
+from serial_transport import SerialTransport
+from session_index import OpenSessionIndex
+
+PLATE_PREFIX = 'SIM'  # benchmark sessions are removed afterwards by this prefix
+STAGES = ['card', 'payment', 'index', 'exit', 'total']
+
+
+class EndToEndBenchmark:
+    """Drives card -> payment -> exit through simulated devices and the real database
+
+    Stages, each measured from the end of the previous one:
+      card     tap until the host has parsed the PLATE line
+      payment  process_card: lookup, amount sent, DONE, update_payment
+      index    until the payment NOTIFY reaches the open-session index
+      exit     close_session and '1' until the gate reports GATE_OPENED
+    """
+
+    def __init__(self, db, payment, exit_gate, timeout):
+        self.db = db
+        self.payment = payment
+        self.exit_gate = exit_gate
+        self.timeout = timeout
+        self.terminal = SerialTransport(payment.port, 9600, reset_delay=0, name='payment').open()
+        self.gate = SerialTransport(exit_gate.port, 9600, reset_delay=0, name='exit-gate').open()
+        self.session_index = OpenSessionIndex(db)
+        self.session_index.start()
+        self.timings = {stage: [] for stage in STAGES}
+        self.failures = {}
+        self.started = datetime.now()
+
+    def close(self):
+        self.session_index.stop()
+        self.terminal.close()
+        self.gate.close()
+
+    def fail(self, stage):
+        self.failures[stage] = self.failures.get(stage, 0) + 1
+        return False
+
+    def wait_paid(self, plate):
+        deadline = time.perf_counter() + self.timeout
+        while time.perf_counter() < deadline:
+            session = self.session_index.get_paid(plate)
+            if session:
+                return session
+            time.sleep(0.001)
+        return None
+
+    def run_once(self, n, balance):
+        plate = f"{PLATE_PREFIX}{n % 10000:04d}"
+        if not self.db.add_vehicle(plate):
+            return self.fail('entry')
+
+        marks = [time.perf_counter()]
+        self.payment.tap(plate, balance)
+        line = self.terminal.wait_for(is_card_data, timeout=self.timeout)
+        if not line:
+            return self.fail('card')
+        marks.append(time.perf_counter())
+
+        success, _, _ = process_card(self.db, line, self.terminal, timeout=self.timeout)
+        self.db.release()
+        if not success:
+            return self.fail('payment')
+        marks.append(time.perf_counter())
+
+        session = self.wait_paid(plate)
+        if not session:
+            return self.fail('index')
+        marks.append(time.perf_counter())
+
+        vehicle_id = session[0]
+        if not self.db.close_session(vehicle_id):
+            return self.fail('exit')
+        self.session_index.remove(plate, vehicle_id)
+        if self.gate.request(b'1', expect=lambda l: l == 'GATE_OPENED', timeout=self.timeout) is None:
+            return self.fail('exit')
+        marks.append(time.perf_counter())
+        # Let the simulated gate finish its cycle before the next car
+        self.gate.wait_for(lambda l: l == 'GATE_CLOSED', timeout=self.timeout)
+
+        for stage, start, end in zip(STAGES, marks, marks[1:]):
+            self.timings[stage].append(end - start)
+        self.timings['total'].append(marks[-1] - marks[0])
+        return True
+
+    def cleanup(self):
+        """Remove the benchmark's sessions and the rollups they touched"""
+        with self.db.conn.cursor() as cur:
+            cur.execute("DELETE FROM vehicles WHERE plate_number LIKE %s AND entry_time >= %s",
+                        (PLATE_PREFIX + '%', self.started))
+            removed = cur.rowcount
+        self.db.conn.commit()
+        self.db.rebuild_hourly_stats(since=date_trunc_hour(self.started))
+        return removed
+
+    def report(self, elapsed):
+        print(f"\n{'stage':<10}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for stage in STAGES:
+            values = sorted(self.timings[stage])
+            print(f"{stage:<10}{len(values):>8}{percentile(values, 50) * 1000:>10.1f}"
+                  f"{percentile(values, 90) * 1000:>10.1f}{percentile(values, 99) * 1000:>10.1f}"
+                  f"{(values[-1] if values else 0) * 1000:>10.1f}")
+        completed = len(self.timings['total'])
+        print(f"\nCompleted {completed} vehicles in {elapsed:.1f}s")
+        if self.failures:
+            print("Failures: " + ', '.join(f"{stage}: {count}" for stage, count in sorted(self.failures.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end latency through simulated Arduinos")
+    parser.add_argument('--vehicles', type=int, default=100)
+    parser.add_argument('--balance', type=float, default=100000, help="card balance for each vehicle")
+    parser.add_argument('--device-delay', type=float, default=0.0, help="seconds before each device reply")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--faults', default='', help="e.g. drop=0.05,garble=0.01,stall=0.1")
+    parser.add_argument('--card-write', type=float, default=0.05, help="seconds for the MIFARE write")
+    parser.add_argument('--gate-step', type=float, default=0.5, help="seconds to swing the barrier")
+    parser.add_argument('--timeout', type=float, default=5.0)
+    parser.add_argument('--keep', action='store_true', help="keep the SIM sessions in the database")
+    args = parser.parse_args()
+    configure()
+
+    options = dict(delay=args.device_delay, jitter=args.jitter, faults=Faults.parse(args.faults))
+    payment = PaymentTerminalSim(write_seconds=args.card_write, **options).open()
+    exit_gate = ExitGateSim(open_seconds=0, step_seconds=args.gate_step, **options).open()
+
+    db = ParkingDatabase(pool_size=2)
+    db.init_db()
+    benchmark = EndToEndBenchmark(db, payment, exit_gate, args.timeout)
+    print(f"[BENCH] {args.vehicles} vehicles via {payment.port} and {exit_gate.port}")
+
+    started = time.perf_counter()
+    try:
+        for n in range(args.vehicles):
+            benchmark.run_once(n, args.balance)
+        elapsed = time.perf_counter() - started
+    finally:
+        benchmark.close()
+        payment.close()
+        exit_gate.close()
+
+    benchmark.report(elapsed)
+    if not args.keep:
+        print(f"[BENCH] Removed {benchmark.cleanup()} benchmark sessions")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
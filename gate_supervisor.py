@@ -0,0 +1,269 @@
+import argparse
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from device_discovery import PROBE_SECONDS, ROLE_BAUDRATES, discover
+from payment_service import PaymentService
+from lane_startup import read_status
+from log_config import configure
+
+log = logging.getLogger('gate_supervisor')
+
+LANES_FILE = os.getenv('LANES_FILE', 'lanes.json')
+RESTART_BACKOFF = (1, 2, 5, 10, 30)  # seconds before successive restarts of a station
+STATION_SCRIPTS = {'entry': 'car_entry.py', 'exit': 'car_exit.py'}
+STATION_ROLES = {'entry': 'entry_gate', 'exit': 'exit_gate'}
+STATUS_DIR = os.getenv('LANE_STATUS_DIR', 'run')  # each station writes its readiness here
+
+
+def load_lanes(path=LANES_FILE):
+    """Lane definitions from lanes.json, or None to build one lane per set of discovered boards
+
+    {"lanes": [{"name": "north",
+                "entry": {"device": {"serial_number": "..."}, "camera": 0},
+                "exit": {"device": {"location": "1-1.3"}, "camera": 1},
+                "payment": {"device": {"port": "/dev/ttyACM2"}}}]}
+
+    A device spec matches any DiscoveredDevice attributes (port, serial_number,
+    location, vid, pid); an empty or missing spec takes the next free board
+    of the right role.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)['lanes']
+
+
+def auto_lanes(devices):
+    """Pair the n-th entry gate, exit gate and payment board into lane n"""
+    by_role = {role: [d for d in devices if d.role == role] for role in ('entry_gate', 'exit_gate', 'payment')}
+    count = max([len(found) for found in by_role.values()] + [0])
+    lanes, camera = [], 0
+    for n in range(count):
+        lane = {'name': f"lane{n + 1}"}
+        for station, role in (('entry', 'entry_gate'), ('exit', 'exit_gate'), ('payment', 'payment')):
+            if n < len(by_role[role]):
+                device = by_role[role][n]
+                spec = {'serial_number': device.serial_number} if device.serial_number else {'port': device.port}
+                lane[station] = {'device': spec}
+                if station != 'payment':
+                    lane[station]['camera'] = camera
+                    camera += 1
+        lanes.append(lane)
+    return lanes
+
+
+def claim(devices, role, spec, taken):
+    """First free device of the role matching spec
+
+    A board that stayed silent during the probe (e.g. one that does not reset
+    when the port opens) is only taken when the spec names it explicitly.
+    """
+    for device in devices:
+        if device.port in taken or not device.matches(spec or {}):
+            continue
+        if device.role is None and spec:
+            device.role, device.baudrate = role, ROLE_BAUDRATES[role]
+        if device.role == role:
+            taken.add(device.port)
+            return device
+    return None
+
+
+class Station:
+    """A camera script (car_entry.py / car_exit.py) bound to one gate board, restarted if it dies"""
+
+    def __init__(self, lane, kind, spec, camera):
+        self.name = f"{lane}-{kind}"
+        self.kind = kind
+        self.spec = spec or {}
+        self.camera = camera
+        self.device = None
+        self.process = None
+        self.restarts = 0
+        self.next_start = 0.0
+        self.status_file = os.path.join(STATUS_DIR, f"{self.name}.json")
+        self.state = None
+        self.started = 0.0
+
+    def start(self):
+        if os.path.exists(self.status_file):
+            os.remove(self.status_file)  # a previous run's state must not pass for this one's
+        env = dict(os.environ, GATE_PORT=self.device.port, GATE_PORT_BAUDRATE=str(self.device.baudrate),
+                   CAMERA_INDEX=str(self.camera), GATE_NAME=self.name, PYTHONUNBUFFERED='1',
+                   LANE_STATUS_FILE=self.status_file)
+        self.process = subprocess.Popen([sys.executable, STATION_SCRIPTS[self.kind]], env=env,
+                                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        threading.Thread(target=self._relay, args=(self.process,), name=f"log-{self.name}", daemon=True).start()
+        self.state = 'starting'
+        self.started = time.monotonic()
+        log.info("[SUPERVISOR] Started %s on %s (camera %s, pid %s)",
+                 self.name, self.device.port, self.camera, self.process.pid)
+
+    def _relay(self, process):
+        for line in process.stdout:
+            # The station already rate-limits its own logging
+            log.info("[%s] %s", self.name, line.rstrip(), extra={'rate_limit': False})
+
+    def check_ready(self):
+        """Log the station's readiness when it changes, as written by lane_startup.py"""
+        status = read_status(self.status_file)
+        if not status or status.get('pid') != self.process.pid or status['state'] == self.state:
+            return
+        self.state = status['state']
+        elapsed = time.monotonic() - self.started
+        if self.state == 'ready':
+            log.info("[SUPERVISOR] %s ready %.1fs after start", self.name, elapsed)
+        elif self.state != 'starting':
+            failed = [name for name, c in status['components'].items() if c['state'] != 'ready']
+            log.warning("[SUPERVISOR] %s %s %.1fs after start (%s)",
+                        self.name, self.state, elapsed, ', '.join(failed))
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def exited(self):
+        """Record a crash and schedule the restart; returns the exit code"""
+        code = self.process.returncode
+        delay = RESTART_BACKOFF[min(self.restarts, len(RESTART_BACKOFF) - 1)]
+        self.restarts += 1
+        self.next_start = time.monotonic() + delay
+        self.process = None
+        self.state = None
+        log.warning("[SUPERVISOR] %s exited with %s, restarting in %ss", self.name, code, delay)
+        return code
+
+    def stop(self, timeout=10):
+        if not self.running:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class GateSupervisor:
+    """Runs every lane of the site from one process
+
+    Gate stations run as child processes (each has its own camera and YOLO
+    model); payment boards share one in-process PaymentService.
+    """
+
+    def __init__(self, lanes, devices, workers=None):
+        taken = set()
+        self.stations = []
+        payment_ports = []
+        for lane in lanes:
+            for kind in ('entry', 'exit'):
+                if kind not in lane:
+                    continue
+                station = Station(lane['name'], kind, lane[kind].get('device'), lane[kind].get('camera', 0))
+                station.device = claim(devices, STATION_ROLES[kind], station.spec, taken)
+                if not station.device:
+                    log.warning("[SUPERVISOR] No %s matches %s for %s",
+                                STATION_ROLES[kind], station.spec, station.name)
+                self.stations.append(station)
+            if 'payment' in lane:
+                device = claim(devices, 'payment', lane['payment'].get('device'), taken)
+                if device:
+                    payment_ports.append(device.port)
+                else:
+                    log.warning("[SUPERVISOR] No payment board for %s", lane['name'])
+
+        self.payments = PaymentService(payment_ports, workers or len(payment_ports)) if payment_ports else None
+        self.stopping = threading.Event()
+
+    def claimed_ports(self, besides=None):
+        """Ports assigned to any other station (running or waiting to restart) and the payment terminals"""
+        ports = {s.device.port for s in self.stations if s.device and s is not besides}
+        if self.payments:
+            ports.update(t.port for t in self.payments.terminals)
+        return ports
+
+    def relocate(self, station):
+        """Find a missing or replugged board again, without probing or claiming other stations' boards"""
+        taken = self.claimed_ports(besides=station)
+        found = discover(PROBE_SECONDS, exclude=taken)
+        station.device = claim(found, STATION_ROLES[station.kind], station.spec, taken)
+        return station.device is not None
+
+    def start(self):
+        if self.payments:
+            self.payments.start()
+            threading.Thread(target=self.payments.run_forever, name="payments", daemon=True).start()
+        for station in self.stations:
+            if station.device:
+                station.start()
+
+    def supervise(self):
+        now = time.monotonic()
+        for station in self.stations:
+            if station.running:
+                if station.state not in ('ready', 'degraded'):
+                    station.check_ready()
+                continue
+            if station.process is not None:
+                station.exited()
+                continue
+            if now < station.next_start:
+                continue
+            if not station.device or not os.path.exists(station.device.port):
+                if not self.relocate(station):
+                    station.next_start = now + RESTART_BACKOFF[-1]
+                    continue
+            station.start()
+
+    def run_forever(self):
+        while not self.stopping.wait(1):
+            self.supervise()
+
+    def stop(self):
+        self.stopping.set()
+        for station in self.stations:
+            station.stop()
+        if self.payments:
+            self.payments.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discover parking boards and run every lane from one process")
+    parser.add_argument('--lanes', default=LANES_FILE, help="lane assignment file")
+    parser.add_argument('--workers', type=int, default=None, help="concurrent payments")
+    parser.add_argument('--dry-run', action='store_true', help="print the lane assignment and exit")
+    args = parser.parse_args()
+    configure('supervisor')
+
+    devices = discover()
+    for device in devices:
+        print(f"[DISCOVERY] {device}")
+    lanes = load_lanes(args.lanes) or auto_lanes(devices)
+    if args.dry_run:
+        print(json.dumps(lanes, indent=2))
+        return
+
+    supervisor = GateSupervisor(lanes, devices, args.workers)
+
+    def shutdown(signum, frame):
+        log.info("[SUPERVISOR] Shutting down...")
+        supervisor.stopping.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    supervisor.start()
+    try:
+        supervisor.run_forever()
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()
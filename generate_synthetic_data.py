@@ -0,0 +1,128 @@
+import argparse
+import math
+import random
+import string
+import time
+from datetime import datetime, timedelta
+
+from database import ParkingDatabase
+from log_config import configure
+from history_transfer import bulk_load, copy_in, copy_line, settle_bulk_load
+from tariff import get_tariff
+
+GATES = ['ExitGate1', 'ExitGate2', 'ExitGate3']
+PLATE_LETTERS = [c for c in string.ascii_uppercase if c not in 'IOQ']
+
+# Relative arrival rate for each hour of the day (morning and evening peaks)
+HOURLY_WEIGHTS = [
+    0.2, 0.1, 0.1, 0.1, 0.2, 0.5, 1.5, 3.0, 3.5, 2.5, 2.0, 2.0,
+    2.2, 2.0, 1.8, 1.8, 2.2, 3.0, 3.2, 2.0, 1.2, 0.8, 0.5, 0.3,
+]
+
+
+def random_plate(rng):
+    """Rwandan private plate, e.g. RAH972U"""
+    return (f"RA{rng.choice(PLATE_LETTERS)}{rng.randint(0, 999):03d}"
+            f"{rng.choice(PLATE_LETTERS)}")
+
+
+def random_entry_time(rng, start, days):
+    day = start + timedelta(days=rng.randrange(days))
+    hour = rng.choices(range(24), weights=HOURLY_WEIGHTS)[0]
+    return day + timedelta(hours=hour, seconds=rng.randrange(3600))
+
+
+def random_stay(rng):
+    """Mostly short stays with a long tail (median ~1.5 h)"""
+    return timedelta(minutes=max(5.0, rng.lognormvariate(math.log(90), 0.8)))
+
+
+class SyntheticHistory:
+    def __init__(self, sessions, days, plates, unpaid_rate, seed):
+        self.rng = random.Random(seed)
+        self.sessions = sessions
+        self.days = days
+        self.unpaid_rate = unpaid_rate
+        self.plates = [random_plate(self.rng) for _ in range(plates)]
+        self.end = datetime.now()
+        self.start = (self.end - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.unauthorized = []  # (vehicle_id, plate, exit_time, gate)
+        self.oldest = None
+        self.tariff = get_tariff()
+
+    def vehicle_rows(self, first_id):
+        rng = self.rng
+        for n in range(self.sessions):
+            vehicle_id = first_id + n
+            plate = rng.choice(self.plates)
+            entry_time = random_entry_time(rng, self.start, self.days)
+            exit_time = entry_time + random_stay(rng)
+            if self.oldest is None or entry_time < self.oldest:
+                self.oldest = entry_time
+
+            if exit_time > self.end:
+                # Still parked
+                yield copy_line((vehicle_id, plate, entry_time, None, 0, None, None))
+                continue
+
+            if rng.random() < self.unpaid_rate:
+                # Left without paying
+                self.unauthorized.append((vehicle_id, plate, exit_time, rng.choice(GATES)))
+                yield copy_line((vehicle_id, plate, entry_time, exit_time, 0, None, None))
+                continue
+
+            payment_time = max(exit_time - timedelta(minutes=rng.uniform(1, 10)), entry_time)
+            _, amount = self.tariff.quote(plate, entry_time, at=payment_time)
+            yield copy_line((vehicle_id, plate, entry_time, exit_time, 1, amount, payment_time))
+
+    def unauthorized_rows(self):
+        for vehicle_id, plate, exit_time, gate in self.unauthorized:
+            yield copy_line((str(vehicle_id), 'Unpaid exit', plate, exit_time, gate))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the parking database with synthetic history")
+    parser.add_argument('--sessions', type=int, default=100000, help="number of parking sessions")
+    parser.add_argument('--days', type=int, default=365, help="days of history ending now")
+    parser.add_argument('--plates', type=int, default=None,
+                        help="distinct vehicles (default: sessions / 8, i.e. regular visitors)")
+    parser.add_argument('--unpaid-rate', type=float, default=0.02,
+                        help="share of sessions that leave without paying")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    configure()
+
+    db = ParkingDatabase()
+    db.init_db()
+    history = SyntheticHistory(args.sessions, args.days, args.plates or max(1, args.sessions // 8),
+                               args.unpaid_rate, args.seed)
+    db.ensure_partitions(start=history.start)
+
+    started = time.time()
+    # Reserve a block of ids so unauthorized exits can point at their sessions
+    with db.conn.cursor() as cur:
+        cur.execute("SELECT nextval(pg_get_serial_sequence('vehicles', 'id'))")
+        first_id = cur.fetchone()[0]
+        cur.execute("SELECT setval(pg_get_serial_sequence('vehicles', 'id'), %s)",
+                    (first_id + args.sessions,))
+    db.conn.commit()
+
+    with bulk_load(db):
+        copy_in(db, 'vehicles', ('id', 'plate_number', 'entry_time', 'exit_time', 'payment_status',
+                                 'payment_amount', 'payment_time'), history.vehicle_rows(first_id))
+        copy_in(db, 'unauthorized_exits', ('vehicle_id', 'reason', 'plate_number', 'exit_time',
+                                           'gate_location'), history.unauthorized_rows())
+    loaded = time.time() - started
+
+    settle_bulk_load(db, history.oldest)
+    with db.conn.cursor() as cur:
+        cur.execute("ANALYZE vehicles")
+        cur.execute("ANALYZE unauthorized_exits")
+    db.conn.commit()
+
+    print(f"✅ Loaded {args.sessions} sessions ({len(history.unauthorized)} unauthorized exits) "
+          f"in {loaded:.1f}s, total {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
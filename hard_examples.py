@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+import cv2
+
+from dataset_audit import perceptual_hash
+
+log = logging.getLogger('hard_examples')
+
+HARD_EXAMPLES_DIR = os.getenv('HARD_EXAMPLES_DIR', 'dataset/staging')
+LOW_CONFIDENCE = float(os.getenv('HARD_EXAMPLE_CONFIDENCE', '0.5'))
+PER_MINUTE = float(os.getenv('HARD_EXAMPLES_PER_MINUTE', '6'))
+BURST = 3
+DUPLICATE_DISTANCE = 6  # pHash bits; a stationary car yields near-identical frames
+RECENT_HASHES = 512
+MAX_PENDING = 16  # frames waiting for disk; more are dropped rather than slowing the gate
+
+
+def ambiguous_vote(plate_buffer):
+    """True when the reads behind a decision do not clearly agree"""
+    votes = Counter(plate_buffer).most_common(2)
+    return votes[0][1] < 2 or (len(votes) > 1 and votes[0][1] == votes[1][1])
+
+
+class HardExampleMiner:
+    """Saves frames the recognition loop struggled with, as pre-labelled YOLO examples
+
+    consider() is cheap and never blocks: it rate-limits with a token bucket,
+    skips frames that look like one saved recently, and hands the rest to a
+    writer thread. Examples land in HARD_EXAMPLES_DIR/images and /labels with
+    the detector's boxes as labels, plus examples.jsonl describing why each
+    was kept. Review them, then move them into images/cars and re-run
+    arrange_dataset.py.
+    """
+
+    def __init__(self, source, staging_dir=HARD_EXAMPLES_DIR, per_minute=PER_MINUTE, burst=BURST):
+        self.source = source
+        self.staging_dir = staging_dir
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+        self.recent = deque(maxlen=RECENT_HASHES)
+        self.pending = queue.Queue(maxsize=MAX_PENDING)
+        self.lock = threading.Lock()
+        self.counts = Counter()  # reason -> saved
+        self.thread = None
+
+    def start(self):
+        for kind in ('images', 'labels'):
+            os.makedirs(os.path.join(self.staging_dir, kind), exist_ok=True)
+        self.thread = threading.Thread(target=self._write_loop, name="hard-examples", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.thread:
+            self.pending.put(None)
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+    def consider(self, frame, result, reason, **details):
+        """Queue frame as a hard example unless rate-limited or a near-duplicate"""
+        if self.thread is None:
+            return False
+        with self.lock:
+            # Rate limit first so most frames cost nothing
+            self._refill()
+            if self.tokens < 1:
+                return False
+            small = cv2.resize(frame, (frame.shape[1] // 4, frame.shape[0] // 4), interpolation=cv2.INTER_AREA)
+            phash = perceptual_hash(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+            if any(bin(phash ^ seen).count('1') <= DUPLICATE_DISTANCE for seen in self.recent):
+                return False
+            self.tokens -= 1
+            self.recent.append(phash)
+
+        boxes = [(int(cls), *xywhn) for cls, xywhn in zip(result.boxes.cls.tolist(), result.boxes.xywhn.tolist())]
+        confidences = [round(c, 3) for c in result.boxes.conf.tolist()]
+        try:
+            self.pending.put_nowait((frame.copy(), boxes, confidences, reason, details, datetime.now()))
+        except queue.Full:
+            return False
+        return True
+
+    def low_confidence(self, result, threshold=LOW_CONFIDENCE):
+        return any(conf < threshold for conf in result.boxes.conf.tolist())
+
+    def _write_loop(self):
+        log_path = os.path.join(self.staging_dir, 'examples.jsonl')
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            frame, boxes, confidences, reason, details, captured_at = item
+            name = f"{self.source}_{captured_at:%Y%m%d_%H%M%S_%f}_{reason}"
+            try:
+                cv2.imwrite(os.path.join(self.staging_dir, 'images', f"{name}.jpg"), frame)
+                with open(os.path.join(self.staging_dir, 'labels', f"{name}.txt"), 'w') as f:
+                    f.write(''.join(f"{cls} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n" for cls, x, y, w, h in boxes))
+                with open(log_path, 'a') as f:
+                    f.write(json.dumps({'image': f"{name}.jpg", 'source': self.source, 'reason': reason,
+                                        'captured_at': captured_at.isoformat(), 'confidences': confidences,
+                                        **details}) + '\n')
+                self.counts[reason] += 1
+            except Exception as e:
+                log.error("[MINING] Could not save %s: %s", name, e)
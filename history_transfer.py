@@ -0,0 +1,323 @@
+import argparse
+import csv
+import io
+import itertools
+from contextlib import contextmanager
+from datetime import datetime
+from database import ParkingDatabase
+from log_config import configure
+from payment_success import is_payment_event, read_events
+
+VEHICLE_COLUMNS = ('plate_number', 'entry_time', 'exit_time', 'payment_status',
+                   'payment_amount', 'payment_time')
+EXIT_COLUMNS = ('reason', 'plate_number', 'exit_time', 'gate_location')
+
+EXPORT_QUERIES = {
+    'vehicles': """
+        SELECT id, plate_number, entry_time, exit_time, payment_status, payment_amount, payment_time
+        FROM vehicle_history {where} ORDER BY entry_time
+    """,
+    'unauthorized_exits': """
+        SELECT id, vehicle_id, reason, plate_number, exit_time, gate_location
+        FROM unauthorized_exits {where} ORDER BY exit_time
+    """,
+}
+EXPORT_TIME_COLUMN = {'vehicles': 'entry_time', 'unauthorized_exits': 'exit_time'}
+LEGACY_UNAUTHORIZED_REASON = 'Imported: flagged is_unauthorized'
+TRUE_VALUES = ('t', 'true', '1', 'y', 'yes')
+
+
+class RowStream(io.RawIOBase):
+    """File-like object that feeds COPY FROM STDIN from a row generator"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while len(self.buffer) < len(target):
+            try:
+                self.buffer += next(self.rows)
+            except StopIteration:
+                break
+        size = min(len(target), len(self.buffer))
+        target[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+
+def copy_field(value):
+    """Encode one value for COPY text format"""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_line(values):
+    return ('\t'.join(copy_field(v) for v in values) + '\n').encode()
+
+
+def unescape_copy_field(field):
+    """Decode one value from pg_dump COPY text format"""
+    if field == '\\N':
+        return None
+    if '\\' not in field:
+        return field
+    out = []
+    chars = iter(field)
+    for c in chars:
+        if c == '\\':
+            c = next(chars, '')
+            out.append({'t': '\t', 'n': '\n', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v'}.get(c, c))
+        else:
+            out.append(c)
+    return ''.join(out)
+
+
+def parse_time(value):
+    if value in (None, ''):
+        return None
+    return datetime.fromisoformat(value.strip())
+
+
+def validate_plate(value):
+    plate = (value or '').strip().upper()
+    if not plate or len(plate) > 10:
+        raise ValueError(f"invalid plate {value!r}")
+    return plate
+
+
+class Importer:
+    """Validates source rows and tallies rejects while they stream into COPY"""
+
+    def __init__(self, rejects=None):
+        self.accepted = 0
+        self.rejected = 0
+        self.rejects = rejects
+        self.oldest = None
+        self.flagged_exits = []  # unauthorized_exits rows for legacy vehicles flagged is_unauthorized
+
+    def seen(self, moment):
+        if self.oldest is None or moment < self.oldest:
+            self.oldest = moment
+
+    def reject(self, source, line_no, raw, error):
+        self.rejected += 1
+        if self.rejects:
+            self.rejects.write(f"{source}:{line_no}\t{error}\t{raw}\n")
+        elif self.rejected <= 20:
+            print(f"[SKIP] {source}:{line_no}: {error}")
+
+    def plates_log_rows(self, path, keep_open=False):
+        """Rows from the legacy plates_log.csv (plate, status, timestamp[, amount])
+
+        Payment events appended by payment_success.PlatesLog are folded into
+        the entry rows they pay for rather than imported as sessions.
+        """
+        payments = {(row[0], row[2]): row for row in read_events(path) if is_payment_event(row)}
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)  # header
+            for line_no, row in enumerate(reader, 2):
+                if not row or not any(cell.strip() for cell in row):
+                    continue
+                if is_payment_event(row):
+                    continue
+                try:
+                    if len(row) < 3:
+                        raise ValueError(f"expected at least 3 columns, got {len(row)}")
+                    plate = validate_plate(row[0])
+                    status = int(row[1])
+                    if status not in (0, 1):
+                        raise ValueError(f"invalid payment status {row[1]!r}")
+                    entry_time = parse_time(row[2])
+                    amount = float(row[3]) if len(row) > 3 and row[3].strip() else None
+                except ValueError as e:
+                    self.reject(path, line_no, ','.join(row), e)
+                    continue
+
+                # The log has no exit times; closing at entry keeps old rows
+                # from showing up as parked cars
+                exit_time = None if keep_open else entry_time
+                payment_time = entry_time if status == 1 else None
+                payment = payments.get((row[0], row[2])) if status == 0 else None
+                if payment:
+                    status, payment_time = 1, parse_time(payment[4])
+                    amount = float(payment[3]) if payment[3].strip() else None
+                self.seen(entry_time)
+                self.accepted += 1
+                yield copy_line((plate, entry_time, exit_time, status, amount, payment_time))
+
+    def dump_rows(self, path, table):
+        """Rows of one table from a pg_dump plain-text file, mapped onto the current schema"""
+        with open(path, encoding='utf-8') as f:
+            columns = None
+            for line_no, line in enumerate(f, 1):
+                line = line.rstrip('\n')
+                if columns is None:
+                    if line.startswith(f"COPY public.{table} (") and line.endswith("FROM stdin;"):
+                        header = line[line.index('(') + 1:line.rindex(')')]
+                        columns = [c.strip() for c in header.split(',')]
+                    continue
+                if line == '\\.':
+                    columns = None
+                    continue
+
+                record = dict(zip(columns, (unescape_copy_field(v) for v in line.split('\t'))))
+                try:
+                    if table == 'vehicles':
+                        values = self.map_vehicle(record)
+                        if (record.get('is_unauthorized') or '').strip().lower() in TRUE_VALUES:
+                            self.flagged_exits.append(self.flagged_exit(values))
+                    else:
+                        values = self.map_unauthorized_exit(record)
+                except (ValueError, TypeError) as e:
+                    self.reject(path, line_no, line, e)
+                    continue
+
+                self.seen(values[1] if table == 'vehicles' else values[2])
+                self.accepted += 1
+                yield copy_line(values)
+
+    def flagged_exit_rows(self):
+        """unauthorized_exits rows for the flagged vehicles; read after the vehicles COPY has run"""
+        for values in self.flagged_exits:
+            self.accepted += 1
+            yield copy_line(values)
+
+    @staticmethod
+    def flagged_exit(vehicle):
+        """An unauthorized_exits row for a legacy vehicle row flagged is_unauthorized"""
+        plate, entry_time, exit_time = vehicle[:3]
+        return (LEGACY_UNAUTHORIZED_REASON, plate, exit_time or entry_time, 'Unknown')
+
+    @staticmethod
+    def map_vehicle(record):
+        # Older dumps carry license_plate / is_unauthorized instead of plate_number;
+        # flagged rows also become unauthorized_exits rows (see dump_rows)
+        plate = validate_plate(record.get('plate_number') or record.get('license_plate'))
+        entry_time = parse_time(record.get('entry_time'))
+        if entry_time is None:
+            raise ValueError("missing entry_time")
+        status = int(record.get('payment_status') or 0)
+        amount = record.get('payment_amount')
+        return (plate, entry_time, parse_time(record.get('exit_time')), status,
+                float(amount) if amount else None, parse_time(record.get('payment_time')))
+
+    @staticmethod
+    def map_unauthorized_exit(record):
+        exit_time = parse_time(record.get('exit_time'))
+        if exit_time is None:
+            raise ValueError("missing exit_time")
+        gate = (record.get('gate_location') or 'Unknown')[:10]
+        # vehicle ids are reassigned on import, so the old reference is dropped
+        return (record.get('reason'), validate_plate(record.get('plate_number')), exit_time, gate)
+
+
+def copy_in(db, table, columns, rows):
+    with db.conn.cursor() as cur:
+        cur.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN",
+            io.BufferedReader(RowStream(rows), buffer_size=1 << 16),
+        )
+
+
+@contextmanager
+def bulk_load(db):
+    """Run COPYs in one transaction with triggers skipped for this session only"""
+    # Per-row NOTIFYs and rollup upserts would dominate the copy; the gates
+    # reconcile once and hourly_stats is rebuilt for the loaded range instead.
+    # session_replication_role (superuser) rather than ALTER TABLE ... DISABLE
+    # TRIGGER, which would lock vehicles against the live gates for the whole
+    # import. It also skips the statement-level data_versions bump, done below.
+    try:
+        with db.conn.cursor() as cur:
+            cur.execute("SET LOCAL session_replication_role = replica")
+        yield
+        with db.conn.cursor() as cur:
+            cur.execute("SET LOCAL session_replication_role = DEFAULT")
+            cur.execute("""
+                UPDATE data_versions SET version = version + 1,
+                    updated_at = GREATEST(updated_at, clock_timestamp() AT TIME ZONE 'utc')
+                WHERE name IN ('vehicles', 'unauthorized_exits')
+            """)
+            cur.execute("SELECT pg_notify('vehicle_sessions', '{\"reconcile\": true}')")
+        db.conn.commit()
+    except Exception:
+        db.conn.rollback()
+        raise
+
+
+def settle_bulk_load(db, oldest):
+    """Move loaded rows into their monthly partitions and refresh rollups from oldest on"""
+    with db.conn.cursor() as cur:
+        cur.execute("SELECT MIN(entry_time) FROM vehicles_default")
+        unpartitioned = cur.fetchone()[0]
+    if unpartitioned:
+        db.ensure_partitions(start=unpartitioned)
+    if oldest:
+        db.rebuild_hourly_stats(since=oldest)
+
+
+def import_history(db, args):
+    rejects = open(args.rejects, 'w') if args.rejects else None
+    importer = Importer(rejects)
+    try:
+        with bulk_load(db):
+            if args.source == 'plates-log':
+                copy_in(db, 'vehicles', VEHICLE_COLUMNS,
+                        importer.plates_log_rows(args.path, args.keep_open))
+            else:
+                copy_in(db, 'vehicles', VEHICLE_COLUMNS, importer.dump_rows(args.path, 'vehicles'))
+                copy_in(db, 'unauthorized_exits', EXIT_COLUMNS,
+                        itertools.chain(importer.dump_rows(args.path, 'unauthorized_exits'),
+                                        importer.flagged_exit_rows()))
+    finally:
+        if rejects:
+            rejects.close()
+
+    settle_bulk_load(db, importer.oldest)
+    print(f"✅ Imported {importer.accepted} rows, rejected {importer.rejected}")
+
+
+def export_history(db, args):
+    column = EXPORT_TIME_COLUMN[args.table]
+    where = f"WHERE {column} >= %s" if args.since else ''
+    with db.conn.cursor() as cur:
+        query = cur.mogrify(EXPORT_QUERIES[args.table].format(where=where),
+                            (args.since,) if args.since else None).decode()
+        with open(args.output, 'w', newline='') as out:
+            cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", out)
+    print(f"✅ Exported {args.table} to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import/export of parking history via COPY")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    imp = sub.add_parser('import', help="load plates_log.csv or a pg_dump file into the current schema")
+    imp.add_argument('source', choices=['plates-log', 'dump'])
+    imp.add_argument('path')
+    imp.add_argument('--keep-open', action='store_true',
+                     help="leave plates_log.csv sessions open instead of closing them at entry time")
+    imp.add_argument('--rejects', help="write rejected rows to this file")
+
+    exp = sub.add_parser('export', help="write history as CSV")
+    exp.add_argument('table', choices=sorted(EXPORT_QUERIES))
+    exp.add_argument('output', help="CSV file to write")
+    exp.add_argument('--since', type=datetime.fromisoformat, help="only rows at or after this time")
+
+    args = parser.parse_args()
+    configure()
+    db = ParkingDatabase()
+    if args.command == 'import':
+        import_history(db, args)
+    else:
+        export_history(db, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from log_config import shutdown as flush_logs
+
+log = logging.getLogger('lane_startup')
+
+MODEL_PATH = os.getenv('MODEL_PATH', 'best.pt')
+OCR_CONFIG = '--psm 8 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+WARMUP_SHAPE = (480, 640, 3)  # a typical webcam frame
+STARTUP_TIMEOUT = float(os.getenv('LANE_STARTUP_TIMEOUT', '120'))  # seconds
+LANE_STATUS_FILE = os.getenv('LANE_STATUS_FILE')  # set by gate_supervisor.py
+
+
+def load_model(path=MODEL_PATH):
+    """Load the detector and run one inference, so the first car does not pay for lazy setup"""
+    from ultralytics import YOLO  # imported here so the slow import overlaps the other tasks
+
+    model = YOLO(path)
+    model(np.zeros(WARMUP_SHAPE, dtype=np.uint8), verbose=False)
+    return model
+
+
+def warm_ocr():
+    """Run tesseract once; the first call pays for process start and loading its language data"""
+    import pytesseract
+
+    plate = np.full((60, 200), 255, dtype=np.uint8)
+    cv2.putText(plate, 'RAB123C', (8, 45), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 3)
+    pytesseract.image_to_string(plate, config=OCR_CONFIG)
+    return True
+
+
+def open_camera(index):
+    """Open the camera and wait for its first frame (drivers start streaming lazily)"""
+    cap = cv2.VideoCapture(index)
+    if not cap.isOpened():
+        raise RuntimeError(f"camera {index} did not open")
+    ret, _ = cap.read()
+    if not ret:
+        cap.release()
+        raise RuntimeError(f"camera {index} returned no frame")
+    return cap
+
+
+def connect_gate(role):
+    """Open the gate board for the role; raises when none is attached, so the lane reports degraded"""
+    from device_discovery import find_port
+    from serial_transport import SerialTransport
+
+    # GATE_PORT is set by gate_supervisor.py; otherwise the first board of the role found
+    port, baudrate = find_port(role, env='GATE_PORT')
+    if not port:
+        raise RuntimeError(f"no {role} board found")
+    transport = SerialTransport(port, baudrate).open()
+    log.info("[ARDUINO] Connected to %s", port)
+    return transport
+
+
+def release(result):
+    """Close whatever a component returned (cameras, serial ports, database connections)"""
+    for item in result if isinstance(result, tuple) else (result,):
+        for method in ('release', 'stop', 'close'):
+            if callable(getattr(item, method, None)):
+                try:
+                    getattr(item, method)()
+                except Exception as e:
+                    log.warning("[STARTUP] Could not close %r: %s", item, e)
+                break
+
+
+class LaneStartup:
+    """Brings a lane's components up concurrently and reports its readiness
+
+    Each component is a callable run in its own daemon thread; run() returns
+    their results by name once all have finished or the timeout has passed.
+    A component still hanging then (a camera or database that never answers)
+    counts as failed, and whatever it returns later is closed straight away.
+    The lane is 'ready' when every component came up, 'degraded' when only
+    optional ones failed, and 'failed' otherwise. The state is logged and,
+    when LANE_STATUS_FILE is set, written there as JSON so gate_supervisor.py
+    can report it.
+    """
+
+    def __init__(self, lane, status_file=LANE_STATUS_FILE):
+        self.lane = lane
+        self.status_file = status_file
+        self.tasks = {}  # name -> (callable, required)
+        self.components = {}  # name -> {'state', 'seconds', 'error'}
+        self.state = 'starting'
+        self.started = time.monotonic()
+        self.results = {}
+        self.lock = threading.Lock()
+        self.closed = False  # set at the deadline; later results are released
+
+    def add(self, name, task, required=True):
+        self.tasks[name] = (task, required)
+        self.components[name] = {'state': 'starting', 'required': required}
+        return self
+
+    def _run_one(self, name):
+        task, required = self.tasks[name]
+        started = time.monotonic()
+        try:
+            result = task()
+        except Exception as e:
+            with self.lock:
+                if self.closed:
+                    return
+                self.components[name].update(state='failed', seconds=round(time.monotonic() - started, 2),
+                                             error=str(e))
+                self.results[name] = None
+            log.log(logging.ERROR if required else logging.WARNING, "[STARTUP] %s failed after %.2fs: %s",
+                    name, time.monotonic() - started, e)
+            return
+        with self.lock:
+            late = self.closed
+            if not late:
+                self.components[name].update(state='ready', seconds=round(time.monotonic() - started, 2))
+                self.results[name] = result
+        if late:
+            log.warning("[STARTUP] %s came up after the deadline, closing it", name)
+            release(result)
+        else:
+            log.info("[STARTUP] %s ready in %.2fs", name, time.monotonic() - started)
+
+    def run(self, timeout=STARTUP_TIMEOUT):
+        self.set_state('starting')
+        # Daemon threads: a task that never returns must not keep the process alive
+        threads = [threading.Thread(target=self._run_one, args=(name,), name=f"startup-{name}", daemon=True)
+                   for name in self.tasks]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+        with self.lock:
+            self.closed = True
+            results = dict(self.results)
+            for name in self.tasks:
+                if name not in results:
+                    self.components[name].update(state='failed', error='timed out')
+                    log.error("[STARTUP] %s still not ready after %.1fs", name, timeout)
+                    results[name] = None
+
+        failed = [name for name, c in self.components.items() if c['state'] != 'ready']
+        if any(self.tasks[name][1] for name in failed):
+            self.set_state('failed')
+        else:
+            self.set_state('degraded' if failed else 'ready')
+        return results
+
+    def abort(self, results=None, code=1):
+        """Close the components that came up and exit now
+
+        os._exit rather than sys.exit, which would wait for threads stuck
+        in a hung task, so gate_supervisor.py sees the exit and restarts
+        the lane.
+        """
+        for result in (results or {}).values():
+            if result is not None:
+                release(result)
+        flush_logs()
+        os._exit(code)
+
+    def set_state(self, state):
+        self.state = state
+        elapsed = time.monotonic() - self.started
+        if state != 'starting':
+            level = logging.INFO if state == 'ready' else logging.WARNING
+            log.log(level, "[STARTUP] %s %s in %.2fs", self.lane, state, elapsed)
+        if not self.status_file:
+            return
+        status = {
+            'lane': self.lane,
+            'state': state,
+            'pid': os.getpid(),
+            'seconds': round(elapsed, 2),
+            'updated_at': datetime.now().isoformat(),
+            'components': self.components,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.status_file) or '.', exist_ok=True)
+            tmp = self.status_file + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(status, f)
+            os.replace(tmp, self.status_file)
+        except OSError as e:
+            log.warning("[STARTUP] Could not write %s: %s", self.status_file, e)
+
+
+def read_status(path):
+    """The status a lane last wrote, or None"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,148 @@
+import argparse
+import http.client
+import queue
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+DEFAULT_PATHS = ['/api/statistics', '/api/vehicles', '/api/unauthorized_exits']
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LoadTest:
+    """Open-loop load generator: requests are scheduled at a fixed rate regardless of latency"""
+
+    def __init__(self, base_url, paths, rate, duration, concurrency, conditional, compress):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.paths = paths
+        self.rate = rate
+        self.duration = duration
+        self.concurrency = concurrency
+        self.conditional = conditional
+        self.compress = compress
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)  # path -> seconds
+        self.statuses = defaultdict(lambda: defaultdict(int))  # path -> status -> count
+        self.errors = defaultdict(int)
+        self.late = 0
+
+    def connect(self):
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=30)
+        return http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+    def worker(self):
+        conn = self.connect()
+        etags = {}
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            path, scheduled = job
+            headers = {}
+            if self.compress:
+                headers['Accept-Encoding'] = 'br, gzip'
+            if self.conditional and path in etags:
+                headers['If-None-Match'] = etags[path]
+
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                # Latency is measured from the scheduled send time, so queueing counts too
+                latency = time.perf_counter() - scheduled
+                etag = response.getheader('ETag')
+                if etag:
+                    etags[path] = etag
+                with self.lock:
+                    self.latencies[path].append(latency)
+                    self.statuses[path][response.status] += 1
+            except Exception as e:
+                with self.lock:
+                    self.errors[f"{path}: {type(e).__name__}"] += 1
+                conn.close()
+                conn = self.connect()
+        conn.close()
+
+    def run(self):
+        threads = [threading.Thread(target=self.worker, daemon=True) for _ in range(self.concurrency)]
+        for t in threads:
+            t.start()
+
+        interval = 1.0 / self.rate
+        start = time.perf_counter()
+        total = int(self.rate * self.duration)
+        for n in range(total):
+            scheduled = start + n * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if self.jobs.qsize() > self.concurrency:
+                self.late += 1
+            self.jobs.put((self.paths[n % len(self.paths)], scheduled))
+
+        for _ in threads:
+            self.jobs.put(None)
+        for t in threads:
+            t.join()
+        return time.perf_counter() - start
+
+    def report(self, elapsed):
+        print(f"\n{'path':<28}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}"
+              f"{'max ms':>10}  statuses")
+        all_latencies = []
+        for path in self.paths:
+            values = sorted(self.latencies[path])
+            all_latencies.extend(values)
+            statuses = ' '.join(f"{code}:{count}" for code, count in sorted(self.statuses[path].items()))
+            print(f"{path:<28}{len(values):>8}{percentile(values, 50) * 1000:>10.1f}"
+                  f"{percentile(values, 90) * 1000:>10.1f}{percentile(values, 99) * 1000:>10.1f}"
+                  f"{(values[-1] if values else 0) * 1000:>10.1f}  {statuses}")
+
+        all_latencies.sort()
+        completed = len(all_latencies)
+        print(f"\nCompleted {completed} requests in {elapsed:.1f}s "
+              f"({completed / elapsed:.1f} req/s, target {self.rate:.1f})")
+        print(f"Overall p50 {percentile(all_latencies, 50) * 1000:.1f} ms, "
+              f"p99 {percentile(all_latencies, 99) * 1000:.1f} ms")
+        if self.late:
+            print(f"[WARN] {self.late} requests queued behind busy workers; raise --concurrency")
+        if self.errors:
+            print("Errors:")
+            for error, count in sorted(self.errors.items()):
+                print(f"  {error}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the parking API at a target request rate")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--rate', type=float, default=50, help="requests per second")
+    parser.add_argument('--duration', type=float, default=30, help="seconds")
+    parser.add_argument('--concurrency', type=int, default=32, help="client connections")
+    parser.add_argument('--path', action='append', dest='paths',
+                        help=f"endpoint to hit (repeatable, default: {' '.join(DEFAULT_PATHS)})")
+    parser.add_argument('--conditional', action='store_true',
+                        help="send If-None-Match like a polling browser")
+    parser.add_argument('--compress', action='store_true', help="send Accept-Encoding: br, gzip")
+    args = parser.parse_args()
+
+    test = LoadTest(args.url, args.paths or DEFAULT_PATHS, args.rate, args.duration,
+                    args.concurrency, args.conditional, args.compress)
+    print(f"[LOAD] {args.rate} req/s for {args.duration}s against {args.url}")
+    elapsed = test.run()
+    test.report(elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')  # per logger, e.g. "car_entry=DEBUG,database=WARNING"
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # text, or json for one object per line
+LOG_FILE = os.getenv('LOG_FILE')  # also write here; rotated externally (WatchedFileHandler)
+LOG_RATE = float(os.getenv('LOG_RATE', '2'))  # messages per second per message template
+LOG_BURST = int(os.getenv('LOG_BURST', '10'))
+LOG_SAMPLE = os.getenv('LOG_SAMPLE', '')  # keep 1 in N per type, e.g. "SENSOR=100,VALID=10"
+QUEUE_SIZE = 10000
+
+TAG = re.compile(r'^\[(\w+)\]')
+RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+def parse_pairs(spec, cast):
+    pairs = {}
+    for item in spec.split(','):
+        if '=' in item:
+            key, value = item.split('=', 1)
+            pairs[key.strip()] = cast(value.strip())
+    return pairs
+
+
+def message_type(record):
+    """The [TAG] a message starts with, else its logger name"""
+    match = TAG.match(str(record.msg))
+    return match.group(1) if match else record.name
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per message template, plus 1-in-N sampling per message type
+
+    Keyed on the unformatted message, so "[SENSOR] Distance: %s cm" is one
+    template whatever the distance. Dropped records are counted and the next
+    one let through carries the count as `suppressed`. Warnings and above
+    are never sampled, only rate limited. Pass extra={'rate_limit': False}
+    to exempt a record.
+    """
+
+    def __init__(self, rate=LOG_RATE, burst=LOG_BURST, sample=None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.sample = sample if sample is not None else parse_pairs(LOG_SAMPLE, int)
+        self.buckets = {}  # (logger, template) -> [tokens, refilled_at, suppressed]
+        self.seen = {}  # message type -> records seen, for sampling
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if not getattr(record, 'rate_limit', True):
+            return True
+        with self.lock:
+            every = self.sample.get(message_type(record))
+            if every and record.levelno < logging.WARNING:
+                kind = message_type(record)
+                self.seen[kind] = self.seen.get(kind, 0) + 1
+                if (self.seen[kind] - 1) % every:
+                    return False
+                record.sampled = every
+
+            if self.rate <= 0:
+                return True
+            now = time.monotonic()
+            key = (record.name, str(record.msg))
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [float(self.burst), now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            if bucket[2]:
+                record.suppressed, bucket[2] = bucket[2], 0
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: if the writer thread is behind, the record is dropped"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s')
+
+    def format(self, record):
+        text = super().format(record)
+        if getattr(record, 'suppressed', 0):
+            text += f" (+{record.suppressed} similar suppressed)"
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any extra= fields as keys"""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'logger': record.name,
+            'type': message_type(record),
+            'msg': record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in RECORD_FIELDS})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class ServiceFilter(logging.Filter):
+    """Stamps each record with the process's service name (the lane, for gates)"""
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def filter(self, record):
+        record.service = self.service
+        return True
+
+
+_listener = None
+_queue_handler = None
+_lock = threading.Lock()
+
+
+def configure(service=None, level=None):
+    """Route all logging through a background thread; safe to call more than once
+
+    Levels come from LOG_LEVEL and LOG_LEVELS, so each deployment can turn a
+    lane's chatty loggers down (or up) without code changes. Output goes to
+    stdout, where gate_supervisor.py and process managers collect it.
+    """
+    global _listener, _queue_handler
+    with _lock:
+        if _listener is not None:
+            return
+        formatter = JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter()
+        handlers = [logging.StreamHandler(sys.stdout)]
+        if LOG_FILE:
+            handlers.append(logging.handlers.WatchedFileHandler(LOG_FILE))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=QUEUE_SIZE))
+        _queue_handler.addFilter(RateLimitFilter())
+        if service:
+            _queue_handler.addFilter(ServiceFilter(service))
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(_queue_handler)
+        root.setLevel(level or LOG_LEVEL.upper())
+        for name, name_level in parse_pairs(LOG_LEVELS, str.upper).items():
+            logging.getLogger(name).setLevel(name_level)
+
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_restart_in_child)
+
+
+def _restart_in_child():
+    """A forked worker (gunicorn) inherits the queue but not the writer thread"""
+    global _listener
+    if _listener is None:
+        return
+    _queue_handler.queue = queue.Queue(maxsize=QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *_listener.handlers,
+                                               respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown():
+    """Flush queued records; registered with atexit by configure()"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
@@ -0,0 +1,201 @@
+import argparse
+import csv
+import itertools
+import os
+import time
+
+import numpy as np
+import yaml
+from ultralytics import YOLO
+
+MODEL_PATH = 'best.pt'
+DATASET_DIR = 'dataset'
+SWEEP_DIR = 'runs/sweep'
+RESULT_FIELDS = ['format', 'imgsz', 'conf', 'iou', 'map50', 'map50_95', 'precision_at_conf',
+                 'recall_at_conf', 'ms_per_frame', 'pareto']
+EXPORT_FORMATS = {'pt': None, 'onnx': 'onnx', 'openvino': 'openvino', 'torchscript': 'torchscript', 'ncnn': 'ncnn'}
+
+
+def parse_list(value, cast):
+    return [cast(v) for v in value.split(',') if v.strip()]
+
+
+def write_data_yaml(dataset_dir, sweep_dir):
+    """Point at the local dataset; license_plate.yaml carries absolute paths from another machine"""
+    with open('license_plate.yaml') as f:
+        names = yaml.safe_load(f)['names']
+    path = os.path.join(sweep_dir, 'data.yaml')
+    clean_list = os.path.join(dataset_dir, 'val.txt')  # written by dataset_audit.py
+    with open(path, 'w') as f:
+        yaml.safe_dump({
+            'path': os.path.abspath(dataset_dir),
+            'train': 'train/images',
+            'val': 'val.txt' if os.path.exists(clean_list) else 'val/images',
+            'names': names,
+        }, f, sort_keys=False)
+    return path
+
+
+def at_confidence(curve, conf):
+    """Value of a per-class metric curve (ultralytics samples them over confidence 0..1) at conf
+
+    metrics.box.mp / mr are taken at the F1-optimal confidence, not at the
+    threshold being swept, so they would not describe the deployed setting.
+    """
+    curve = np.asarray(curve)
+    if not curve.size:
+        return 0.0  # nothing detected
+    index = min(int(round(conf * (curve.shape[-1] - 1))), curve.shape[-1] - 1)
+    return float(curve[..., index].mean())
+
+
+def pareto_front(rows):
+    """Rows no other row beats on speed, recall and mAP50 at once"""
+    def dominates(a, b):
+        at_least = (a['ms_per_frame'] <= b['ms_per_frame'] and a['map50'] >= b['map50']
+                    and a['recall_at_conf'] >= b['recall_at_conf'])
+        better = (a['ms_per_frame'] < b['ms_per_frame'] or a['map50'] > b['map50']
+                  or a['recall_at_conf'] > b['recall_at_conf'])
+        return at_least and better
+
+    return [row for row in rows if not any(dominates(other, row) for other in rows if other is not row)]
+
+
+class ModelSweep:
+    """Evaluates every (format, imgsz, conf, iou) on dataset/val on CPU, resuming from results.csv"""
+
+    def __init__(self, model_path, data_yaml, sweep_dir):
+        self.model_path = model_path
+        self.data_yaml = data_yaml
+        self.sweep_dir = sweep_dir
+        self.results_path = os.path.join(sweep_dir, 'results.csv')
+        self.rows = []
+        self.exports = {}  # (format, imgsz) -> exported model path
+
+    def load(self):
+        if not os.path.exists(self.results_path):
+            return
+        with open(self.results_path, newline='') as f:
+            reader = csv.DictReader(f)
+            if 'recall_at_conf' not in (reader.fieldnames or ()):
+                # Earlier sweeps stored recall at the F1-optimal confidence; evaluate again
+                print(f"[SWEEP] Ignoring {self.results_path}: written before recall at conf was recorded")
+                return
+            for row in reader:
+                row.update({k: float(row[k]) for k in RESULT_FIELDS[2:-1]}, imgsz=int(row['imgsz']))
+                self.rows.append(row)
+
+    def done(self, fmt, imgsz, conf, iou):
+        return any(r['format'] == fmt and r['imgsz'] == imgsz and r['conf'] == conf and r['iou'] == iou
+                   for r in self.rows)
+
+    def exported(self, fmt, imgsz):
+        """Export once per format and size; static shapes are what the gates would deploy"""
+        if EXPORT_FORMATS[fmt] is None:
+            return self.model_path
+        key = (fmt, imgsz)
+        if key not in self.exports:
+            print(f"[SWEEP] Exporting {fmt} at {imgsz}px")
+            self.exports[key] = YOLO(self.model_path).export(format=EXPORT_FORMATS[fmt], imgsz=imgsz,
+                                                             device='cpu', dynamic=False)
+        return self.exports[key]
+
+    def evaluate(self, fmt, imgsz, conf, iou):
+        model = YOLO(self.exported(fmt, imgsz), task='detect')
+        # batch=1 so the speed is per frame, as at a gate
+        metrics = model.val(data=self.data_yaml, imgsz=imgsz, conf=conf, iou=iou, batch=1, device='cpu',
+                            plots=False, verbose=False, project=self.sweep_dir, name='val', exist_ok=True)
+        speed = metrics.speed
+        row = {
+            'format': fmt, 'imgsz': imgsz, 'conf': conf, 'iou': iou,
+            'map50': round(float(metrics.box.map50), 4),
+            'map50_95': round(float(metrics.box.map), 4),
+            # single class, so this is plate recall at the swept threshold
+            'precision_at_conf': round(at_confidence(metrics.box.p_curve, conf), 4),
+            'recall_at_conf': round(at_confidence(metrics.box.r_curve, conf), 4),
+            'ms_per_frame': round(speed['preprocess'] + speed['inference'] + speed['postprocess'], 2),
+        }
+        self.rows.append(row)
+        self.save()
+        return row
+
+    def save(self):
+        front = {id(r) for r in pareto_front(self.rows)}
+        os.makedirs(self.sweep_dir, exist_ok=True)
+        with open(self.results_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            for row in sorted(self.rows, key=lambda r: r['ms_per_frame']):
+                writer.writerow({**row, 'pareto': int(id(row) in front)})
+
+    def report(self, recall_target):
+        front = sorted(pareto_front(self.rows), key=lambda r: r['ms_per_frame'])
+        meeting = [r for r in front if r['recall_at_conf'] >= recall_target]
+        lines = [
+            f"# Detector sweep: {self.model_path}",
+            "",
+            f"{len(self.rows)} configurations on CPU; {len(front)} on the speed/recall/mAP50 Pareto front.",
+            "",
+            "| format | imgsz | conf | iou | ms/frame | recall | precision | mAP50 | mAP50-95 |",
+            "|---|---|---|---|---|---|---|---|---|",
+        ]
+        for r in front:
+            lines.append(f"| {r['format']} | {r['imgsz']} | {r['conf']} | {r['iou']} | {r['ms_per_frame']} | "
+                         f"{r['recall_at_conf']} | {r['precision_at_conf']} | {r['map50']} | {r['map50_95']} |")
+        lines.append("")
+        if meeting:
+            best = meeting[0]
+            lines.append(f"Fastest with recall >= {recall_target}: **{best['format']} imgsz={best['imgsz']} "
+                         f"conf={best['conf']} iou={best['iou']}** at {best['ms_per_frame']} ms/frame "
+                         f"(recall {best['recall_at_conf']}).")
+        else:
+            lines.append(f"No configuration reaches recall {recall_target}.")
+        path = os.path.join(self.sweep_dir, 'report.md')
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        return path, meeting[0] if meeting else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep detector settings on dataset/val and report the Pareto front")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--dataset', default=DATASET_DIR)
+    parser.add_argument('--out', default=SWEEP_DIR)
+    parser.add_argument('--imgsz', default='320,416,512,640', help="comma-separated input sizes")
+    parser.add_argument('--conf', default='0.1,0.25,0.4', help="comma-separated confidence thresholds")
+    parser.add_argument('--iou', default='0.5,0.7', help="comma-separated NMS IoU thresholds")
+    parser.add_argument('--formats', default='pt,onnx,openvino',
+                        help=f"comma-separated runtimes ({', '.join(EXPORT_FORMATS)})")
+    parser.add_argument('--recall-target', type=float, default=0.95)
+    args = parser.parse_args()
+
+    formats = parse_list(args.formats, str)
+    unknown = [f for f in formats if f not in EXPORT_FORMATS]
+    if unknown:
+        parser.error(f"unknown formats: {', '.join(unknown)}")
+
+    os.makedirs(args.out, exist_ok=True)
+    sweep = ModelSweep(args.model, write_data_yaml(args.dataset, args.out), args.out)
+    sweep.load()
+
+    grid = list(itertools.product(formats, parse_list(args.imgsz, int), parse_list(args.conf, float),
+                                  parse_list(args.iou, float)))
+    started = time.time()
+    for n, (fmt, imgsz, conf, iou) in enumerate(grid, 1):
+        if sweep.done(fmt, imgsz, conf, iou):
+            continue
+        try:
+            row = sweep.evaluate(fmt, imgsz, conf, iou)
+            print(f"[SWEEP] {n}/{len(grid)} {fmt} {imgsz}px conf={conf} iou={iou}: "
+                  f"recall {row['recall_at_conf']}, mAP50 {row['map50']}, {row['ms_per_frame']} ms/frame")
+        except Exception as e:
+            print(f"[SWEEP] {n}/{len(grid)} {fmt} {imgsz}px failed: {str(e)}")
+
+    path, best = sweep.report(args.recall_target)
+    print(f"✅ Sweep finished in {time.time() - started:.0f}s; report: {path}")
+    if best:
+        print(f"Recommended: {best['format']} imgsz={best['imgsz']} conf={best['conf']} iou={best['iou']}")
+
+
+if __name__ == "__main__":
+    main()
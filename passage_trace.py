@@ -0,0 +1,236 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from load_test import percentile
+
+log = logging.getLogger('passage_trace')
+
+TRACE_FILE = os.getenv('TRACE_FILE', 'traces/passages.jsonl')
+TRACE_IDLE_SECONDS = float(os.getenv('TRACE_IDLE_SECONDS', '30'))  # no reads for this long ends a passage
+MAX_PENDING = 256
+WAIT_STEPS = ('gate_hold', 'alarm')  # deliberate waits, not candidates for the slowest step
+
+
+class Trace:
+    """Span timings for one vehicle passing one lane, from first detection to the gate closing"""
+
+    def __init__(self, lane, started=None):
+        now = time.perf_counter()
+        self.trace_id = uuid.uuid4().hex
+        self.lane = lane
+        self.started = started or now
+        self.started_at = datetime.now() - timedelta(seconds=now - self.started)
+        self.last_activity = self.started
+        self.spans = []
+        self.plate = None
+
+    def _offset_ms(self, moment):
+        return round((moment - self.started) * 1000, 1)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time the block; attrs set on the yielded dict are recorded with the span"""
+        started = time.perf_counter()
+        record = {'name': name, 'start_ms': self._offset_ms(started), **attrs}
+        try:
+            yield record
+        finally:
+            ended = time.perf_counter()
+            record['ms'] = round((ended - started) * 1000, 1)
+            self.spans.append(record)
+            self.last_activity = ended
+
+    def record(self, name, started, **attrs):
+        """A span that began at the perf_counter() value started and ends now
+
+        For work timed before the passage was known to exist, like the
+        detection that starts it.
+        """
+        ended = time.perf_counter()
+        self.spans.append({'name': name, 'start_ms': self._offset_ms(started),
+                           'ms': round((ended - started) * 1000, 1), **attrs})
+        self.last_activity = ended
+
+    def mark(self, name, **attrs):
+        """A zero-length span, for moments such as the vote being committed"""
+        now = time.perf_counter()
+        self.spans.append({'name': name, 'start_ms': self._offset_ms(now), 'ms': 0.0, **attrs})
+        self.last_activity = now
+
+    def idle(self, seconds=TRACE_IDLE_SECONDS):
+        return time.perf_counter() - self.last_activity > seconds
+
+    def to_dict(self, outcome):
+        return {
+            'trace_id': self.trace_id,
+            'lane': self.lane,
+            'plate': self.plate,
+            'outcome': outcome,
+            'started_at': self.started_at.isoformat(),
+            'total_ms': self._offset_ms(time.perf_counter()),
+            'spans': list(self.spans),
+        }
+
+
+class TraceExporter:
+    """Appends finished traces to a JSON Lines file from a background thread
+
+    finish() only enqueues, so the lane loop never waits on the disk; if the
+    writer falls MAX_PENDING traces behind, further traces are dropped.
+    """
+
+    def __init__(self, lane, path=TRACE_FILE):
+        self.lane = lane
+        self.path = path
+        self.pending = queue.Queue(maxsize=MAX_PENDING)
+        self.current = None
+        self.thread = None
+        self.dropped = 0
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.thread = threading.Thread(target=self._write_loop, name="trace-export", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.current:
+            self.finish('interrupted')
+        if self.thread:
+            self.pending.put(None)
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def active(self):
+        """The passage in progress, or None; an idle one is closed as abandoned first"""
+        if self.current and self.current.idle():
+            self.finish('abandoned')
+        return self.current
+
+    def begin(self, started=None):
+        """The passage in progress, starting one (at perf_counter() value started) if there is none"""
+        if self.active() is None:
+            self.current = Trace(self.lane, started)
+        return self.current
+
+    def finish(self, outcome):
+        trace, self.current = self.current, None
+        if trace is None:
+            return None
+        try:
+            self.pending.put_nowait(trace.to_dict(outcome))
+        except queue.Full:
+            self.dropped += 1
+        return trace
+
+    def _write_loop(self):
+        with open(self.path, 'a') as f:
+            while True:
+                item = self.pending.get()
+                if item is None:
+                    break
+                try:
+                    f.write(json.dumps(item) + '\n')
+                    f.flush()
+                except Exception as e:
+                    log.error("[TRACE] Could not write trace %s: %s", item['trace_id'], e)
+
+
+def read_traces(path, lane=None, since=None, outcome=None):
+    with open(path) as f:
+        for line in f:
+            try:
+                trace = json.loads(line)
+            except ValueError:
+                continue  # torn last line
+            if lane and trace['lane'] != lane:
+                continue
+            if since and trace['started_at'] < since:
+                continue
+            if outcome and trace['outcome'] != outcome:
+                continue
+            yield trace
+
+
+def summarize(traces):
+    """Per lane: passage count, total latencies and each span's summed time per passage"""
+    lanes = defaultdict(lambda: {'totals': [], 'steps': defaultdict(list)})
+    for trace in traces:
+        lane = lanes[trace['lane']]
+        lane['totals'].append(trace['total_ms'])
+        per_step = defaultdict(float)
+        for span in trace['spans']:
+            per_step[span['name']] += span['ms']
+        for name, ms in per_step.items():
+            lane['steps'][name].append(ms)
+    return lanes
+
+
+def print_summary(lanes):
+    for name, lane in sorted(lanes.items()):
+        totals = sorted(lane['totals'])
+        print(f"\n=== {name}: {len(totals)} passages | total p50 {percentile(totals, 50):.0f} ms "
+              f"p95 {percentile(totals, 95):.0f} ms max {totals[-1]:.0f} ms ===")
+        print(f"{'step':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'share':>8}")
+        grand = sum(totals) or 1
+        rows = []
+        for step, values in lane['steps'].items():
+            values.sort()
+            rows.append((sum(values), step, values))
+        for total, step, values in sorted(rows, reverse=True):
+            print(f"{step:<16}{len(values):>7}{percentile(values, 50):>10.1f}{percentile(values, 95):>10.1f}"
+                  f"{values[-1]:>10.1f}{total / grand:>8.0%}")
+        work = [row for row in rows if row[1] not in WAIT_STEPS]
+        if work:
+            print(f"Slowest step: {max(work)[1]}")
+
+
+def print_trace(trace):
+    print(f"{trace['trace_id']} {trace['lane']} {trace['plate'] or '-'} {trace['outcome']} "
+          f"at {trace['started_at']}: {trace['total_ms']:.0f} ms")
+    for span in trace['spans']:
+        attrs = {k: v for k, v in span.items() if k not in ('name', 'start_ms', 'ms')}
+        extra = ' '.join(f"{k}={v}" for k, v in attrs.items())
+        print(f"  +{span['start_ms']:>9.1f} ms  {span['name']:<14}{span['ms']:>9.1f} ms  {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize per-passage lane traces")
+    parser.add_argument('--file', default=TRACE_FILE)
+    parser.add_argument('--lane', help="only this lane (GATE_NAME)")
+    parser.add_argument('--since', help="only passages from this time, e.g. 2025-05-01T08:00")
+    parser.add_argument('--outcome', help="only this outcome, e.g. entered, exited, unauthorized")
+    parser.add_argument('--slowest', type=int, default=0, help="also print the N slowest passages")
+    parser.add_argument('--trace', help="print one trace by ID (as stored on the vehicles row)")
+    args = parser.parse_args()
+
+    if args.trace:
+        for trace in read_traces(args.file):
+            if trace['trace_id'] == args.trace:
+                print_trace(trace)
+                return
+        print(f"[TRACE] {args.trace} not found in {args.file}")
+        return
+
+    traces = list(read_traces(args.file, args.lane, args.since, args.outcome))
+    if not traces:
+        print(f"[TRACE] No passages in {args.file}")
+        return
+    print_summary(summarize(traces))
+    if args.slowest:
+        print(f"\n=== {args.slowest} slowest passages ===")
+        for trace in sorted(traces, key=lambda t: t['total_ms'], reverse=True)[:args.slowest]:
+            print_trace(trace)
+
+
+if __name__ == "__main__":
+    main()
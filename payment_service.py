@@ -0,0 +1,170 @@
+import argparse
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+
+from database import ParkingDatabase
+from process_payment import process_card, is_card_data
+from serial_transport import SerialTransport
+from device_discovery import discover
+from log_config import configure
+
+log = logging.getLogger('payment_service')
+
+PAYMENT_PORTS = os.getenv('PAYMENT_PORTS', '')  # comma-separated; empty to discover
+RESPONSE_TIMEOUT = 5  # seconds to wait for DONE / INSUFFICIENT
+STATS_INTERVAL = 60  # seconds between latency summaries
+
+
+class CardEvent:
+    def __init__(self, terminal, line):
+        self.terminal = terminal
+        self.line = line
+        self.received_at = time.perf_counter()
+
+
+class PaymentTerminal(SerialTransport):
+    """One RFID payment board, kept open for the life of the service"""
+
+    def __init__(self, port, events, baudrate=9600):
+        super().__init__(port, baudrate)
+        self.events = events
+        self.subscribe(is_card_data, lambda line: self.events.put(CardEvent(self, line)))
+
+    def open(self):
+        super().open()
+        log.info("[TERMINAL] %s connected", self.port)
+        return self
+
+    def close(self):
+        super().close()
+        log.info("[TERMINAL] %s closed", self.port)
+
+
+class PaymentService:
+    """Serves several payment terminals from one process with shared workers"""
+
+    def __init__(self, ports, workers):
+        self.events = queue.Queue()
+        self.terminals = [PaymentTerminal(port, self.events) for port in ports]
+        self.db = ParkingDatabase(pool_size=workers)
+        self.workers = [threading.Thread(target=self._work, name=f"payment-worker-{n}", daemon=True)
+                        for n in range(workers)]
+        self.latencies = []  # seconds, since the last summary
+        self.stats_lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def start(self):
+        for terminal in self.terminals:
+            try:
+                terminal.open()
+            except Exception as e:
+                log.error("[ERROR] Could not open %s: %s", terminal.port, e)
+        for worker in self.workers:
+            worker.start()
+        log.info("[SERVICE] Waiting for cards on %s", ', '.join(t.port for t in self.terminals if t.is_open))
+
+    def stop(self):
+        self.stopping.set()
+        for _ in self.workers:
+            self.events.put(None)
+        for worker in self.workers:
+            worker.join(timeout=RESPONSE_TIMEOUT + 1)
+        for terminal in self.terminals:
+            if terminal.ser:
+                terminal.close()
+        self.report()
+        self.db.close()
+
+    def run_forever(self):
+        last_report = time.time()
+        while not self.stopping.wait(1):
+            if time.time() - last_report >= STATS_INTERVAL:
+                self.report()
+                last_report = time.time()
+            self.reconnect()
+
+    def reconnect(self):
+        """Reopen terminals that failed to open or dropped off the bus"""
+        for terminal in self.terminals:
+            if terminal.is_open:
+                continue
+            try:
+                if terminal.ser:
+                    terminal.close()
+                terminal.open()
+            except Exception as e:
+                log.error("[ERROR] %s reconnect failed: %s", terminal.port, e)
+
+    def report(self):
+        with self.stats_lock:
+            values = sorted(self.latencies)
+            self.latencies = []
+        if not values:
+            return
+        p50 = values[len(values) // 2] * 1000
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))] * 1000
+        log.info("[STATS] %s payments, p50 %.0f ms, p95 %.0f ms, max %.0f ms",
+                 len(values), p50, p95, values[-1] * 1000)
+
+    def _work(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                break
+            started = time.perf_counter()
+            terminal = event.terminal
+            try:
+                success, plate, amount = process_card(self.db, event.line, terminal,
+                                                      timeout=RESPONSE_TIMEOUT)
+            except Exception as e:
+                log.error("[ERROR] %s payment error: %s", terminal.port, e)
+                success, plate, amount = False, None, None
+            finally:
+                self.db.release()
+
+            finished = time.perf_counter()
+            total = finished - event.received_at
+            with self.stats_lock:
+                self.latencies.append(total)
+            log.info("[PAYMENT] %s %s %s RWF %s in %.0f ms (queued %.0f ms)", terminal.port, plate, amount,
+                     'OK' if success else 'FAILED', total * 1000, (started - event.received_at) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running payment service for RFID terminals")
+    parser.add_argument('--port', action='append', dest='ports',
+                        help="serial port of a payment terminal (repeatable, default: PAYMENT_PORTS "
+                             "or every payment board found)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="concurrent payments (default: one per terminal)")
+    args = parser.parse_args()
+    configure('payments')
+
+    ports = args.ports or [p.strip() for p in PAYMENT_PORTS.split(',') if p.strip()]
+    if not ports:
+        ports = [device.port for device in discover() if device.role == 'payment']
+    if not ports:
+        log.error("[ERROR] No payment terminals found")
+        return
+    service = PaymentService(ports, args.workers or len(ports))
+
+    def shutdown(signum, frame):
+        log.info("[SERVICE] Shutting down...")
+        service.stopping.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    service.start()
+    try:
+        service.run_forever()
+    finally:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,190 @@
 import csv
+import io
+import logging
 import os
+import threading
+from datetime import datetime
 
-csv_file = 'plates_log.csv'
-
-def mark_payment_success(plate_number):
-    if not os.path.exists(csv_file):
-        print("[ERROR] Log file does not exist.")
-        return
-
-    updated = False
-    rows = []
-
-    # Read existing data
-    with open(csv_file, 'r') as f:
-        reader = csv.reader(f)
-        header = next(reader)
-        for row in reader:
-            # Match the plate with unpaid status
-            if row[0] == plate_number and row[1] == '0':
-                row[1] = '1'  # Mark as paid
-                updated = True
-            rows.append(row)
-
-    if updated:
-        # Write back updated data
-        with open(csv_file, 'w', newline='') as f:
+log = logging.getLogger('payment_success')
+
+csv_file = os.getenv('PLATES_LOG', 'plates_log.csv')
+HEADER = ['Plate Number', 'Payment Status', 'Timestamp']
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+COMPACT_EVERY = int(os.getenv('PLATES_LOG_COMPACT_EVERY', '1000'))  # appended events between compactions
+
+
+def is_payment_event(row):
+    """Payment events carry the paid entry's timestamp, the amount and the payment time"""
+    return len(row) >= 5 and row[1] == '1'
+
+
+def valid_time(text):
+    try:
+        datetime.strptime(text, TIME_FORMAT)
+        return True
+    except ValueError:
+        return False
+
+
+def read_events(path):
+    """Parsed rows of the log
+
+    Every append ends in a newline, so an unterminated last line is one a
+    crash tore and is skipped whole, whatever columns survived. Rows whose
+    timestamps do not parse are skipped too.
+    """
+    with open(path, newline='') as f:
+        data = f.read()
+    if not data.endswith('\n'):
+        data = data[:data.rfind('\n') + 1]
+    reader = csv.reader(io.StringIO(data))
+    next(reader, None)  # header
+    for row in reader:
+        if len(row) < 3 or row[1] not in ('0', '1') or not row[0].strip() or not valid_time(row[2]):
+            continue
+        if is_payment_event(row) and not valid_time(row[4]):
+            continue
+        yield row
+
+
+def fold(path):
+    """Entry rows with payment events applied, in file order: the compacted log"""
+    entries, payments = [], {}
+    for row in read_events(path):
+        if is_payment_event(row):
+            payments[(row[0], row[2])] = row[3]
+        else:
+            entries.append(row)
+    for row in entries:
+        key = (row[0], row[2])
+        if row[1] == '0' and key in payments:
+            row[1] = '1'
+            del row[3:]
+            if payments[key]:
+                row.append(payments[key])
+    return entries
+
+
+class PlatesLog:
+    """Append-only plates_log.csv for running without the database
+
+    Entries are appended as (plate, 0, entry time) rows, as they always were.
+    A payment appends an event row (plate, 1, entry time, amount, paid at)
+    instead of rewriting the file, so marking a payment is a single append
+    and a crash can at worst tear the line being written. An in-memory index
+    of each plate's open entries is rebuilt from the log at startup, and the
+    log is folded back to one row per entry every COMPACT_EVERY events by
+    writing a new file and renaming it over the old one.
+    """
+
+    def __init__(self, path=csv_file, compact_every=COMPACT_EVERY):
+        self.path = path
+        self.compact_every = compact_every
+        self.open_entries = {}  # plate -> unpaid entry timestamps, oldest first
+        self.appended = 0
+        self.lock = threading.Lock()
+        self.file = None
+
+    def open(self):
+        with self.lock:
+            if not os.path.exists(self.path):
+                with open(self.path, 'w', newline='') as f:
+                    csv.writer(f).writerow(HEADER)
+            self._truncate_torn_line()
+            self._load()
+            self.file = open(self.path, 'a', newline='')
+        return self
+
+    def _truncate_torn_line(self):
+        """Cut a line torn by a crash, so the next append does not complete it into a bogus row"""
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+    def _load(self):
+        self.open_entries = {}
+        for row in fold(self.path):
+            if row[1] == '0':
+                self.open_entries.setdefault(row[0], []).append(row[2])
+
+    def _append(self, row):
+        self.file.write(','.join(row) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.appended += 1
+        if self.appended >= self.compact_every:
+            self._compact()
+
+    def log_entry(self, plate_number, entry_time=None):
+        entry_time = (entry_time or datetime.now()).strftime(TIME_FORMAT)
+        with self.lock:
+            self._append([plate_number, '0', entry_time])
+            self.open_entries.setdefault(plate_number, []).append(entry_time)
+        return entry_time
+
+    def mark_paid(self, plate_number, amount=None):
+        """Mark the plate's latest open entry as paid; returns its timestamp or None"""
+        with self.lock:
+            entries = self.open_entries.get(plate_number)
+            if not entries:
+                return None
+            entry_time = entries.pop()
+            if not entries:
+                del self.open_entries[plate_number]
+            self._append([plate_number, '1', entry_time, '' if amount is None else str(amount),
+                          datetime.now().strftime(TIME_FORMAT)])
+        return entry_time
+
+    def compact(self):
+        with self.lock:
+            self._compact()
+
+    def _compact(self):
+        rows = fold(self.path)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', newline='') as f:
             writer = csv.writer(f)
-            writer.writerow(header)
+            writer.writerow(HEADER)
             writer.writerows(rows)
-        print(f"[UPDATED] Payment status set to 1 for {plate_number}")
+            f.flush()
+            os.fsync(f.fileno())
+        if self.file:
+            self.file.close()
+        os.replace(tmp, self.path)
+        self.file = open(self.path, 'a', newline='')
+        self.appended = 0
+
+
+_plates_log = None
+_plates_log_lock = threading.Lock()
+
+
+def get_log():
+    global _plates_log
+    with _plates_log_lock:
+        if _plates_log is None:
+            _plates_log = PlatesLog().open()
+    return _plates_log
+
+
+def mark_payment_success(plate_number, amount=None):
+    entry_time = get_log().mark_paid(plate_number, amount)
+    if entry_time:
+        log.info("[UPDATED] Payment status set to 1 for %s (entered %s)", plate_number, entry_time)
     else:
-        print(f"[INFO] No unpaid record found for {plate_number}")
+        log.info("[INFO] No unpaid record found for %s", plate_number)
+    return entry_time is not None
 
 # ==== TESTING USAGE ====
 if __name__ == "__main__":
+    from log_config import configure
+    configure()
     plate = input("Enter plate number to mark as paid: ").strip().upper()
-    mark_payment_success(plate)
\ No newline at end of file
+    mark_payment_success(plate)
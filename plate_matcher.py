@@ -0,0 +1,161 @@
+import threading
+
+# Characters Tesseract commonly mistakes for each other on RA plates
+CONFUSION_PAIRS = [
+    ('H', 'W'), ('H', 'N'), ('M', 'N'), ('U', 'V'), ('K', 'X'),
+    ('0', 'O'), ('0', 'D'), ('O', 'D'), ('O', 'Q'),
+    ('8', 'B'), ('5', 'S'), ('2', 'Z'), ('6', 'G'), ('1', 'I'), ('1', 'L'), ('7', 'T'),
+]
+CONFUSION_COST = 0.3
+EDIT_COST = 1.0
+
+# Collapse each group of confusable characters onto one representative
+CONFUSION_CLASS = {}
+for a, b in CONFUSION_PAIRS:
+    root_a = CONFUSION_CLASS.get(a, a)
+    root_b = CONFUSION_CLASS.get(b, b)
+    for c, root in list(CONFUSION_CLASS.items()):
+        if root == root_b:
+            CONFUSION_CLASS[c] = root_a
+    CONFUSION_CLASS[a] = root_a
+    CONFUSION_CLASS[b] = root_a
+
+
+def confusion_key(plate):
+    """Plate with every character replaced by its confusion class"""
+    return ''.join(CONFUSION_CLASS.get(c, c) for c in plate)
+
+
+def substitution_cost(a, b):
+    """Cheap between any two members of a confusion class
+
+    Costing whole classes rather than single pairs keeps plate_distance a
+    metric (H-W and H-N cheap but W-N not would break the triangle
+    inequality), which BKTree.search relies on to prune.
+    """
+    if a == b:
+        return 0.0
+    if CONFUSION_CLASS.get(a, a) == CONFUSION_CLASS.get(b, b):
+        return CONFUSION_COST
+    return EDIT_COST
+
+
+def plate_distance(a, b):
+    """Edit distance where common OCR confusions are cheap substitutions"""
+    if a == b:
+        return 0.0
+
+    previous = [i * EDIT_COST for i in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        current = [i * EDIT_COST]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + EDIT_COST,                        # deletion
+                current[j - 1] + EDIT_COST,                     # insertion
+                previous[j - 1] + substitution_cost(ca, cb),    # substitution
+            ))
+        previous = current
+    # Rounded so sums of 0.3s compare and key the tree exactly (0.3 * 3 != 0.9)
+    return round(previous[-1], 6)
+
+
+class BKTree:
+    """Burkhard-Keller tree over plate_distance"""
+
+    def __init__(self, plates=()):
+        self.root = None
+        self.size = 0
+        for plate in plates:
+            self.add(plate)
+
+    def add(self, plate):
+        if self.root is None:
+            self.root = (plate, {})
+            self.size = 1
+            return
+
+        node = self.root
+        while True:
+            distance = plate_distance(plate, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (plate, {})
+                self.size += 1
+                return
+            node = child
+
+    def search(self, plate, max_distance):
+        """All (distance, plate) within max_distance of plate"""
+        if self.root is None:
+            return []
+
+        matches = []
+        stack = [self.root]
+        while stack:
+            candidate, children = stack.pop()
+            distance = plate_distance(plate, candidate)
+            if distance <= max_distance:
+                matches.append((distance, candidate))
+            low, high = distance - max_distance, distance + max_distance
+            for child_distance, child in children.items():
+                if low <= child_distance <= high:
+                    stack.append(child)
+        return matches
+
+
+class PlateResolver:
+    """Match a decoded plate against the plates currently parked"""
+
+    def __init__(self, session_index, max_distance=1.0):
+        self.session_index = session_index
+        self.max_distance = max_distance
+        self.tree = BKTree()
+        self.by_key = {}  # confusion_key -> plates
+        self.tree_version = None
+        self.lock = threading.Lock()
+
+    def _refresh(self):
+        version = self.session_index.version
+        if version != self.tree_version:
+            plates = self.session_index.plates()
+            self.tree = BKTree(plates)
+            self.by_key = {}
+            for plate in plates:
+                self.by_key.setdefault(confusion_key(plate), []).append(plate)
+            self.tree_version = version
+
+    def resolve(self, plate_number, limit=3):
+        """Ranked candidates as dicts with plate_number, distance and confidence"""
+        with self.lock:
+            self._refresh()
+            # Pure OCR confusions land in the same bucket and beat any real
+            # edit, so the tree walk is only needed when the bucket misses
+            matches = [(plate_distance(plate_number, plate), plate)
+                       for plate in self.by_key.get(confusion_key(plate_number), ())]
+            if not matches or min(matches)[0] >= EDIT_COST:
+                matches = self.tree.search(plate_number, self.max_distance)
+
+        matches.sort()
+        candidates = []
+        for distance, plate in matches[:limit]:
+            confidence = 1.0 - distance / (self.max_distance + EDIT_COST)
+            candidates.append({
+                'plate_number': plate,
+                'distance': distance,
+                'confidence': round(confidence, 3),
+            })
+
+        # Two equally close plates cannot be told apart
+        if len(candidates) > 1 and candidates[0]['distance'] == candidates[1]['distance']:
+            for candidate in candidates:
+                candidate['confidence'] = round(candidate['confidence'] / 2, 3)
+        return candidates
+
+    def best_match(self, plate_number, min_confidence=0.7):
+        """Plate with the highest confidence above min_confidence, or None"""
+        candidates = self.resolve(plate_number, limit=2)
+        if candidates and candidates[0]['confidence'] >= min_confidence:
+            return candidates[0]['plate_number']
+        return None
@@ -1,193 +1,200 @@
-import serial
-import time
+import logging
 from datetime import datetime
 from database import ParkingDatabase
+from serial_transport import SerialTransport
+from tariff import get_tariff
+from device_discovery import find_port
+from log_config import configure
 
-RATE_PER_HOUR = 500
+log = logging.getLogger('process_payment')
 
-# Initialize database
-db = ParkingDatabase()
+# After sending card data the sketch blocks until the PC answers; this ends the
+# transaction without charging. Older sketches read it as an amount of 0.
+CANCEL = "CANCEL\n"
 
-# Initialize serial connection
-try:
-    ser = serial.Serial('COM9', 9600, timeout=2)
-    print("✅ Successfully connected to serial port COM9")
-except Exception as e:
-    print(f"❌ Error connecting to serial port: {str(e)}")
-    print("Please check if:")
-    print("1. The Arduino is connected")
-    print("2. The correct COM port is being used")
-    print("3. No other program is using the port")
-    exit(1)
+db = None
+ser = None
 
-time.sleep(2)  # Wait for Arduino to reset
+def connect_serial(port=None):
+    """Open the payment terminal (PAYMENT_PORT, else the first one found) and wait for it to reset"""
+    try:
+        if not port:
+            port, _ = find_port('payment', env='PAYMENT_PORT')
+        if not port:
+            raise RuntimeError("no payment terminal found")
+        conn = SerialTransport(port, 9600).open()
+        log.info("✅ Successfully connected to serial port %s", port)
+    except Exception as e:
+        log.error("❌ Error connecting to serial port: %s. Check that the Arduino is connected, "
+                  "the right port is used and no other program has it open", e)
+        raise
+
+    return conn
 
-print("\nWelcome to Parking management system👋")
-print("Waiting for card scan...\n")
+def is_card_data(line):
+    return "PLATE:" in line and "BALANCE:" in line
 
-def read_serial_line():
-    """Read a line from serial port with timeout"""
+def is_payment_reply(line):
+    # DONE / INSUFFICIENT / CANCELLED, or one of the sketch's failure messages
+    return not is_card_data(line) and "Place your RFID card" not in line
+
+def cancel(terminal, timeout=2):
+    """Release a terminal waiting for an amount, so it can read the next card"""
     try:
-        if ser.in_waiting:
-            line = ser.readline().decode().strip()
-            print(f"[DEBUG] Received from Arduino: {line}")
-            return line
-        return None
+        terminal.request(CANCEL, expect=is_payment_reply, timeout=timeout)
     except Exception as e:
-        print(f"[ERROR] Serial read error: {str(e)}")
-        return None
+        log.error("[ERROR] Could not cancel on %s: %s", terminal.port, e)
 
 def parse_data(line):
     """Parse the data received from Arduino"""
     try:
-        print(f"[DEBUG] Parsing line: {line}")
+        log.debug("[DEBUG] Parsing line: %s", line)
         parts = line.split(';')
         if len(parts) != 2:
-            print(f"[ERROR] Invalid data format. Expected 2 parts, got {len(parts)}")
+            log.error("[ERROR] Invalid data format. Expected 2 parts, got %s", len(parts))
             return None, None
             
         plate = parts[0].split(':')[1]
         balance = float(parts[1].split(':')[1])
-        print(f"[DEBUG] Parsed - Plate: {plate}, Balance: {balance}")
+        log.debug("[DEBUG] Parsed - Plate: %s, Balance: %s", plate, balance)
         return plate, balance
     except Exception as e:
-        print(f"[ERROR] Failed to parse data: {str(e)}")
+        log.error("[ERROR] Failed to parse data: %s", e)
         return None, None
 
-def calculate_payment(entry_time):
-    """Calculate payment based on entry time"""
+def calculate_payment(entry_time, plate=None):
+    """Billed hours and amount due for a session ending now"""
     if not entry_time:
         return None, None
-    
-    current_time = datetime.now()
-    duration = current_time - entry_time
-    duration_hours = max(1, int(duration.total_seconds() / 3600))
-    amount_due = duration_hours * RATE_PER_HOUR
-    
-    return duration_hours, amount_due
+
+    return get_tariff().quote(plate, entry_time)
 
 def wait_for_card_data():
     """Wait for valid card data from Arduino"""
-    print("Waiting for card data...")
-    while True:
-        line = read_serial_line()
-        if line is None:
-            time.sleep(0.1)
-            continue
-            
+    log.info("Waiting for card data...")
+
+    def card_or_log(line):
+        if is_card_data(line):
+            return True
         # Skip Arduino's initial message
-        if "Place your RFID card" in line:
-            continue
-            
-        # Check for valid card data format
-        if "PLATE:" in line and "BALANCE:" in line:
-            return line
-            
-        print(f"[DEBUG] Ignoring message: {line}")
-
-def wait_for_arduino_response(timeout=5):
-    """Wait for Arduino response with timeout"""
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        response = read_serial_line()
-        if response:
-            return response
-        time.sleep(0.1)
-    return None
+        if "Place your RFID card" not in line:
+            log.debug("[DEBUG] Ignoring message: %s", line)
+        return False
 
-def process_single_payment():
-    """Process a single payment and exit"""
-    try:
-        # Wait for valid card data
-        line = wait_for_card_data()
-        if not line:
-            print("[ERROR] No valid card data received")
-            return False
-            
-        print(f"\n[INFO] Card detected!")
-        plate, balance = parse_data(line)
-        
-        if not plate or balance is None:
-            print("[ERROR] Invalid data received from card")
-            return False
+    return ser.wait_for(card_or_log)
+
+def process_card(db, line, terminal, timeout=5):
+    """Charge the card in a PLATE:...;BALANCE:... line
+
+    terminal is the SerialTransport that read the card; its reply to the
+    amount is handled the moment it arrives. Returns (success, plate, amount_due).
+    """
+    log.info("[INFO] Card detected!")
+    plate, balance = parse_data(line)
+    
+    if not plate or balance is None:
+        log.error("[ERROR] Invalid data received from card")
+        cancel(terminal)
+        return False, plate, None
 
+    try:
         # Get entry time from database
-        print(f"[INFO] Checking database for plate: {plate}")
+        log.info("[INFO] Checking database for plate: %s", plate)
         entry_time = db.get_unpaid_entry(plate)
-        
+
         if not entry_time:
-            print(f"[ERROR] No valid unpaid entry found for plate {plate}")
-            return False
+            log.error("[ERROR] No valid unpaid entry found for plate %s", plate)
+            cancel(terminal)
+            return False, plate, None
 
-        print(f"\n[INFO] Card Details:")
-        print(f"Plate Number: {plate}")
-        print(f"Current Balance: {balance} RWF")
-        
-        # Calculate payment
-        duration_hours, amount_due = calculate_payment(entry_time)
-        if amount_due is None:
-            print("[ERROR] Could not calculate payment amount")
-            return False
+        log.info("[INFO] Card details: plate %s, balance %s RWF", plate, balance)
 
-        print(f"\n[INFO] Parking Duration: {duration_hours} hours")
-        print(f"[INFO] Amount Due: {amount_due} RWF")
+        # Calculate payment
+        duration_hours, amount_due = calculate_payment(entry_time, plate)
+    except Exception:
+        cancel(terminal)
+        raise
+    if amount_due is None:
+        log.error("[ERROR] Could not calculate payment amount")
+        cancel(terminal)
+        return False, plate, None
+
+    log.info("[INFO] Parking Duration: %s hours", duration_hours)
+    log.info("[INFO] Amount Due: %s RWF", amount_due)
+
+    # Check if sufficient balance
+    if balance < amount_due:
+        log.error("[ERROR] Insufficient balance. Required: %s RWF, Available: %s RWF", amount_due, balance)
+        cancel(terminal)
+        return False, plate, amount_due
+    
+    # Process payment
+    new_balance = balance - amount_due
+    log.info("[INFO] Processing payment of %s RWF", amount_due)
+    log.info("[INFO] New balance will be: %s RWF", new_balance)
+
+    # Send amount to Arduino and wait for its reply
+    log.debug("[DEBUG] Sending amount to Arduino: %s", amount_due)
+    response = terminal.request(f"{amount_due}\n", expect=is_payment_reply, timeout=timeout)
+    if response == "DONE":
+        # Update database with payment details
+        payment_time = datetime.now()
+        if db.update_payment(plate, amount_due, payment_time):
+            log.info("[SUCCESS] Payment processed: plate %s, paid %s RWF at %s, remaining balance %s RWF",
+                     plate, amount_due, payment_time, new_balance)
+            return True, plate, amount_due
+        else:
+            log.error("[ERROR] Failed to update database")
+            return False, plate, amount_due
+    elif response == "INSUFFICIENT":
+        log.error("[ERROR] Payment failed - insufficient balance on card")
+    else:
+        log.error("[ERROR] Unexpected response from card: %s", response)
+        # Even if we don't get a response, try to update the database
+        payment_time = datetime.now()
+        if db.update_payment(plate, amount_due, payment_time):
+            log.info("[INFO] Database updated despite no Arduino response")
+            return True, plate, amount_due
+    
+    return False, plate, amount_due
 
-        # Check if sufficient balance
-        if balance < amount_due:
-            print(f"[ERROR] Insufficient balance. Required: {amount_due} RWF, Available: {balance} RWF")
-            ser.write(b"INSUFFICIENT\n")
+def process_single_payment():
+    """Process a single payment and exit"""
+    try:
+        # Wait for valid card data
+        line = wait_for_card_data()
+        if not line:
+            log.error("[ERROR] No valid card data received")
             return False
-        
-        # Process payment
-        new_balance = balance - amount_due
-        print(f"\n[INFO] Processing payment of {amount_due} RWF")
-        print(f"[INFO] New balance will be: {new_balance} RWF")
-
-        # Send amount to Arduino
-        print(f"[DEBUG] Sending amount to Arduino: {amount_due}")
-        ser.write(f"{amount_due}\n".encode())
-        time.sleep(1)  # Give Arduino time to process
-
-        # Wait for response
-        response = wait_for_arduino_response()
-        if response == "DONE":
-            # Update database with payment details
-            payment_time = datetime.now()
-            if db.update_payment(plate, amount_due, payment_time):
-                print(f"\n[SUCCESS] Payment processed successfully!")
-                print(f"Plate: {plate}")
-                print(f"Amount Paid: {amount_due} RWF")
-                print(f"Payment Time: {payment_time}")
-                print(f"Remaining Balance: {new_balance} RWF")
-                return True
-            else:
-                print("[ERROR] Failed to update database")
-                return False
-        elif response == "INSUFFICIENT":
-            print("[ERROR] Payment failed - insufficient balance on card")
-        else:
-            print(f"[ERROR] Unexpected response from card: {response}")
-            # Even if we don't get a response, try to update the database
-            payment_time = datetime.now()
-            if db.update_payment(plate, amount_due, payment_time):
-                print("[INFO] Database updated despite no Arduino response")
-                return True
-        
-        return False
+
+        success, plate, amount_due = process_card(db, line, ser)
+        return success
 
     except Exception as e:
-        print(f"[ERROR] An error occurred: {str(e)}")
+        log.error("[ERROR] An error occurred: %s", e)
         return False
 
 if __name__ == "__main__":
+    configure('payments')
+
+    # Initialize database and serial connection
+    db = ParkingDatabase()
+    try:
+        ser = connect_serial()
+    except Exception:
+        exit(1)
+
+    log.info("Welcome to Parking management system👋")
+    log.info("Waiting for card scan...")
+
     try:
         if process_single_payment():
-            print("\n[INFO] Payment completed successfully. Exiting...")
+            log.info("[INFO] Payment completed successfully. Exiting...")
         else:
-            print("\n[INFO] Payment failed. Exiting...")
+            log.warning("[INFO] Payment failed. Exiting...")
     except KeyboardInterrupt:
-        print("\n[INFO] Program terminated by user")
+        log.info("[INFO] Program terminated by user")
     finally:
-        if 'ser' in locals():
+        if ser:
             ser.close()
-            print("[INFO] Serial port closed")
+            log.info("[INFO] Serial port closed")
@@ -72,6 +72,16 @@ void loop() {
     // Wait for payment amount from PC
     while (!Serial.available());
     String input = Serial.readStringUntil('\n');
+    input.trim();
+
+    // The PC cancels when it cannot charge this card (unknown plate, no open session, ...)
+    if (input == "CANCEL") {
+      Serial.println("CANCELLED");
+      mfrc522.PICC_HaltA();
+      mfrc522.PCD_StopCrypto1();
+      return;
+    }
+
     float amountDue = input.toFloat();
 
     if (amountDue > currentBalance) {
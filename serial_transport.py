@@ -0,0 +1,195 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, Future, TimeoutError as FutureTimeout
+
+import serial
+
+log = logging.getLogger('serial_transport')
+
+INBOX_SIZE = 256  # unclaimed lines kept for next_line(); older ones are dropped
+
+
+class PendingRequest:
+    def __init__(self, expect):
+        self.expect = expect
+        self.future = Future()
+        self.sent_at = time.perf_counter()
+
+
+class SerialTransport:
+    """Line-framed serial link with a background reader
+
+    Incoming lines go, in order of preference, to the oldest pending request
+    whose expect(line) matches, then to every subscriber whose predicate
+    matches, and otherwise to an inbox read with next_line(). The inbox
+    keeps only the newest INBOX_SIZE lines, so a device that chatters (the
+    gates report distance every 50 ms) to a script that never reads the
+    inbox does not grow its memory.
+    """
+
+    def __init__(self, port, baudrate=9600, reset_delay=2.0, name=None):
+        self.port = port
+        self.baudrate = baudrate
+        self.reset_delay = reset_delay
+        self.name = name or port
+        self.ser = None
+        self.buffer = bytearray()
+        self.pending = []  # PendingRequest, oldest first
+        self.subscribers = []  # (predicate, callback)
+        self.inbox = queue.Queue(maxsize=INBOX_SIZE)
+        self.dropped = 0  # unclaimed lines pushed out of the inbox
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+    def open(self):
+        # A short timeout only bounds how long the reader blocks; bytes are
+        # returned as soon as they arrive
+        self.ser = serial.Serial(self.port, self.baudrate, timeout=0.05)
+        if self.reset_delay:
+            time.sleep(self.reset_delay)  # Opening the port resets most Arduinos
+        self.ser.reset_input_buffer()
+        self.running = True
+        self.thread = threading.Thread(target=self._read_loop, name=f"serial-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.running = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1)
+        if self.ser:
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for request in pending:
+            request.future.cancel()
+
+    @property
+    def is_open(self):
+        return bool(self.ser and self.ser.is_open and self.running)
+
+    def send(self, data):
+        """Write str or bytes to the device"""
+        if isinstance(data, str):
+            data = data.encode()
+        with self.write_lock:
+            self.ser.write(data)
+            self.ser.flush()
+
+    def request(self, data, expect=None, timeout=5.0):
+        """Send data and return the first matching reply line, or None on timeout"""
+        future = self.request_async(data, expect)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            self._drop(future)
+            return None
+        except CancelledError:  # Transport closed while waiting
+            return None
+
+    def request_async(self, data, expect=None):
+        """Send data and return a Future resolved with the first matching reply line"""
+        request = PendingRequest(expect or (lambda line: True))
+        with self.lock:
+            self.pending.append(request)
+        try:
+            self.send(data)
+        except Exception as e:
+            self._drop(request.future)
+            request.future.set_exception(e)
+        return request.future
+
+    def subscribe(self, predicate, callback):
+        """Call callback(line) for every unsolicited line where predicate(line) is true"""
+        with self.lock:
+            self.subscribers.append((predicate, callback))
+
+    def next_line(self, timeout=None):
+        """Next line no request or subscriber claimed, or None on timeout"""
+        try:
+            return self.inbox.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def wait_for(self, predicate, timeout=None):
+        """Discard inbox lines until one matches predicate; None on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            line = self.next_line(remaining)
+            if line is not None and predicate(line):
+                return line
+
+    def _drop(self, future):
+        with self.lock:
+            self.pending = [r for r in self.pending if r.future is not future]
+
+    def _dispatch(self, line):
+        with self.lock:
+            for request in self.pending:
+                if request.expect(line):
+                    self.pending.remove(request)
+                    break
+            else:
+                request = None
+            subscribers = list(self.subscribers)
+
+        if request is not None:
+            request.future.set_result(line)
+            return
+
+        claimed = False
+        for predicate, callback in subscribers:
+            if predicate(line):
+                claimed = True
+                try:
+                    callback(line)
+                except Exception as e:
+                    log.error("[SERIAL] %s handler error: %s", self.name, e)
+        if not claimed:
+            self._to_inbox(line)
+
+    def _to_inbox(self, line):
+        """Queue an unclaimed line, dropping the oldest when the inbox is full"""
+        while True:
+            try:
+                self.inbox.put_nowait(line)
+                return
+            except queue.Full:
+                try:
+                    self.inbox.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _read_loop(self):
+        while self.running:
+            try:
+                chunk = self.ser.read(self.ser.in_waiting or 1)
+            except Exception as e:
+                if self.running:
+                    log.error("[SERIAL] %s read error: %s", self.name, e)
+                    self.running = False
+                break
+            if not chunk:
+                continue
+
+            self.buffer.extend(chunk)
+            while True:
+                end = self.buffer.find(b'\n')
+                if end < 0:
+                    break
+                raw = bytes(self.buffer[:end])
+                del self.buffer[:end + 1]
+                line = raw.decode(errors='replace').strip()
+                if line:
+                    self._dispatch(line)
@@ -0,0 +1,115 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+
+from app import create_app, DB_POOL_SIZE
+from database import ParkingDatabase
+from log_config import configure
+
+log = logging.getLogger('serve')
+
+DEFAULT_WORKERS = int(os.getenv('API_WORKERS', str(min(4, multiprocessing.cpu_count()))))
+DEFAULT_THREADS = int(os.getenv('API_THREADS', '8'))
+GRACEFUL_TIMEOUT = int(os.getenv('API_GRACEFUL_TIMEOUT', '30'))  # seconds
+
+
+def serve_gunicorn(args):
+    """Pre-fork workers; each builds its own app and DB pool after the fork"""
+    from gunicorn.app.base import BaseApplication
+
+    class ParkingApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{args.host}:{args.port}")
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('threads', args.threads)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('graceful_timeout', GRACEFUL_TIMEOUT)
+            self.cfg.set('preload_app', False)
+            self.cfg.set('post_worker_init', on_worker_ready)
+            self.cfg.set('worker_int', on_worker_stop)
+            self.cfg.set('worker_exit', on_worker_exit)
+
+        def load(self):
+            return create_worker_app(args.threads)
+
+    ParkingApplication().run()
+
+
+worker_app = None
+
+
+def create_worker_app(threads):
+    global worker_app
+    # One pooled connection per request thread
+    worker_app = create_app(ParkingDatabase(pool_size=max(DB_POOL_SIZE, threads)))
+    return worker_app
+
+
+def on_worker_ready(worker):
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle_term(signum, frame):
+        on_worker_stop(worker)
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, handle_term)
+
+
+def on_worker_stop(worker):
+    # Fail readiness first so the load balancer drains this worker
+    if worker_app is not None:
+        worker_app.extensions['shutting_down'] = True
+
+
+def on_worker_exit(server, worker):
+    if worker_app is not None:
+        worker_app.extensions['parking_db'].close()
+
+
+def serve_waitress(args):
+    """Single process, many threads (Windows, where gunicorn does not run)"""
+    from waitress import create_server
+
+    threads = args.workers * args.threads
+    app = create_app(ParkingDatabase(pool_size=max(DB_POOL_SIZE, threads)))
+    server = create_server(app, host=args.host, port=args.port, threads=threads)
+
+    def shutdown(signum, frame):
+        log.info("[SERVER] Shutting down...")
+        app.extensions['shutting_down'] = True
+        server.close()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    log.info("[SERVER] Listening on http://%s:%s", args.host, args.port)
+    try:
+        server.run()
+    finally:
+        app.extensions['parking_db'].close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the parking API in production mode")
+    parser.add_argument('--host', default=os.getenv('API_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('API_PORT', '5000')))
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="worker processes")
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS, help="threads per worker")
+    args = parser.parse_args()
+    configure('api')
+
+    if sys.platform != 'win32':
+        try:
+            import gunicorn  # noqa: F401
+            serve_gunicorn(args)
+            return
+        except ImportError:
+            log.warning("[SERVER] gunicorn not installed, falling back to waitress")
+    serve_waitress(args)
+
+
+if __name__ == "__main__":
+    main()
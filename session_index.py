@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import select
+import threading
+import time
+from datetime import datetime
+
+import psycopg2
+import psycopg2.extensions
+
+log = logging.getLogger('session_index')
+
+CHANNEL = 'vehicle_sessions'
+RECONCILE_INTERVAL = int(os.getenv('SESSION_RECONCILE_INTERVAL', '60'))  # seconds
+
+
+class OpenSessionIndex:
+    """In-memory plate -> open sessions index kept current by LISTEN/NOTIFY"""
+
+    def __init__(self, db, reconcile_interval=RECONCILE_INTERVAL):
+        self.db = db
+        self.reconcile_interval = reconcile_interval
+        self.sessions = {}  # plate -> {id: (id, entry_time, payment_status)}
+        self.lock = threading.Lock()
+        self.listen_conn = None
+        self.thread = None
+        self.running = False
+        self.last_reconcile = 0
+        self.version = 0  # bumped whenever the set of sessions changes
+
+    def start(self):
+        """Warm-load the index and start listening for session changes"""
+        self.listen_conn = psycopg2.connect(**self.db.conn_params)
+        self.listen_conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with self.listen_conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL}")
+
+        # LISTEN before loading so no change between the two is missed
+        self.reconcile()
+
+        self.running = True
+        self.thread = threading.Thread(target=self._listen_loop, daemon=True)
+        self.thread.start()
+        log.info("[INDEX] Loaded %s open sessions, listening on '%s'", self.size(), CHANNEL)
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+        if self.listen_conn:
+            self.listen_conn.close()
+            self.listen_conn = None
+
+    def reconcile(self):
+        """Rebuild the index from the database"""
+        with self.listen_conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, plate_number, entry_time, payment_status
+                FROM vehicles WHERE exit_time IS NULL
+            """)
+            rows = cur.fetchall()
+
+        sessions = {}
+        for vehicle_id, plate, entry_time, payment_status in rows:
+            sessions.setdefault(plate, {})[vehicle_id] = (vehicle_id, entry_time, payment_status)
+
+        with self.lock:
+            self.sessions = sessions
+            self.version += 1
+        self.last_reconcile = time.time()
+
+    def apply(self, payload):
+        """Apply one NOTIFY payload to the index"""
+        data = json.loads(payload)
+        if data.get('reconcile'):
+            self.invalidate()
+            return
+
+        vehicle_id = data['id']
+        plate = data['plate_number']
+
+        with self.lock:
+            self.version += 1
+            if data['exit_time'] is not None:
+                plate_sessions = self.sessions.get(plate)
+                if plate_sessions:
+                    plate_sessions.pop(vehicle_id, None)
+                    if not plate_sessions:
+                        del self.sessions[plate]
+                return
+
+            entry_time = datetime.fromisoformat(data['entry_time'])
+            self.sessions.setdefault(plate, {})[vehicle_id] = (
+                vehicle_id, entry_time, data['payment_status'])
+
+    def invalidate(self):
+        """Ask the listener thread to reconcile on its next pass"""
+        self.last_reconcile = 0
+
+    def remove(self, plate_number, vehicle_id):
+        """Drop a session locally once its exit has been written"""
+        with self.lock:
+            self.version += 1
+            plate_sessions = self.sessions.get(plate_number)
+            if plate_sessions:
+                plate_sessions.pop(vehicle_id, None)
+                if not plate_sessions:
+                    del self.sessions[plate_number]
+
+    def get(self, plate_number):
+        """Most recent open session for a plate, or None"""
+        with self.lock:
+            plate_sessions = self.sessions.get(plate_number)
+            if not plate_sessions:
+                return None
+            return max(plate_sessions.values(), key=lambda s: s[1])
+
+    def get_paid(self, plate_number):
+        """Most recent paid, open session for a plate, or None"""
+        with self.lock:
+            plate_sessions = self.sessions.get(plate_number)
+            if not plate_sessions:
+                return None
+            paid = [s for s in plate_sessions.values() if s[2] == 1]
+            return max(paid, key=lambda s: s[1]) if paid else None
+
+    def plates(self):
+        with self.lock:
+            return list(self.sessions.keys())
+
+    def size(self):
+        with self.lock:
+            return sum(len(s) for s in self.sessions.values())
+
+    def _listen_loop(self):
+        while self.running:
+            try:
+                timeout = max(0.0, self.last_reconcile + self.reconcile_interval - time.time())
+                if select.select([self.listen_conn], [], [], min(timeout, 1.0)) != ([], [], []):
+                    self.listen_conn.poll()
+                    while self.listen_conn.notifies:
+                        notify = self.listen_conn.notifies.pop(0)
+                        try:
+                            self.apply(notify.payload)
+                        except Exception as e:
+                            log.warning("[INDEX] Bad notification payload: %s", e)
+
+                if time.time() - self.last_reconcile >= self.reconcile_interval:
+                    self.reconcile()
+            except Exception as e:
+                if not self.running:
+                    break
+                log.error("[INDEX] Listener error: %s, reconnecting...", e)
+                time.sleep(1)
+                try:
+                    self.listen_conn.close()
+                    self.listen_conn = psycopg2.connect(**self.db.conn_params)
+                    self.listen_conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                    with self.listen_conn.cursor() as cur:
+                        cur.execute(f"LISTEN {CHANNEL}")
+                    self.reconcile()
+                except Exception as e:
+                    log.warning("[INDEX] Reconnect failed: %s", e)
@@ -1,68 +1,63 @@
 // Update dashboard statistics
-function updateDashboardStats() {
-    fetch('/api/statistics')
-        .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                document.getElementById('total-vehicles').textContent = data.statistics.total_vehicles;
-                document.getElementById('current-vehicles').textContent = data.statistics.current_vehicles;
-                document.getElementById('total-revenue').textContent = `${data.statistics.total_revenue} RWF`;
-                document.getElementById('unauthorized-exits').textContent = data.statistics.unauthorized_exits;
-            }
-        })
-        .catch(error => console.error('Error fetching statistics:', error));
+function renderDashboardStats(statistics) {
+    document.getElementById('total-vehicles').textContent = statistics.total_vehicles;
+    document.getElementById('current-vehicles').textContent = statistics.current_vehicles;
+    document.getElementById('total-revenue').textContent = `${statistics.total_revenue} RWF`;
+    document.getElementById('outstanding-revenue').textContent =
+        `+${statistics.outstanding_revenue} RWF due from ${statistics.outstanding_vehicles} parked`;
+    document.getElementById('unauthorized-exits').textContent = statistics.unauthorized_exits;
 }
 
 // Update vehicles table
-function updateVehiclesTable() {
-    fetch('/api/vehicles')
-        .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                const tableBody = document.getElementById('vehicles-table');
-                tableBody.innerHTML = '';
-                
-                data.vehicles.forEach(vehicle => {
-                    const row = document.createElement('tr');
-                    
-                    const status = vehicle.payment_status === 1 ? 
-                        '<span class="status-badge status-paid">Paid</span>' : 
-                        '<span class="status-badge status-unpaid">Unpaid</span>';
-                    
-                    row.innerHTML = `
-                        <td>${vehicle.plate_number}</td>
-                        <td>${new Date(vehicle.entry_time).toLocaleString()}</td>
-                        <td>${status}</td>
-                        <td>${vehicle.payment_amount || '-'} RWF</td>
-                    `;
-                    
-                    tableBody.appendChild(row);
-                });
-            }
-        })
-        .catch(error => console.error('Error fetching vehicles:', error));
+function renderVehiclesTable(vehicles) {
+    const tableBody = document.getElementById('vehicles-table');
+    tableBody.innerHTML = '';
+    
+    vehicles.forEach(vehicle => {
+        const row = document.createElement('tr');
+        
+        const status = vehicle.payment_status === 1 ? 
+            '<span class="status-badge status-paid">Paid</span>' : 
+            '<span class="status-badge status-unpaid">Unpaid</span>';
+        
+        row.innerHTML = `
+            <td>${vehicle.plate_number}</td>
+            <td>${new Date(vehicle.entry_time).toLocaleString()}</td>
+            <td>${status}</td>
+            <td>${vehicle.payment_amount || '-'} RWF</td>
+        `;
+        
+        tableBody.appendChild(row);
+    });
 }
 
 // Update unauthorized exits table
-function updateUnauthorizedExits() {
-    fetch('/api/unauthorized_exits')
+function renderUnauthorizedExits(exits) {
+    const tableBody = document.getElementById('unauthorized-exits-table');
+    tableBody.innerHTML = '';
+    
+    exits.forEach(exit => {
+        const row = document.createElement('tr');
+        row.innerHTML = `
+            <td>${exit.plate_number}</td>
+            <td>${new Date(exit.exit_time).toLocaleString()}</td>
+        `;
+        tableBody.appendChild(row);
+    });
+}
+
+// Refresh every panel from one consistent snapshot
+function updateDashboard() {
+    fetch('/api/dashboard')
         .then(response => response.json())
         .then(data => {
             if (data.success) {
-                const tableBody = document.getElementById('unauthorized-exits-table');
-                tableBody.innerHTML = '';
-                
-                data.exits.forEach(exit => {
-                    const row = document.createElement('tr');
-                    row.innerHTML = `
-                        <td>${exit.plate_number}</td>
-                        <td>${new Date(exit.exit_time).toLocaleString()}</td>
-                    `;
-                    tableBody.appendChild(row);
-                });
+                renderDashboardStats(data.statistics);
+                renderVehiclesTable(data.vehicles);
+                renderUnauthorizedExits(data.exits);
             }
         })
-        .catch(error => console.error('Error fetching unauthorized exits:', error));
+        .catch(error => console.error('Error fetching dashboard:', error));
 }
 
 // Initialize WebSocket connection for real-time updates
@@ -72,12 +67,8 @@ function initializeWebSocket() {
     ws.onmessage = function(event) {
         const data = JSON.parse(event.data);
         
-        if (data.type === 'vehicle_update') {
-            updateVehiclesTable();
-            updateDashboardStats();
-        } else if (data.type === 'unauthorized_exit') {
-            updateUnauthorizedExits();
-            updateDashboardStats();
+        if (data.type === 'vehicle_update' || data.type === 'unauthorized_exit') {
+            updateDashboard();
         }
     };
     
@@ -89,15 +80,11 @@ function initializeWebSocket() {
 
 // Initialize the dashboard
 document.addEventListener('DOMContentLoaded', function() {
-    // Initial updates
-    updateDashboardStats();
-    updateVehiclesTable();
-    updateUnauthorizedExits();
+    // Initial update
+    updateDashboard();
     
     // Set up periodic updates
-    setInterval(updateDashboardStats, 5000);
-    setInterval(updateVehiclesTable, 10000);
-    setInterval(updateUnauthorizedExits, 10000);
+    setInterval(updateDashboard, 5000);
     
     // Initialize WebSocket
     initializeWebSocket();
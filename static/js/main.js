@@ -1,51 +1,47 @@
-// Update statistics every 5 seconds
-function updateStatistics() {
-    fetch('/api/statistics')
-        .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                document.getElementById('current-vehicles').textContent = data.statistics.current_vehicles;
-                document.getElementById('total-revenue').textContent = `${data.statistics.total_revenue} RWF`;
-            }
-        })
-        .catch(error => console.error('Error fetching statistics:', error));
+// Update statistics
+function renderStatistics(statistics) {
+    document.getElementById('current-vehicles').textContent = statistics.current_vehicles;
+    document.getElementById('total-revenue').textContent = `${statistics.total_revenue} RWF`;
 }
 
 // Update activity feed
-function updateActivityFeed() {
-    fetch('/api/vehicles')
+function renderActivityFeed(recentVehicles) {
+    const activityFeed = document.getElementById('activity-feed');
+    activityFeed.innerHTML = '';
+    
+    recentVehicles.forEach(vehicle => {
+        const activityItem = document.createElement('div');
+        activityItem.className = 'activity-item';
+        
+        const status = vehicle.payment_status === 1 ? 
+            '<span class="status-badge status-paid">Paid</span>' : 
+            '<span class="status-badge status-unpaid">Unpaid</span>';
+        
+        activityItem.innerHTML = `
+            <div class="d-flex justify-content-between align-items-center">
+                <div>
+                    <strong>${vehicle.plate_number}</strong>
+                    <small class="text-muted d-block">Entry: ${new Date(vehicle.entry_time).toLocaleString()}</small>
+                </div>
+                ${status}
+            </div>
+        `;
+        
+        activityFeed.appendChild(activityItem);
+    });
+}
+
+// Statistics and the 5 most recent vehicles in one request
+function updateOverview() {
+    fetch('/api/dashboard?vehicles=5&exits=0')
         .then(response => response.json())
         .then(data => {
             if (data.success) {
-                const activityFeed = document.getElementById('activity-feed');
-                activityFeed.innerHTML = '';
-                
-                // Get the 5 most recent vehicles
-                const recentVehicles = data.vehicles.slice(0, 5);
-                
-                recentVehicles.forEach(vehicle => {
-                    const activityItem = document.createElement('div');
-                    activityItem.className = 'activity-item';
-                    
-                    const status = vehicle.payment_status === 1 ? 
-                        '<span class="status-badge status-paid">Paid</span>' : 
-                        '<span class="status-badge status-unpaid">Unpaid</span>';
-                    
-                    activityItem.innerHTML = `
-                        <div class="d-flex justify-content-between align-items-center">
-                            <div>
-                                <strong>${vehicle.plate_number}</strong>
-                                <small class="text-muted d-block">Entry: ${new Date(vehicle.entry_time).toLocaleString()}</small>
-                            </div>
-                            ${status}
-                        </div>
-                    `;
-                    
-                    activityFeed.appendChild(activityItem);
-                });
+                renderStatistics(data.statistics);
+                renderActivityFeed(data.vehicles);
             }
         })
-        .catch(error => console.error('Error fetching vehicles:', error));
+        .catch(error => console.error('Error fetching overview:', error));
 }
 
 // Initialize WebSocket connection for real-time updates
@@ -57,7 +53,7 @@ function initializeWebSocket() {
         
         if (data.type === 'plate_detected') {
             document.getElementById('detected-plate').textContent = data.plate_number;
-            updateActivityFeed();
+            updateOverview();
         }
     };
     
@@ -69,13 +65,11 @@ function initializeWebSocket() {
 
 // Initialize the page
 document.addEventListener('DOMContentLoaded', function() {
-    // Initial updates
-    updateStatistics();
-    updateActivityFeed();
+    // Initial update
+    updateOverview();
     
     // Set up periodic updates
-    setInterval(updateStatistics, 5000);
-    setInterval(updateActivityFeed, 10000);
+    setInterval(updateOverview, 5000);
     
     // Initialize WebSocket
     initializeWebSocket();
@@ -0,0 +1,177 @@
+import json
+import math
+import os
+from datetime import datetime
+
+import numpy as np
+
+TARIFF_FILE = os.getenv('TARIFF_FILE', 'tariff.json')
+DAY_SECONDS = 86400
+EPOCH = datetime(1970, 1, 1)
+
+DEFAULT_TARIFF = {
+    'rate_per_hour': 500,
+    'billing_minutes': 60,  # charged per started block
+    'grace_minutes': 0,  # stays up to this long are free
+    'minimum_units': 1,
+    'daily_cap': None,  # most charged for one calendar day
+    'bands': [],  # [{"start": "07:00", "end": "19:00", "rate_per_hour": 600}], may wrap midnight
+}
+
+
+def parse_clock(value):
+    """'HH:MM' -> minute of day"""
+    hours, _, minutes = value.partition(':')
+    return int(hours) * 60 + int(minutes or 0)
+
+
+def wall_seconds(moment):
+    """Wall-clock seconds since 1970, so time-of-day bands follow the local clock"""
+    return (moment.replace(tzinfo=None) - EPOCH).total_seconds()
+
+
+class Schedule:
+    """One tariff compiled to a per-minute price table
+
+    cumulative[m] is the price from midnight to minute m, so the price of any
+    interval is a couple of lookups however many bands there are.
+    """
+
+    def __init__(self, rate_per_hour=500, billing_minutes=60, grace_minutes=0, minimum_units=1,
+                 daily_cap=None, bands=()):
+        if billing_minutes <= 0:
+            raise ValueError("billing_minutes must be positive")
+        self.unit_seconds = billing_minutes * 60
+        self.grace_seconds = grace_minutes * 60
+        self.minimum_units = minimum_units
+        self.cap = math.inf if daily_cap is None else float(daily_cap)
+
+        rates = np.full(1440, rate_per_hour / 60.0)
+        for band in bands:
+            start, end = parse_clock(band['start']), parse_clock(band['end'])
+            minute_rate = band['rate_per_hour'] / 60.0
+            if start < end:
+                rates[start:end] = minute_rate
+            else:
+                rates[start:] = minute_rate
+                rates[:end] = minute_rate
+        self.rates = rates
+        self.cumulative = np.concatenate(([0.0], np.cumsum(rates)))
+        self.day_total = float(self.cumulative[-1])
+        self.capped_day = min(self.day_total, self.cap)
+
+    def _since_midnight(self, seconds):
+        minute = int(seconds // 60)
+        return float(self.cumulative[minute]) + (seconds - minute * 60) / 60 * float(self.rates[minute])
+
+    def _since_midnight_many(self, seconds):
+        minute = (seconds // 60).astype(np.int64)
+        return self.cumulative[minute] + (seconds - minute * 60) / 60 * self.rates[minute]
+
+    def price(self, start, end):
+        """Price of [start, end) in wall seconds, with the daily cap applied per day"""
+        first_day, last_day = int(start // DAY_SECONDS), int(end // DAY_SECONDS)
+        start_offset = self._since_midnight(start % DAY_SECONDS)
+        end_offset = self._since_midnight(end % DAY_SECONDS)
+        if first_day == last_day:
+            return min(end_offset - start_offset, self.cap)
+        return (min(self.day_total - start_offset, self.cap) + min(end_offset, self.cap)
+                + (last_day - first_day - 1) * self.capped_day)
+
+    def price_many(self, start, end):
+        first_day, last_day = start // DAY_SECONDS, end // DAY_SECONDS
+        start_offset = self._since_midnight_many(start % DAY_SECONDS)
+        end_offset = self._since_midnight_many(end % DAY_SECONDS)
+        same_day = np.minimum(end_offset - start_offset, self.cap)
+        spanning = (np.minimum(self.day_total - start_offset, self.cap) + np.minimum(end_offset, self.cap)
+                    + np.maximum(last_day - first_day - 1, 0) * self.capped_day)
+        return np.where(first_day == last_day, same_day, spanning)
+
+    def units(self, duration):
+        if self.grace_seconds and duration <= self.grace_seconds:
+            return 0
+        return max(math.ceil(duration / self.unit_seconds), self.minimum_units)
+
+    def units_many(self, duration):
+        units = np.maximum(np.ceil(duration / self.unit_seconds), self.minimum_units)
+        if not self.grace_seconds:
+            return units
+        return np.where(duration <= self.grace_seconds, 0, units)
+
+
+class Tariff:
+    """Default schedule plus per-plate overrides, loaded from JSON
+
+    Overrides are merged over the top-level settings, e.g.
+    {"rate_per_hour": 500, "overrides": {"RAB123A": {"rate_per_hour": 0}}}
+    """
+
+    def __init__(self, config=None):
+        config = dict(config or {})
+        overrides = config.pop('overrides', {})
+        base = {**DEFAULT_TARIFF, **config}
+        self.default = Schedule(**base)
+        self.overrides = {plate.upper(): Schedule(**{**base, **override})
+                          for plate, override in overrides.items()}
+
+    @classmethod
+    def load(cls, path=TARIFF_FILE):
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def schedule_for(self, plate):
+        return self.overrides.get((plate or '').upper(), self.default)
+
+    def quote(self, plate, entry_time, at=None):
+        """(billed_hours, amount) for one session if it ended at `at` (default now)"""
+        schedule = self.schedule_for(plate)
+        start = wall_seconds(entry_time)
+        duration = max(0.0, wall_seconds(at or datetime.now()) - start)
+        units = schedule.units(duration)
+        if not units:
+            return 0, 0
+        amount = schedule.price(start, start + units * schedule.unit_seconds)
+        return units * schedule.unit_seconds / 3600, int(round(amount))
+
+    def quote_many(self, plates, entry_times, at=None):
+        """Vectorised quote(): arrays of billed hours and whole amounts, in input order"""
+        count = len(entry_times)
+        if not count:
+            return np.zeros(0), np.zeros(0, dtype=np.int64)
+        now = wall_seconds(at or datetime.now())
+        start = np.fromiter((wall_seconds(t) for t in entry_times), dtype=float, count=count)
+        duration = np.maximum(now - start, 0.0)
+        hours = np.zeros(count)
+        amounts = np.zeros(count)
+
+        groups = [(self.default, np.ones(count, dtype=bool))]
+        if self.overrides:
+            keys = np.array([(p or '').upper() for p in plates], dtype=object)
+            for plate, schedule in self.overrides.items():
+                mask = keys == plate
+                if mask.any():
+                    groups[0][1][mask] = False
+                    groups.append((schedule, mask))
+
+        for schedule, mask in groups:
+            if not mask.any():
+                continue
+            units = schedule.units_many(duration[mask])
+            billed = units * schedule.unit_seconds
+            price = schedule.price_many(start[mask], start[mask] + billed)
+            hours[mask] = billed / 3600
+            amounts[mask] = np.where(units > 0, price, 0.0)
+        return hours, np.rint(amounts).astype(np.int64)
+
+
+_tariff = None
+
+
+def get_tariff():
+    """Process-wide tariff, loaded from TARIFF_FILE on first use"""
+    global _tariff
+    if _tariff is None:
+        _tariff = Tariff.load()
+    return _tariff
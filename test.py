@@ -1,11 +1,15 @@
 import serial
 
+from device_discovery import discover
+
 print("Testing PySerial import...")
 print("serial module path:", serial.__file__)
 
-try:
-    arduino = serial.Serial('COM9', 9600, timeout=1)
-    print("[SUCCESS] Connected to Arduino on COM9")
-    arduino.close()
-except Exception as e:
-    print("[ERROR]", str(e))
\ No newline at end of file
+devices = discover()
+if not devices:
+    print("[ERROR] No serial boards found")
+for device in devices:
+    if device.role:
+        print(f"[SUCCESS] {device.role} board answering on {device.port} at {device.baudrate} baud")
+    else:
+        print(f"[ERROR] {device.port} opened but did not identify itself")
@@ -0,0 +1,56 @@
+import itertools
+import random
+import string
+
+from plate_matcher import CONFUSION_CLASS, BKTree, plate_distance
+
+ALPHABET = string.ascii_uppercase + string.digits
+
+
+def random_plate(rng):
+    """RA plates (RAB123C) skewed towards confusable characters, plus a few odd lengths"""
+    confusable = list(CONFUSION_CLASS)
+    pick = lambda pool: rng.choice(confusable if rng.random() < 0.5 else pool)
+    plate = ('RA' + pick(string.ascii_uppercase) + ''.join(pick(string.digits) for _ in range(3))
+             + pick(string.ascii_uppercase))
+    if rng.random() < 0.1:
+        plate = plate[:-1] if rng.random() < 0.5 else plate + rng.choice(ALPHABET)
+    return plate
+
+
+def mutate(plate, rng):
+    """A misread of plate: a few confusions, substitutions or dropped characters"""
+    chars = list(plate)
+    for _ in range(rng.randint(1, 3)):
+        i = rng.randrange(len(chars))
+        roll = rng.random()
+        if roll < 0.5:
+            group = [c for c, root in CONFUSION_CLASS.items() if root == CONFUSION_CLASS.get(chars[i])]
+            chars[i] = rng.choice(group or ALPHABET)
+        elif roll < 0.8:
+            chars[i] = rng.choice(ALPHABET)
+        elif len(chars) > 1:
+            del chars[i]
+    return ''.join(chars)
+
+
+def test_distance_is_a_metric():
+    rng = random.Random(1)
+    plates = [random_plate(rng) for _ in range(40)]
+    for a, b, c in itertools.product(plates[:15], repeat=3):
+        assert plate_distance(a, b) == plate_distance(b, a)
+        assert plate_distance(a, c) <= plate_distance(a, b) + plate_distance(b, c)
+
+
+def test_search_matches_brute_force():
+    rng = random.Random(7)
+    plates = sorted({random_plate(rng) for _ in range(500)})
+    tree = BKTree(plates)
+    assert tree.size == len(plates)
+
+    for _ in range(200):
+        query = mutate(rng.choice(plates), rng) if rng.random() < 0.8 else random_plate(rng)
+        distances = [(plate_distance(query, plate), plate) for plate in plates]
+        for max_distance in (0.6, 1.0, 1.3):
+            expected = sorted(match for match in distances if match[0] <= max_distance)
+            assert sorted(tree.search(query, max_distance)) == expected, (query, max_distance)
@@ -1,28 +1,65 @@
+import argparse
+
 from database import ParkingDatabase
+from log_config import configure
+from view_tables import PAGE_SIZE, stream_table
+
+VEHICLE_COLUMNS = ['id', 'plate_number', 'entry_time', 'exit_time', 'payment_status', 'payment_amount',
+                   'payment_time']
+EXIT_COLUMNS = ['id', 'plate_number', 'exit_time', 'gate_location']
+
+
+def filters(args, time_column):
+    """WHERE fragment and parameters for the plate/since options"""
+    conditions, params = [], []
+    if args.plate:
+        conditions.append("plate_number = %s")
+        params.append(args.plate.strip().upper())
+    if args.since:
+        conditions.append(f"{time_column} >= %s")
+        params.append(args.since)
+    return ' AND '.join(conditions) or None, params or None
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Print vehicle sessions and unauthorized exits")
+    parser.add_argument('--plate', help="only this plate")
+    parser.add_argument('--since', help="only rows from this time, e.g. 2025-05-01")
+    parser.add_argument('--limit', type=int, default=100, help="rows per section (0 for all)")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+    configure()
+
     db = ParkingDatabase()
-    
-    print("\n=== Vehicle History ===")
-    vehicles = db.get_vehicle_history()
-    for vehicle in vehicles:
-        print(f"ID: {vehicle[0]}")
-        print(f"Plate: {vehicle[1]}")
-        print(f"Entry Time: {vehicle[2]}")
-        print(f"Exit Time: {vehicle[3]}")
-        print(f"Payment Status: {'Paid' if vehicle[4] else 'Unpaid'}")
-        print(f"Payment Amount: {vehicle[5]}")
-        print(f"Payment Time: {vehicle[6]}")
-        print("-" * 50)
-
-    print("\n=== Unauthorized Exits ===")
-    unauthorized = db.get_unauthorized_exits()
-    for exit in unauthorized:
-        print(f"ID: {exit[0]}")
-        print(f"Plate: {exit[1]}")
-        print(f"Time: {exit[2]}")
-        print(f"Gate: {exit[3]}")
-        print("-" * 50)
+    try:
+        print("\n=== Vehicle History ===")
+        where, params = filters(args, 'entry_time')
+        for _, rows in stream_table(db.conn, 'vehicle_history', VEHICLE_COLUMNS, where, 'entry_time DESC',
+                                    args.limit or None, args.page_size, params):
+            for vehicle in rows:
+                print(f"ID: {vehicle[0]}")
+                print(f"Plate: {vehicle[1]}")
+                print(f"Entry Time: {vehicle[2]}")
+                print(f"Exit Time: {vehicle[3]}")
+                print(f"Payment Status: {'Paid' if vehicle[4] else 'Unpaid'}")
+                print(f"Payment Amount: {vehicle[5]}")
+                print(f"Payment Time: {vehicle[6]}")
+                print("-" * 50)
+
+        print("\n=== Unauthorized Exits ===")
+        where, params = filters(args, 'exit_time')
+        for _, rows in stream_table(db.conn, 'unauthorized_exits', EXIT_COLUMNS, where, 'exit_time DESC',
+                                    args.limit or None, args.page_size, params):
+            for exit in rows:
+                print(f"ID: {exit[0]}")
+                print(f"Plate: {exit[1]}")
+                print(f"Time: {exit[2]}")
+                print(f"Gate: {exit[3]}")
+                print("-" * 50)
+    except BrokenPipeError:
+        pass
+    finally:
+        db.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
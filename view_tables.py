@@ -1,29 +1,165 @@
-from database import ParkingDatabase
+import argparse
+import csv
+import os
+import shutil
+import subprocess
+import sys
+
 import psycopg2
+from psycopg2 import sql
 from tabulate import tabulate
-import os
 from dotenv import load_dotenv
 
+PAGE_SIZE = 500  # rows per fetchmany round trip and per printed table
+MAX_WIDTH = 40  # characters shown per cell in table output
+ALL_TABLES_LIMIT = 20  # rows per table when no table is named
+PAGER = os.getenv('PAGER', 'less -SFRX')
+
+
 def get_table_info(conn):
+    """Tables with the planner's row estimate; counting a large table would take seconds"""
     cursor = conn.cursor()
     cursor.execute("""
-        SELECT table_name 
-        FROM information_schema.tables 
-        WHERE table_schema = 'public'
+        SELECT t.table_name, GREATEST(c.reltuples, 0)::bigint
+        FROM information_schema.tables t
+        LEFT JOIN pg_class c ON c.oid = to_regclass(quote_ident(t.table_name))
+        WHERE t.table_schema = 'public'
+        ORDER BY t.table_name
     """)
-    return [table[0] for table in cursor.fetchall()]
+    return cursor.fetchall()
+
 
-def get_table_contents(conn, table_name):
+def get_columns(conn, table_name):
     cursor = conn.cursor()
-    cursor.execute(f"SELECT * FROM {table_name}")
-    columns = [desc[0] for desc in cursor.description]
-    rows = cursor.fetchall()
-    return columns, rows
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = %s ORDER BY ordinal_position
+    """, (table_name,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def stream_table(conn, table_name, columns=None, where=None, order=None, limit=None, page_size=PAGE_SIZE,
+                 params=None):
+    """Yield pages of rows through a server-side cursor, so memory stays flat at any table size
+
+    where and order are SQL fragments typed by the operator (where may use
+    %s placeholders filled from params); the transaction is read-only so
+    they cannot change anything.
+    """
+    known = get_columns(conn, table_name)
+    if not known:
+        raise ValueError(f"no such table: {table_name}")
+    columns = columns or known
+    unknown = [c for c in columns if c not in known]
+    if unknown:
+        raise ValueError(f"unknown columns for {table_name}: {', '.join(unknown)}")
+
+    query = sql.SQL("SELECT {} FROM {}").format(
+        sql.SQL(', ').join(map(sql.Identifier, columns)), sql.Identifier(table_name))
+    if where:
+        query += sql.SQL(" WHERE ") + sql.SQL(where)
+    if order:
+        query += sql.SQL(" ORDER BY ") + sql.SQL(order)
+    if limit:
+        query += sql.SQL(" LIMIT {}").format(sql.Literal(limit))
+
+    conn.rollback()
+    conn.set_session(readonly=True)
+    cursor = conn.cursor(name=f"view_{table_name}")
+    cursor.itersize = page_size
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(page_size)
+            if not rows:
+                break
+            yield columns, rows
+    finally:
+        cursor.close()
+        conn.rollback()
+        conn.set_session(readonly=False)
+
+
+def shorten(value, width):
+    text = '' if value is None else str(value)
+    return text if len(text) <= width else text[:width - 1] + '…'
+
+
+class Output:
+    """Writes pages as grid tables or CSV, to a file, stdout, or a pager when on a terminal"""
+
+    def __init__(self, fmt='table', path=None, max_width=MAX_WIDTH, pager=True):
+        self.fmt = fmt
+        self.max_width = max_width
+        self.process = None
+        if path and path != '-':
+            self.stream = open(path, 'w', newline='')
+        elif pager and sys.stdout.isatty() and shutil.which(PAGER.split()[0]):
+            self.process = subprocess.Popen(PAGER, shell=True, stdin=subprocess.PIPE, text=True)
+            self.stream = self.process.stdin
+        else:
+            self.stream = sys.stdout
+        self.writer = csv.writer(self.stream) if fmt == 'csv' else None
+        self.header_written = False
+
+    def text(self, line):
+        if self.fmt != 'csv':
+            self.stream.write(line + '\n')
+
+    def page(self, columns, rows):
+        """False once the reader has closed the pager, so the caller stops fetching"""
+        try:
+            if self.writer:
+                if not self.header_written:
+                    self.writer.writerow(columns)
+                    self.header_written = True
+                self.writer.writerows(rows)
+            else:
+                rows = [[shorten(v, self.max_width) for v in row] for row in rows]
+                self.stream.write(tabulate(rows, headers=columns, tablefmt='grid') + '\n')
+            self.stream.flush()
+            return True
+        except BrokenPipeError:
+            return False
+
+    def close(self):
+        try:
+            if self.stream is not sys.stdout:
+                self.stream.close()
+        except BrokenPipeError:
+            pass
+        if self.process:
+            self.process.wait()
+
+
+def show_table(conn, output, table_name, **query):
+    """Stream one table to output; returns the number of rows shown"""
+    shown = 0
+    for columns, rows in stream_table(conn, table_name, **query):
+        if not output.page(columns, rows):
+            break
+        shown += len(rows)
+    return shown
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Browse database tables without loading them into memory")
+    parser.add_argument('table', nargs='?', help="table to show; lists every table when omitted")
+    parser.add_argument('--columns', help="comma-separated columns to show")
+    parser.add_argument('--where', help="SQL condition, e.g. \"plate_number = 'RAH972U'\"")
+    parser.add_argument('--order', help="SQL ORDER BY, e.g. 'entry_time DESC'")
+    parser.add_argument('--limit', type=int, help="maximum rows")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--max-width', type=int, default=MAX_WIDTH, help="truncate table cells to this width")
+    parser.add_argument('--csv', nargs='?', const='-', metavar='PATH', help="write CSV to PATH (default stdout)")
+    parser.add_argument('--no-pager', action='store_true')
+    args = parser.parse_args()
+    if args.csv and not args.table:
+        parser.error("--csv needs a table")
+
     # Load environment variables
     load_dotenv()
-    
+
     # Get connection parameters
     conn_params = {
         'host': os.getenv('DB_HOST', 'localhost'),
@@ -32,32 +168,36 @@ def main():
         'user': os.getenv('DB_USER', 'postgres'),
         'password': os.getenv('DB_PASSWORD', '')
     }
-    
+
     try:
         # Connect to database
         conn = psycopg2.connect(**conn_params)
-        print("✅ Successfully connected to database!")
-        
-        # Get list of tables
-        tables = get_table_info(conn)
-        print(f"\nFound {len(tables)} tables:")
-        for table in tables:
-            print(f"- {table}")
-        
-        # Show contents of each table
-        for table in tables:
-            print(f"\n{'='*50}")
-            print(f"Contents of table: {table}")
-            print('='*50)
-            
-            columns, rows = get_table_contents(conn, table)
-            if rows:
-                print(tabulate(rows, headers=columns, tablefmt='grid'))
+        output = Output('csv' if args.csv else 'table', args.csv, args.max_width, pager=not args.no_pager)
+        try:
+            if args.table:
+                shown = show_table(conn, output, args.table,
+                                   columns=args.columns.split(',') if args.columns else None,
+                                   where=args.where, order=args.order, limit=args.limit,
+                                   page_size=args.page_size)
+                output.text(f"({shown} rows)")
             else:
-                print("Table is empty")
-        
-        conn.close()
-        
+                tables = get_table_info(conn)
+                output.text(f"Found {len(tables)} tables:")
+                for table, estimate in tables:
+                    output.text(f"- {table} (~{estimate} rows)")
+
+                # Show the first rows of each table
+                for table, _ in tables:
+                    output.text(f"\n{'='*50}\nContents of table: {table}\n{'='*50}")
+                    if not show_table(conn, output, table, limit=args.limit or ALL_TABLES_LIMIT,
+                                      page_size=args.page_size):
+                        output.text("Table is empty")
+        finally:
+            output.close()
+            conn.close()
+
+    except BrokenPipeError:
+        pass
     except Exception as e:
         print(f"❌ Error: {str(e)}")
         print("\nTroubleshooting tips:")
@@ -67,4 +207,4 @@ def main():
         print("4. Confirm your PostgreSQL credentials")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()